@@ -1,30 +1,23 @@
-import boto3
-import json
-from dotenv import load_dotenv
 import os
-import streamlit as st
+import sys
 
-load_dotenv()
+import streamlit as st
 
-aws_access_key_id = os.getenv('aws_access_key_id')
-aws_secret_access_key = os.getenv('aws_secret_access_key')
-aws_region = os.getenv('region_name')
-modelId = os.getenv('modelId')
-agentAliasId = os.getenv('agentAliasId')
-agentId = os.getenv('agentId')
-sessionId = os.getenv('sessionId')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from service import StreamStats, get_service
+from chunking import count_tokens, map_reduce_summarize
 
-# creating bedrock client
+# inputs longer than this are summarized chunk by chunk and merged
+CHUNK_TOKENS = 2000
 
-bedrock = boto3.client("bedrock-runtime", 
-                      aws_access_key_id=aws_access_key_id,
-                      aws_secret_access_key=aws_secret_access_key,
-                      region_name=aws_region)
+# Streamlit runs this script again on every interaction. Everything expensive
+# (.env, the boto3 client, the summary cache) is built once per process by
+# service.get_service() and reused; launch.py builds it before the first user.
 
 st.title("AWS BEDROCK TEXT SUMMARIZATION")
 
 
-sample_question = st.text_input("give me the text to summarize")
+sample_question = st.text_area("give me the text to summarize")
 
 # content to summarized
 
@@ -45,28 +38,30 @@ sample_question = st.text_input("give me the text to summarize")
 # their content creation workflow.
 # """
 
-prompt = "You are a content summarization expert, understand the given content , summarize it meaningfully without hallucination and should not miss any important information while summarizing."
-
-
-final_prompt = "\n\nHuman:"+prompt + sample_question +"n\nAssistant:"
-
-
-prompt = f"<s>[INST] {final_prompt} [/INST]"
-
-native_request = {
-    "prompt": prompt,
-    "max_tokens": 512,
-    "temperature": 0.5,
-}
-
-# Convert the native request to JSON.
-request = json.dumps(native_request)
-
-response = bedrock.invoke_model(modelId=modelId, body=request)
-
-model_response = json.loads(response["body"].read())
-
-
-output = model_response["outputs"][0]["text"]
-
-st.write("Your Summary:", output)
+if sample_question and count_tokens(sample_question) <= CHUNK_TOKENS:
+    stats = StreamStats()
+    st.write("Your Summary:")
+    st.write_stream(get_service().summarize_stream(sample_question, stats=stats))
+    if stats.cached:
+        st.caption("served from cache")
+    else:
+        # an empty stream never sets first_token_at
+        ttft = "n/a" if stats.time_to_first_token is None else f"{stats.time_to_first_token:.2f}s"
+        st.caption(f"time to first token {ttft}, "
+                   f"total {stats.total_time or 0:.2f}s, {stats.tokens_per_second or 0:.1f} tokens/s")
+
+elif sample_question:
+    status = st.empty()
+    final = st.empty()
+    partials = st.expander("Partial summaries", expanded=True)
+    for kind, index, value in map_reduce_summarize(get_service(), sample_question, chunk_tokens=CHUNK_TOKENS):
+        if kind == "partial":
+            partials.markdown(f"**Part {index + 1}:** {value}")
+        elif kind == "reduce":
+            status.info(f"Merging partial summaries (round {index}, {value} groups)...")
+        else:
+            status.empty()
+            final.write("Your Summary:", value)
+
+if get_service().cache is not None:
+    st.sidebar.caption(f"Summary cache: {get_service().cache.stats()}")
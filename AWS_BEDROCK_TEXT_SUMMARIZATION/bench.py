@@ -0,0 +1,77 @@
+"""Offline throughput benchmark for the summarization service.
+
+    python bench.py --docs 200 --concurrency 16 --latency 0.2 --throttle-rate 0.05
+    python bench.py --stream --docs 10 --latency 1.0
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from service import StreamStats, SummarizationService
+from stub import StubBedrockRuntime
+
+SAMPLE = (
+    "Startups move quickly, and engineering is often prioritized over documentation. "
+    "Unfortunately, this prioritization leads to release cycles that don't match, where "
+    "features release but documentation lags behind. "
+)
+
+
+def run(label, fn, docs):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.2f}s  {docs / elapsed:8.1f} docs/s")
+
+
+def compare_streaming(service, texts):
+    """Time-to-first-token of the blocking call vs the streaming call"""
+    blocking, streaming, rates = [], [], []
+    for text in texts:
+        start = time.perf_counter()
+        service.summarize(text)
+        # the blocking path shows nothing until the whole summary is back
+        blocking.append(time.perf_counter() - start)
+        stats = StreamStats()
+        for _ in service.summarize_stream(text, stats=stats):
+            pass
+        if stats.time_to_first_token is not None:
+            streaming.append(stats.time_to_first_token)
+        if stats.tokens_per_second:
+            rates.append(stats.tokens_per_second)
+    print(f"time to first token, blocking:  {statistics.median(blocking) * 1000:8.1f} ms (median)")
+    if streaming:
+        print(f"time to first token, streaming: {statistics.median(streaming) * 1000:8.1f} ms (median)")
+    if rates:
+        print(f"streaming decode speed:         {statistics.median(rates):8.1f} tokens/s (median)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--skip-sequential", action="store_true")
+    parser.add_argument("--stream", action="store_true", help="compare time-to-first-token instead of throughput")
+    args = parser.parse_args()
+
+    texts = [f"Document {i}. " + SAMPLE * 4 for i in range(args.docs)]
+    stub = StubBedrockRuntime(latency=args.latency, throttle_rate=args.throttle_rate, seed=0)
+    service = SummarizationService("stub-model", client=stub, base_delay=0.05)
+
+    if args.stream:
+        compare_streaming(service, texts)
+        return
+    if not args.skip_sequential:
+        run("sequential", lambda: [service.summarize(t) for t in texts], args.docs)
+    run(f"async (concurrency={args.concurrency})",
+        lambda: service.summarize_batch(texts, concurrency=args.concurrency), args.docs)
+    print(f"model calls: {stub.calls}, throttled: {stub.throttled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Cold-start and rerun latency of the Streamlit app, offline.
+
+    python bench_startup.py --runs 5
+    python bench_startup.py --reruns 20 --latency 0.2
+
+Cold start: fresh interpreters importing what app.py imports, plus the
+slowest packages from `python -X importtime`. Reruns: the app is driven with
+Streamlit's AppTest against the bedrock-runtime stub, so the numbers are
+script reruns and summaries with a warm, process-wide service.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.startup import cold_start, import_profile
+
+import service
+from stub import StubBedrockRuntime
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+SAMPLE = "Startups move quickly, and engineering is often prioritized over documentation. " * 8
+
+
+def bench_reruns(reruns, latency):
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("streamlit is not installed, skipping the rerun benchmark")
+        return
+    # what launch.py's warm() would have built, pointed at the stub
+    service.get_service.set(service.SummarizationService("stub-model", client=StubBedrockRuntime(latency=latency, seed=0)))
+
+    app = AppTest.from_file(APP, default_timeout=60)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+
+    idle = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        idle.append(time.perf_counter() - start)
+
+    summaries = []
+    for i in range(reruns):
+        app.text_area[0].input(f"{i}. {SAMPLE}")
+        start = time.perf_counter()
+        app.run()
+        summaries.append(time.perf_counter() - start)
+
+    print(f"first script run:              {first * 1000:8.1f} ms")
+    print(f"rerun, no input:               {statistics.median(idle) * 1000:8.1f} ms (median of {reruns})")
+    print(f"rerun with a summary:          {statistics.median(summaries) * 1000:8.1f} ms "
+          f"(median, stub latency {latency * 1000:.0f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters for the cold start")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub model latency")
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"cold import of app.py's modules: {cold_start(APP, args.runs) * 1000:8.1f} ms (median of {args.runs})")
+    for package, seconds in import_profile(APP, args.top):
+        print(f"    {package:<28} {seconds * 1000:8.1f} ms")
+    bench_reruns(args.reruns, args.latency)
+
+
+if __name__ == "__main__":
+    main()
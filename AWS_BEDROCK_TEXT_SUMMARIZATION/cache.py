@@ -0,0 +1,158 @@
+import contextlib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(model_id, prompt, params, text):
+    """Content address of a summary: model, prompt template, parameters and text hash"""
+    material = json.dumps([model_id, _sha256(prompt), params, _sha256(text)], sort_keys=True)
+    return _sha256(material)
+
+
+class SummaryCache:
+    """Summaries keyed by content hash, in an in-memory LRU backed by SQLite.
+
+    The SQLite file is memory-mapped (PRAGMA mmap_size) so warm disk hits are
+    served from the page cache. When the stored summaries exceed max_bytes the
+    least recently used ones are evicted. Several processes (launch.py's
+    workers) can share one file: the running byte total lives in the file
+    (summary_bytes), adjusted in the same transaction as each insert and
+    eviction, and memory hits are written back to last_access in batches
+    (every touch_batch hits or touch_seconds) so hot entries are not evicted.
+    """
+
+    def __init__(self, path="summary_cache.db", memory_items=512, max_bytes=256 * 1024 * 1024,
+                 mmap_bytes=256 * 1024 * 1024, touch_batch=64, touch_seconds=5.0):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.touch_batch = touch_batch
+        self.touch_seconds = touch_seconds
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS summaries (
+                              key TEXT PRIMARY KEY,
+                              value TEXT,
+                              size INTEGER,
+                              last_access REAL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_access ON summaries (last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS summary_bytes (total INTEGER)")
+        with self._transaction():
+            if self._conn.execute("SELECT 1 FROM summary_bytes").fetchone() is None:
+                # summed once, when the file (or this table) is new
+                self._conn.execute("INSERT INTO summary_bytes SELECT COALESCE(SUM(size), 0) FROM summaries")
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self._touched[key] = time.time()
+                if len(self._touched) >= self.touch_batch or time.monotonic() - self._flushed >= self.touch_seconds:
+                    self._flush_touches()
+                return value
+            row = self._conn.execute("SELECT value FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE summaries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.disk_hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key, value):
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remember(key, value)
+            with self._transaction():
+                old = self._conn.execute("SELECT size FROM summaries WHERE key = ?", (key,)).fetchone()
+                self._conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+                                   (key, value, size, time.time()))
+                self._conn.execute("UPDATE summary_bytes SET total = total + ?", (size - (old[0] if old else 0),))
+                total = self._disk_bytes()
+                if total > self.max_bytes:
+                    self._flush_touches()
+                    self._evict(total)
+
+    def _disk_bytes(self):
+        # kept in the file, so every process sharing it sees the same total
+        return self._conn.execute("SELECT total FROM summary_bytes").fetchone()[0]
+
+    def _flush_touches(self):
+        if self._touched:
+            self._conn.executemany("UPDATE summaries SET last_access = max(last_access, ?) WHERE key = ?",
+                                   [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+        self._flushed = time.monotonic()
+
+    def _evict(self, total, batch=256):
+        # drop least recently used rows until we are 10% under the limit, a batch at a
+        # time along the last_access index instead of reading the whole table
+        target = int(self.max_bytes * 0.9)
+        while total > target:
+            rows = self._conn.execute("SELECT key, size FROM summaries ORDER BY last_access LIMIT ?",
+                                      (batch,)).fetchall()
+            if not rows:
+                break
+            evicted = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                evicted.append((key,))
+                total -= size
+                self._memory.pop(key, None)
+                self._touched.pop(key, None)
+            self._conn.executemany("DELETE FROM summaries WHERE key = ?", evicted)
+            self._conn.execute("UPDATE summary_bytes SET total = ?", (total,))
+
+    def stats(self):
+        with self._lock:
+            disk_bytes = self._disk_bytes()
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "disk_bytes": disk_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+        self._conn.close()
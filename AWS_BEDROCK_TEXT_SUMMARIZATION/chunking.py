@@ -0,0 +1,113 @@
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+REDUCE_PROMPT = "You are a content summarization expert. The following are summaries of consecutive parts of one document. Merge them into a single coherent summary without hallucination and without missing any important information."
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text):
+    """Rough token count (~1.3 tokens per word/punctuation mark).
+
+    Bedrock doesn't ship the models' tokenizers, so this errs on the high
+    side to keep chunks inside the context window.
+    """
+    return int(len(_TOKEN_RE.findall(text)) * 1.3) + 1
+
+
+def _pieces(text, max_tokens, count):
+    """Split text into paragraphs, then sentences, then words, each under max_tokens"""
+    for paragraph in re.split(r"\n\s*\n", text):
+        if not paragraph.strip():
+            continue
+        if count(paragraph) <= max_tokens:
+            yield paragraph.strip()
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            if count(sentence) <= max_tokens:
+                yield sentence.strip()
+                continue
+            words = sentence.split()
+            step = max(1, int(max_tokens / 1.5))
+            for i in range(0, len(words), step):
+                yield " ".join(words[i:i + step])
+
+
+def chunk_text(text, max_tokens=2000, overlap_tokens=100, count=count_tokens):
+    """Greedily pack paragraphs/sentences into chunks of at most max_tokens.
+
+    The last pieces of a chunk (up to overlap_tokens) are repeated at the start
+    of the next one so sentences near a boundary keep some context.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for piece in _pieces(text, max_tokens, count):
+        tokens = count(piece)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            carry, carry_tokens = [], 0
+            for prev in reversed(current):
+                prev_tokens = count(prev)
+                if carry_tokens + prev_tokens > overlap_tokens:
+                    break
+                carry.insert(0, prev)
+                carry_tokens += prev_tokens
+            current, current_tokens = carry, carry_tokens
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _group(summaries, max_tokens, count):
+    groups, current, current_tokens = [], [], 0
+    for summary in summaries:
+        tokens = count(summary)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def map_reduce_summarize(service, text, chunk_tokens=2000, overlap_tokens=100,
+                         concurrency=8, count=count_tokens):
+    """Summarize a long text chunk by chunk, yielding progress as it happens.
+
+    Yields ("partial", index, summary) as soon as each chunk summary comes
+    back (in completion order), ("reduce", level, n_groups) before each merge
+    round and finally ("final", None, summary). Merge rounds combine as many
+    summaries as fit in chunk_tokens until only one is left.
+    """
+    chunks = chunk_text(text, chunk_tokens, overlap_tokens, count)
+    if len(chunks) <= 1:
+        summary = service.summarize(text)
+        yield "partial", 0, summary
+        yield "final", None, summary
+        return
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(service.summarize, chunk): i for i, chunk in enumerate(chunks)}
+        summaries = [None] * len(chunks)
+        for future in as_completed(futures):
+            i = futures[future]
+            summaries[i] = future.result()
+            yield "partial", i, summaries[i]
+
+        level = 0
+        while len(summaries) > 1:
+            level += 1
+            groups = _group(summaries, chunk_tokens, count)
+            if len(groups) == len(summaries):
+                # every summary fills a group on its own, merge pairs so the tree shrinks
+                groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+            yield "reduce", level, len(groups)
+            merged = executor.map(lambda g: service.summarize("\n\n".join(g), prompt=REDUCE_PROMPT), groups)
+            summaries = list(merged)
+
+    yield "final", None, summaries[0]
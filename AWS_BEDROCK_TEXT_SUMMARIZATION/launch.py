@@ -0,0 +1,58 @@
+"""Start the Streamlit app with everything warm before the first user arrives.
+
+    python launch.py                           # one server on :8501
+    python launch.py --workers 4 --port 8501   # :8501-:8504, put a sticky load balancer in front
+
+`streamlit run app.py` imports streamlit, boto3 and botocore and builds the
+Bedrock client and summary cache inside the first user's request. Here the
+heavy modules are imported once in the parent, forked workers share them,
+and each worker builds its own service (client, SQLite cache) before it
+starts serving. Streamlit sessions live in one process, which is why the
+workers get a port each instead of sharing a socket.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.startup import prefork, preload
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PRELOAD = ("boto3", "botocore.session", "dotenv", "streamlit", "streamlit.web.bootstrap", "service", "chunking")
+
+
+def warm():
+    from service import get_service
+
+    start = time.perf_counter()
+    get_service().warm()
+    print(f"[{os.getpid()}] service ready in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+def serve(port):
+    from streamlit.web import bootstrap
+
+    flags = {"server.port": port, "server.headless": True}
+    bootstrap.load_config_options(flag_options=flags)
+    bootstrap.run(APP, False, [], flags)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8501, help="first worker's port")
+    args = parser.parse_args()
+
+    timings = preload(PRELOAD)
+    print("preloaded:", ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items() if seconds),
+          file=sys.stderr)
+    if args.workers == 1:
+        warm()
+        serve(args.port)
+    else:
+        prefork(lambda index: serve(args.port + index), workers=args.workers, warm=warm)
+
+
+if __name__ == "__main__":
+    main()
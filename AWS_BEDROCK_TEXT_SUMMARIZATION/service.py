@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import SummaryCache, cache_key
+from chunking import count_tokens
+
+from common.instrumentation import get_recorder
+from common.startup import once
+
+PROMPT = "You are a content summarization expert, understand the given content , summarize it meaningfully without hallucination and should not miss any important information while summarizing."
+
+# error codes worth retrying, everything else is raised straight away
+RETRYABLE_ERRORS = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+def build_prompt(text, prompt=PROMPT):
+    final_prompt = "\n\nHuman:" + prompt + text + "\n\nAssistant:"
+    return f"<s>[INST] {final_prompt} [/INST]"
+
+
+class StreamStats:
+    """Timing of one streamed summary, filled in as the stream is consumed"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.end = None
+        self.output_tokens = 0
+        self.cached = False
+
+    @property
+    def time_to_first_token(self):
+        return None if self.first_token_at is None else self.first_token_at - self.start
+
+    @property
+    def total_time(self):
+        return None if self.end is None else self.end - self.start
+
+    @property
+    def tokens_per_second(self):
+        if self.end is None or self.first_token_at is None or self.end <= self.first_token_at:
+            return None
+        # decode speed, excluding the wait for the first token
+        return max(0, self.output_tokens - 1) / (self.end - self.first_token_at)
+
+    def as_dict(self):
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "total_time": self.total_time,
+            "output_tokens": self.output_tokens,
+            "tokens_per_second": self.tokens_per_second,
+            "cached": self.cached,
+        }
+
+
+def error_code(exc):
+    """Return the AWS error code of a botocore ClientError (or the stub's)"""
+    return getattr(exc, "response", {}).get("Error", {}).get("Code")
+
+
+class SummarizationService:
+    """Summarize text with a Bedrock model over one shared, pooled client.
+
+    The boto3 client is created on first use and is thread-safe, so one
+    service can serve every Streamlit rerun and every asyncio worker. With a
+    cache (see cache.SummaryCache) an unchanged text is never sent twice.
+    """
+
+    def __init__(self, model_id, client=None, max_tokens=512, temperature=0.5,
+                 max_retries=5, base_delay=0.5, max_delay=20.0, max_pool_connections=50,
+                 cache=None, recorder=None, **client_kwargs):
+        self.model_id = model_id
+        self.cache = cache
+        self.recorder = recorder or get_recorder("bedrock")
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_pool_connections = max_pool_connections
+        self._client = client
+        self._client_kwargs = client_kwargs
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    # retries are handled here, with jitter, across sync and async paths
+                    config = Config(max_pool_connections=self.max_pool_connections,
+                                    retries={"max_attempts": 0})
+                    self._client = boto3.client("bedrock-runtime", config=config, **self._client_kwargs)
+        return self._client
+
+    def warm(self):
+        """Create the client now (boto3 import, endpoint and credential resolution) instead of on the first request"""
+        return self.client
+
+    def build_request(self, text, prompt=PROMPT):
+        native_request = {
+            "prompt": build_prompt(text, prompt),
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
+        # Convert the native request to JSON.
+        return json.dumps(native_request)
+
+    @staticmethod
+    def parse_response(model_response):
+        return model_response["outputs"][0]["text"]
+
+    def _backoff(self, attempt):
+        # full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _cache_key(self, text, prompt):
+        params = {"max_tokens": self.max_tokens, "temperature": self.temperature}
+        return cache_key(self.model_id, prompt, params, text)
+
+    def _cached(self, text, prompt):
+        if self.cache is None:
+            return None, None
+        key = self._cache_key(text, prompt)
+        with self.recorder.span("cache", "summary_cache", app="bedrock", input=key) as span:
+            summary = self.cache.get(key)
+            span.hit(summary is not None)
+        return key, summary
+
+    def _invoke(self, request):
+        with self.recorder.span("llm", self.model_id, app="bedrock", input=request) as span:
+            response = self.client.invoke_model(modelId=self.model_id, body=request)
+            summary = self.parse_response(json.loads(response["body"].read()))
+            span.tokens(count_tokens(json.loads(request)["prompt"]), count_tokens(summary))
+            span.output = summary
+        return summary
+
+    def summarize(self, text, prompt=PROMPT):
+        """Summarize one text, retrying throttled calls with backoff"""
+        key, summary = self._cached(text, prompt)
+        if summary is not None:
+            return summary
+        request = self.build_request(text, prompt)
+        for attempt in range(self.max_retries + 1):
+            try:
+                summary = self._invoke(request)
+                break
+            except Exception as e:
+                if error_code(e) not in RETRYABLE_ERRORS or attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+        if key is not None:
+            self.cache.put(key, summary)
+        return summary
+
+    def _open_stream(self, request):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.invoke_model_with_response_stream(modelId=self.model_id, body=request)
+                return response["body"]
+            except Exception as e:
+                if error_code(e) not in RETRYABLE_ERRORS or attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+
+    def summarize_stream(self, text, prompt=PROMPT, stats=None):
+        """Yield the summary as text deltas while the model generates it.
+
+        Pass a StreamStats to get time-to-first-token and tokens/sec once the
+        generator is exhausted. Cached summaries are yielded in one piece.
+        """
+        stats = stats if stats is not None else StreamStats()
+        key, summary = self._cached(text, prompt)
+        if summary is not None:
+            stats.cached = True
+            stats.first_token_at = time.perf_counter()
+            stats.output_tokens = count_tokens(summary)
+            stats.end = stats.first_token_at
+            yield summary
+            return
+
+        parts = []
+        metrics = None
+        request = self.build_request(text, prompt)
+        with self.recorder.span("llm", self.model_id, app="bedrock", input=request, stream=True) as span:
+            for event in self._open_stream(request):
+                if "chunk" not in event:
+                    # modelStreamErrorException, throttlingException, ... arrive as events
+                    name, detail = next(iter(event.items()))
+                    raise RuntimeError(f"{name}: {detail.get('message', detail)}")
+                chunk = json.loads(event["chunk"]["bytes"])
+                metrics = chunk.get("amazon-bedrock-invocationMetrics", metrics)
+                delta = self.parse_response(chunk)
+                if not delta:
+                    continue
+                if stats.first_token_at is None:
+                    stats.first_token_at = time.perf_counter()
+                    span.first_token()
+                parts.append(delta)
+                yield delta
+            stats.end = time.perf_counter()
+
+            summary = "".join(parts)
+            if metrics and "outputTokenCount" in metrics:
+                stats.output_tokens = metrics["outputTokenCount"]
+            else:
+                stats.output_tokens = count_tokens(summary)
+            span.tokens((metrics or {}).get("inputTokenCount") or count_tokens(json.loads(request)["prompt"]),
+                        stats.output_tokens)
+            span.output = summary
+        if key is not None:
+            self.cache.put(key, summary)
+
+    async def asummarize(self, text, executor=None, prompt=PROMPT):
+        """Async version of summarize; the blocking call runs in executor"""
+        key, summary = self._cached(text, prompt)
+        if summary is not None:
+            return summary
+        loop = asyncio.get_running_loop()
+        request = self.build_request(text, prompt)
+        for attempt in range(self.max_retries + 1):
+            try:
+                summary = await loop.run_in_executor(executor, self._invoke, request)
+                break
+            except Exception as e:
+                if error_code(e) not in RETRYABLE_ERRORS or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+        if key is not None:
+            self.cache.put(key, summary)
+        return summary
+
+    async def summarize_many(self, texts, concurrency=8, return_exceptions=False):
+        """Summarize texts concurrently, at most `concurrency` calls in flight.
+
+        Results come back in input order. With return_exceptions=True a failed
+        document yields its exception instead of cancelling the rest.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            async def one(text):
+                async with semaphore:
+                    return await self.asummarize(text, executor)
+
+            return await asyncio.gather(*(one(t) for t in texts), return_exceptions=return_exceptions)
+
+    def summarize_batch(self, texts, concurrency=8, return_exceptions=False):
+        """Blocking wrapper around summarize_many"""
+        return asyncio.run(self.summarize_many(texts, concurrency, return_exceptions))
+
+    # Offline batch inference: for large document sets it is cheaper to hand
+    # Bedrock a JSONL file in S3 and collect the results later.
+
+    def write_batch_input(self, texts, path, ids=None):
+        """Write a Bedrock batch-inference JSONL input file, returns the record ids"""
+        ids = list(ids) if ids is not None else [f"doc-{i:08d}" for i in range(len(texts))]
+        with open(path, "w", encoding="utf-8") as f:
+            for record_id, text in zip(ids, texts):
+                record = {"recordId": record_id, "modelInput": json.loads(self.build_request(text))}
+                f.write(json.dumps(record) + "\n")
+        return ids
+
+    def submit_batch_job(self, job_name, input_s3_uri, output_s3_uri, role_arn, **client_kwargs):
+        """Start a model invocation job for an input file already uploaded to S3"""
+        import boto3
+
+        bedrock = boto3.client("bedrock", **(client_kwargs or self._client_kwargs))
+        response = bedrock.create_model_invocation_job(
+            jobName=job_name,
+            modelId=self.model_id,
+            roleArn=role_arn,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": input_s3_uri}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": output_s3_uri}},
+        )
+        return response["jobArn"]
+
+    def read_batch_output(self, path):
+        """Parse a downloaded batch-inference output file into {recordId: summary or error}"""
+        summaries = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "modelOutput" in record:
+                    summaries[record["recordId"]] = self.parse_response(record["modelOutput"])
+                else:
+                    summaries[record["recordId"]] = RuntimeError(record.get("error", "no output"))
+        return summaries
+
+
+@once
+def get_service():
+    """The process-wide service, configured from .env / the environment on first use.
+
+    Streamlit re-executes app.py on every interaction but keeps imported
+    modules, so this lives here rather than in the script: one client and
+    one cache per process, shared by every rerun and session, and a launcher
+    (launch.py) can build it before the first user connects.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return SummarizationService(
+        os.getenv("modelId"),
+        cache=SummaryCache(os.getenv("summary_cache_path", "summary_cache.db")),
+        aws_access_key_id=os.getenv("aws_access_key_id"),
+        aws_secret_access_key=os.getenv("aws_secret_access_key"),
+        region_name=os.getenv("region_name"),
+    )
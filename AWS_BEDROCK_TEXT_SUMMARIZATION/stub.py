@@ -0,0 +1,93 @@
+import io
+import json
+import random
+import re
+import threading
+import time
+
+
+class StubClientError(Exception):
+    """Shaped like botocore's ClientError so the retry logic treats it the same"""
+
+    def __init__(self, code, message=""):
+        super().__init__(f"{code}: {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class StubBedrockRuntime:
+    """Offline stand-in for the bedrock-runtime client.
+
+    Sleeps for a latency drawn around `latency` seconds, throttles a
+    `throttle_rate` fraction of calls or anything above `max_concurrency`
+    in flight, and "summarizes" by returning the last words of the text.
+    Streaming calls send the first token after first_token_latency and spread
+    the rest of the latency over the remaining tokens.
+    """
+
+    def __init__(self, latency=0.2, jitter=0.05, throttle_rate=0.0, max_concurrency=None,
+                 summary_words=40, first_token_latency=None, seed=None):
+        self.latency = latency
+        self.first_token_latency = latency * 0.2 if first_token_latency is None else first_token_latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.max_concurrency = max_concurrency
+        self.summary_words = summary_words
+        self.calls = 0
+        self.throttled = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def _summary(self, body):
+        prompt = json.loads(body)["prompt"]
+        match = re.search(r"Human:(.*)Assistant:", prompt, re.S)
+        words = (match.group(1) if match else prompt).split()
+        return " ".join(words[-self.summary_words:])
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            over_limit = self.max_concurrency is not None and self._in_flight >= self.max_concurrency
+            if over_limit or self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                raise StubClientError("ThrottlingException", "Too many requests")
+            self._in_flight += 1
+            return max(0.0, self._random.gauss(self.latency, self.jitter))
+
+    def _exit(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def invoke_model(self, modelId, body, **kwargs):
+        delay = self._enter()
+        try:
+            time.sleep(delay)
+            payload = {"outputs": [{"text": self._summary(body), "stop_reason": "stop"}]}
+            return {"body": io.BytesIO(json.dumps(payload).encode()), "contentType": "application/json"}
+        finally:
+            self._exit()
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        delay = self._enter()
+        words = self._summary(body).split()
+
+        def events():
+            try:
+                time.sleep(min(delay, self.first_token_latency))
+                per_token = max(0.0, delay - self.first_token_latency) / max(1, len(words) - 1)
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(per_token)
+                    last = i == len(words) - 1
+                    payload = {"outputs": [{"text": (" " if i else "") + word,
+                                            "stop_reason": "stop" if last else None}]}
+                    if last:
+                        payload["amazon-bedrock-invocationMetrics"] = {
+                            "outputTokenCount": len(words),
+                            "firstByteLatency": int(self.first_token_latency * 1000),
+                        }
+                    yield {"chunk": {"bytes": json.dumps(payload).encode()}}
+            finally:
+                self._exit()
+
+        return {"body": events(), "contentType": "application/json"}
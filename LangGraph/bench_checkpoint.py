@@ -0,0 +1,89 @@
+"""Checkpoint write/read latency as a thread's history grows.
+
+Compares DeltaCheckpointStore (append per turn, read the live tail) with
+saving a full JSON snapshot of the history every turn.
+
+    python bench_checkpoint.py --turns 2000 --threads 20 --recent 12
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+import uuid
+
+from checkpoint import DeltaCheckpointStore
+
+
+def fake_message(turn, role):
+    message_id = str(uuid.uuid4())
+    content = f"{role} message for turn {turn}. " * 20
+    return {"id": message_id, "data": {"type": role, "data": {"content": content, "id": message_id}}}
+
+
+class SnapshotStore:
+    """Baseline: one row per thread holding the whole history"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE snapshots (thread_id TEXT PRIMARY KEY, data TEXT)")
+
+    def save(self, thread_id, records):
+        self.conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?)", (thread_id, json.dumps(records)))
+
+    def load(self, thread_id):
+        row = self.conn.execute("SELECT data FROM snapshots WHERE thread_id = ?", (thread_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+
+def ms(samples):
+    return f"{statistics.median(samples) * 1000:7.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--recent", type=int, default=12, help="messages read back on resume")
+    parser.add_argument("--report-every", type=int, default=250)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        delta = DeltaCheckpointStore(os.path.join(tmp, "delta.db"))
+        snapshot = SnapshotStore(os.path.join(tmp, "snapshot.db"))
+        histories = {f"thread-{t}": [] for t in range(args.threads)}
+        window = {"delta_write": [], "delta_read": [], "snap_write": [], "snap_read": []}
+
+        print(f"{'turn':>6} {'delta write':>12} {'delta read':>12} {'snap write':>12} {'snap read':>12}")
+        for turn in range(1, args.turns + 1):
+            for thread_id, history in histories.items():
+                records = [fake_message(turn, "human"), fake_message(turn, "ai")]
+                history.extend(records)
+
+                start = time.perf_counter()
+                delta.load(thread_id, limit=args.recent)
+                window["delta_read"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                delta.append(thread_id, records)
+                window["delta_write"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                snapshot.load(thread_id)
+                window["snap_read"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                snapshot.save(thread_id, history)
+                window["snap_write"].append(time.perf_counter() - start)
+
+            if turn % args.report_every == 0:
+                print(f"{turn:>6} {ms(window['delta_write']):>12} {ms(window['delta_read']):>12} "
+                      f"{ms(window['snap_write']):>12} {ms(window['snap_read']):>12}")
+                for samples in window.values():
+                    samples.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -21,28 +21,26 @@ llm = ChatOpenAI(
 
 ## Start Building Chatbot Using Langgraph
 
-from typing import Annotated
-from typing_extensions import TypedDict
-from langgraph.graph import StateGraph,START,END
-from langgraph.graph.message import add_messages
+import uuid
 
-class State(TypedDict):
-  # Messages have the type "list". The `add_messages` function
-    # in the annotation defines how this state key should be updated
-    # (in this case, it appends messages to the list, rather than overwriting them)
-  messages:Annotated[list,add_messages]
+# the repo's common/ folder has to be importable, graph.py uses it too (upload it next to this notebook)
+import sys
+sys.path.append("..")
 
-graph_builder=StateGraph(State)
+# graph.py, memory.py and checkpoint.py have to sit next to this notebook (upload them to the Colab session)
+from graph import build_graph
+from checkpoint import DeltaCheckpointStore, run_turn
+from common.embeddings import default_embedder
+from common.semantic_cache import SemanticCache
 
-def chatbot(state:State):
-  return {"messages":llm.invoke(state['messages'])}
+# answers near-duplicate first questions without calling the model; follow-ups only within their own thread
+cache=SemanticCache(default_embedder(),threshold=0.95)
 
-graph_builder.add_node("chatbot",chatbot)
+# memory -> chatbot graph, the memory node keeps the history under a token budget
+graph=build_graph(llm,max_tokens=3000,keep_recent=6,cache=cache)
 
-graph_builder.add_edge(START,"chatbot")
-graph_builder.add_edge("chatbot",END)
-
-graph=graph_builder.compile()
+# threads are persisted per turn as deltas (new/removed messages, summary)
+store=DeltaCheckpointStore("checkpoints.db")
 
 from IPython.display import Image, display
 try:
@@ -50,14 +48,15 @@ try:
 except Exception:
   pass
 
+thread_id=input("Thread id (empty for a new one): ").strip() or str(uuid.uuid4())
+print("Thread:",thread_id)
+
 while True:
   user_input=input("User: ")
   if user_input.lower() in ["quit","q"]:
     print("Good Bye")
+    print("Cache:",cache.stats())
     break
-  for event in graph.stream({'messages':("user",user_input)}):
-    print(event.values())
-    for value in event.values():
-      print(value['messages'])
-      print("Assistant:",value["messages"].content)
+  reply=run_turn(graph,store,thread_id,user_input)
+  print("Assistant:",reply.content)
 
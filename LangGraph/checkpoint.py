@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+def to_record(message):
+    from langchain_core.messages import message_to_dict
+
+    return {"id": message.id, "type": message.type, "data": message_to_dict(message)}
+
+
+def from_record(record):
+    from langchain_core.messages import messages_from_dict
+
+    return messages_from_dict([record["data"]])[0]
+
+
+class DeltaCheckpointStore:
+    """SQLite store for chatbot threads that only appends what changed per turn.
+
+    Each turn writes the new messages, marks messages the memory node removed,
+    and updates the thread's summary/token counts, all in one small
+    transaction. Resuming a thread reads the summary plus the live (not
+    removed) messages through an index, so it costs O(recent turns) no matter
+    how long the thread has been running.
+    """
+
+    def __init__(self, path="checkpoints.db"):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL DEFAULT '',
+                next_seq INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL);
+            CREATE TABLE IF NOT EXISTS messages (
+                thread_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                message_id TEXT NOT NULL,
+                tokens INTEGER,
+                data TEXT NOT NULL,
+                removed INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (thread_id, seq));
+            CREATE INDEX IF NOT EXISTS messages_live
+                ON messages (thread_id, seq) WHERE removed = 0;
+            CREATE INDEX IF NOT EXISTS messages_by_id
+                ON messages (thread_id, message_id);
+        """)
+
+    def _conn(self):
+        # one connection per OS thread; WAL lets readers run during writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, thread_id, records, summary=None, removed_ids=(), token_counts=None):
+        """Append message records to a thread and apply removals in one transaction.
+
+        token_counts may also hold counts for messages stored earlier, those
+        rows are updated so the count is never computed again.
+        """
+        token_counts = token_counts or {}
+        new_ids = {r["id"] for r in records}
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO threads (thread_id) VALUES (?)", (thread_id,))
+            seq = conn.execute("SELECT next_seq FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO messages (thread_id, seq, message_id, tokens, data) VALUES (?, ?, ?, ?, ?)",
+                [(thread_id, seq + i, r["id"], token_counts.get(r["id"]), json.dumps(r["data"]))
+                 for i, r in enumerate(records)],
+            )
+            conn.executemany(
+                "UPDATE messages SET tokens = ? WHERE thread_id = ? AND message_id = ? AND tokens IS NULL",
+                [(tokens, thread_id, message_id) for message_id, tokens in token_counts.items()
+                 if message_id not in new_ids],
+            )
+            conn.executemany(
+                "UPDATE messages SET removed = 1 WHERE thread_id = ? AND message_id = ?",
+                [(thread_id, message_id) for message_id in removed_ids],
+            )
+            if summary is None:
+                conn.execute("UPDATE threads SET next_seq = ?, updated_at = ? WHERE thread_id = ?",
+                             (seq + len(records), time.time(), thread_id))
+            else:
+                conn.execute("UPDATE threads SET next_seq = ?, summary = ?, updated_at = ? WHERE thread_id = ?",
+                             (seq + len(records), summary, time.time(), thread_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load(self, thread_id, limit=None):
+        """Return (summary, live message records, token counts) for a thread"""
+        conn = self._conn()
+        row = conn.execute("SELECT summary FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        if row is None:
+            return "", [], {}
+        rows = conn.execute(
+            "SELECT message_id, tokens, data FROM messages WHERE thread_id = ? AND removed = 0 "
+            "ORDER BY seq DESC LIMIT ?",
+            (thread_id, -1 if limit is None else limit),
+        ).fetchall()
+        rows.reverse()
+        records = [{"id": message_id, "data": json.loads(data)} for message_id, _, data in rows]
+        counts = {message_id: tokens for message_id, tokens, _ in rows if tokens is not None}
+        return row[0], records, counts
+
+    def threads(self):
+        return [r[0] for r in self._conn().execute("SELECT thread_id FROM threads ORDER BY updated_at DESC")]
+
+    def delete_thread(self, thread_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM messages WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    # helpers for graphs built on memory.py's State
+
+    def load_state(self, thread_id, limit=None):
+        summary, records, counts = self.load(thread_id, limit)
+        return {"messages": [from_record(r) for r in records], "summary": summary, "token_counts": counts}
+
+    def save_turn(self, thread_id, before, after):
+        """Persist the difference between the state before and after a graph run"""
+        before_ids = {m.id for m in before["messages"]}
+        after_ids = {m.id for m in after["messages"]}
+        new = [to_record(m) for m in after["messages"] if m.id not in before_ids]
+        removed = before_ids - after_ids
+        summary = after.get("summary")
+        counts = {message_id: tokens for message_id, tokens in (after.get("token_counts") or {}).items()
+                  if message_id not in before["token_counts"]}
+        self.append(thread_id, new,
+                    summary=summary if summary != before.get("summary") else None,
+                    removed_ids=removed, token_counts=counts)
+
+
+def run_turn(graph, store, thread_id, user_input):
+    """Resume a thread, run one user turn through the graph and save the delta"""
+    from langchain_core.messages import HumanMessage
+
+    before = store.load_state(thread_id)
+    state = dict(before, messages=before["messages"] + [HumanMessage(content=user_input)])
+    after = graph.invoke(state, {"configurable": {"thread_id": thread_id}})
+    store.save_turn(thread_id, before, after)
+    return after["messages"][-1]
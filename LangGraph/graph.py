@@ -0,0 +1,101 @@
+import time
+from typing import Annotated
+from typing_extensions import TypedDict
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.graph import StateGraph,START,END
+from langgraph.graph.message import add_messages
+
+from memory import make_memory_node, with_summary
+
+from common.instrumentation import get_recorder
+from common.semantic_cache import context_namespace
+
+class State(TypedDict):
+  # Messages have the type "list". The `add_messages` function
+    # in the annotation defines how this state key should be updated
+    # (in this case, it appends messages to the list, rather than overwriting them)
+  messages:Annotated[list,add_messages]
+  # rolling summary of the turns folded out of `messages`
+  summary:str
+  # token count per message id, so messages are tokenized only once
+  token_counts:dict
+  # semantic cache namespace of this turn's question, set by the cache node
+  cache_namespace:str
+
+def _question(state):
+  return state["messages"][-1].content
+
+def _namespace(state,config):
+  # a follow-up only has an answer within its own thread and history
+  thread_id=((config or {}).get("configurable") or {}).get("thread_id","")
+  history=[(m.type,m.content) for m in state["messages"][:-1]]
+  if state.get("summary"):
+    history.insert(0,("summary",state["summary"]))
+  return context_namespace(history,scope=thread_id)
+
+def build_graph(llm,max_tokens=3000,keep_recent=6,count_tokens=None,cache=None):
+  """memory -> chatbot graph; the chatbot node streams tokens under astream.
+
+  With a cache (common.semantic_cache.SemanticCache) a "cache" node runs
+  first and answers near-duplicate questions without calling the model.
+  Only first questions are shared between threads; follow-ups are cached
+  per thread and history. Pass {"configurable":{"thread_id":...}}.
+  Every model call and cache lookup is recorded by common.instrumentation.
+  """
+  recorder=get_recorder()
+
+  def measured(span,reply):
+    usage=getattr(reply,"usage_metadata",None) or {}
+    span.tokens(usage.get("input_tokens"),usage.get("output_tokens"))
+    span.output=reply.content
+    return reply
+
+  def remember(state,reply,started):
+    if cache is not None:
+      cache.store(_question(state),reply.content,latency=time.perf_counter()-started,
+                  namespace=state.get("cache_namespace",""))
+    return {"messages":reply}
+
+  def chatbot(state:State):
+    started=time.perf_counter()
+    with recorder.span("llm","chatbot",app="langgraph",input=_question(state)) as span:
+      reply=measured(span,llm.invoke(with_summary(state)))
+    return remember(state,reply,started)
+
+  async def achatbot(state:State):
+    started=time.perf_counter()
+    with recorder.span("llm","chatbot",app="langgraph",input=_question(state)) as span:
+      reply=measured(span,await llm.ainvoke(with_summary(state)))
+    return remember(state,reply,started)
+
+  def cached(state:State,config:RunnableConfig):
+    namespace=_namespace(state,config)
+    with recorder.span("cache","semantic_cache",app="langgraph",input=_question(state)) as span:
+      hit=cache.lookup(_question(state),namespace=namespace)
+      span.hit(hit is not None)
+      if hit is not None:
+        span.output=hit.answer
+    if hit is None:
+      return {"cache_namespace":namespace}
+    return {"messages":AIMessage(content=hit.answer,response_metadata={"cache_similarity":hit.similarity})}
+
+  def after_cache(state:State):
+    return END if state["messages"][-1].type=="ai" else "memory"
+
+  graph_builder=StateGraph(State)
+
+  # keeps the history under a token budget before every LLM call
+  graph_builder.add_node("memory",make_memory_node(llm,max_tokens=max_tokens,keep_recent=keep_recent,count_tokens=count_tokens))
+  graph_builder.add_node("chatbot",RunnableLambda(chatbot,afunc=achatbot))
+
+  if cache is not None:
+    graph_builder.add_node("cache",cached)
+    graph_builder.add_edge(START,"cache")
+    graph_builder.add_conditional_edges("cache",after_cache,["memory",END])
+  else:
+    graph_builder.add_edge(START,"memory")
+  graph_builder.add_edge("memory","chatbot")
+  graph_builder.add_edge("chatbot",END)
+
+  return graph_builder.compile()
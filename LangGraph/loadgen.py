@@ -0,0 +1,86 @@
+"""Load generator for the async chat server, using a fake streaming LLM.
+
+Runs everything on one event loop (one core) and reports per-turn latency
+percentiles and sessions/sec.
+
+    python loadgen.py --sessions 500 --turns 4 --concurrency 200
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import time
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from graph import build_graph
+from memory import approx_tokens
+from server import ChatServer
+
+REPLY = "Sure, here is a short answer to your question with a few more words to stream back."
+
+
+class SlowFakeChatModel(GenericFakeChatModel):
+    """GenericFakeChatModel that waits before the first and between tokens"""
+
+    first_token_delay: float = 0.05
+    token_delay: float = 0.005
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_delay)
+        for chunk in self._stream(messages, stop=stop, **kwargs):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.token_delay)
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def run_session(server, thread_id, turns, latencies, ttfts):
+    for turn in range(turns):
+        start = time.perf_counter()
+        first = None
+        async for _ in server.chat(thread_id, f"question {turn} from {thread_id}"):
+            if first is None:
+                first = time.perf_counter()
+        latencies.append(time.perf_counter() - start)
+        if first is not None:
+            ttfts.append(first - start)
+
+
+async def main(args):
+    llm = SlowFakeChatModel(messages=itertools.cycle([AIMessage(content=REPLY)]),
+                            first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+    # the fake model has no tokenizer, don't let the GPT-2 fallback dominate the profile
+    server = ChatServer(build_graph(llm, count_tokens=approx_tokens), max_concurrency=args.concurrency)
+    latencies, ttfts = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(server, f"s{i}", args.turns, latencies, ttfts)
+                           for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    await server.close()
+
+    print(f"sessions: {args.sessions} x {args.turns} turns in {elapsed:.2f}s "
+          f"({args.sessions / elapsed:.1f} sessions/s, {len(latencies) / elapsed:.1f} turns/s)")
+    print(f"turn latency p50 {percentile(latencies, 50) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    if ttfts:
+        print(f"first token  p50 {percentile(ttfts, 50) * 1000:.1f} ms, p99 {percentile(ttfts, 99) * 1000:.1f} ms "
+              f"(mean {statistics.mean(ttfts) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an assistant.
+Extend the current summary with the new lines below. Keep names, facts, decisions and open questions; drop small talk.
+
+Current summary:
+{summary}
+
+New lines:
+{lines}
+
+Updated summary:"""
+
+
+def approx_tokens(message):
+    """~4 characters per token, used when the model can't count for us"""
+    return len(str(message.content)) // 4 + 4
+
+
+def make_token_counter(llm):
+    """Count tokens with the model's tokenizer when it has one"""
+    def count(message):
+        try:
+            return llm.get_num_tokens_from_messages([message])
+        except Exception:
+            return approx_tokens(message)
+    return count
+
+
+def summary_message(summary):
+    return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+
+def make_memory_node(llm, max_tokens=3000, keep_recent=6, count_tokens=None):
+    """Build a graph node that keeps the conversation under max_tokens.
+
+    Token counts are cached per message id in state["token_counts"], so each
+    message is tokenized once. When the history goes over budget the oldest
+    messages (never the last keep_recent) are folded into state["summary"]
+    with one LLM call over just those messages, and removed from the state.
+    """
+    count_tokens = count_tokens or make_token_counter(llm)
+
+    def memory(state):
+        messages = state["messages"]
+        summary = state.get("summary", "")
+        counts = dict(state.get("token_counts") or {})
+        for message in messages:
+            if message.id not in counts:
+                counts[message.id] = count_tokens(message)
+
+        total = sum(counts[m.id] for m in messages) + len(summary) // 4
+        fold = []
+        while total > max_tokens and len(messages) - len(fold) > keep_recent:
+            message = messages[len(fold)]
+            fold.append(message)
+            total -= counts[message.id]
+        # don't start the kept history with an assistant reply to a folded question
+        while len(messages) - len(fold) > keep_recent and messages[len(fold)].type != "human":
+            fold.append(messages[len(fold)])
+
+        if not fold:
+            return {"token_counts": counts}
+
+        lines = "\n".join(f"{m.type}: {m.content}" for m in fold)
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(empty)", lines=lines)
+        summary = llm.invoke([HumanMessage(content=prompt)]).content
+        for message in fold:
+            counts.pop(message.id, None)
+        return {
+            "summary": summary,
+            "messages": [RemoveMessage(id=m.id) for m in fold],
+            "token_counts": counts,
+        }
+
+    return memory
+
+
+def with_summary(state):
+    """Messages to send to the LLM: the rolling summary first, then the kept turns"""
+    if state.get("summary"):
+        return [summary_message(state["summary"])] + list(state["messages"])
+    return list(state["messages"])
@@ -0,0 +1,164 @@
+import asyncio
+import re
+import time
+
+from langchain_core.messages import HumanMessage
+
+
+class SessionBusy(Exception):
+    """Raised when a session already has queue_size requests waiting"""
+
+
+class ServerBusy(Exception):
+    """Raised when max_sessions sessions are already open"""
+
+
+_DONE = object()
+
+
+class Request:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = asyncio.Queue()
+        self.created = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.task = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.task is not None:
+            self.task.cancel()
+
+
+class Session:
+    def __init__(self, thread_id, queue_size):
+        self.thread_id = thread_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.worker = None
+        self.state = None
+
+
+class ChatServer:
+    """Serve many conversation threads at once over one compiled graph.
+
+    Every thread gets a bounded request queue and a worker task, so turns of
+    one thread run in order while different threads run concurrently. A full
+    queue raises SessionBusy (backpressure); at most max_concurrency graph runs
+    are in flight across all sessions. Abandoning the token stream of a
+    request cancels its graph run.
+    """
+
+    def __init__(self, graph, store=None, queue_size=4, max_concurrency=64, max_sessions=10_000,
+                 idle_timeout=300.0, stream_node="chatbot"):
+        self.graph = graph
+        self.store = store
+        self.queue_size = queue_size
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.stream_node = stream_node
+        self.sessions = {}
+        self.completed = 0
+        self.cancelled = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def _session(self, thread_id):
+        session = self.sessions.get(thread_id)
+        if session is None:
+            if len(self.sessions) >= self.max_sessions:
+                raise ServerBusy(f"{len(self.sessions)} sessions open")
+            session = Session(thread_id, self.queue_size)
+            session.worker = asyncio.create_task(self._worker(session))
+            self.sessions[thread_id] = session
+        return session
+
+    def submit(self, thread_id, text):
+        """Queue a user turn and return its Request; tokens arrive on request.tokens"""
+        session = self._session(thread_id)
+        request = Request(text)
+        try:
+            session.queue.put_nowait(request)
+        except asyncio.QueueFull:
+            raise SessionBusy(f"thread {thread_id} has {session.queue.qsize()} pending requests") from None
+        return request
+
+    async def chat(self, thread_id, text):
+        """Async iterator over the reply tokens; closing it early cancels the turn"""
+        request = self.submit(thread_id, text)
+        try:
+            while True:
+                token = await request.tokens.get()
+                if token is _DONE:
+                    return
+                if isinstance(token, BaseException):
+                    raise token
+                yield token
+        finally:
+            if request.finished_at is None:
+                request.cancel()
+
+    async def _worker(self, session):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(session.queue.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    return
+                if request.cancelled:
+                    self.cancelled += 1
+                    continue
+                async with self._slots:
+                    request.task = asyncio.create_task(self._run(session, request))
+                    try:
+                        await request.task
+                    except asyncio.CancelledError:
+                        if not request.cancelled:
+                            raise  # the worker itself is being cancelled
+                        self.cancelled += 1
+                    except Exception as e:
+                        request.tokens.put_nowait(e)
+                    request.finished_at = time.perf_counter()
+                    request.tokens.put_nowait(_DONE)
+        finally:
+            self.sessions.pop(session.thread_id, None)
+
+    async def _load(self, session):
+        if session.state is None:
+            if self.store is not None:
+                session.state = await asyncio.to_thread(self.store.load_state, session.thread_id)
+            else:
+                session.state = {"messages": [], "summary": "", "token_counts": {}}
+        return session.state
+
+    async def _run(self, session, request):
+        before = await self._load(session)
+        state = dict(before, messages=before["messages"] + [HumanMessage(content=request.text)])
+        after = None
+        config = {"configurable": {"thread_id": session.thread_id}}
+        async for mode, payload in self.graph.astream(state, config, stream_mode=["messages", "values"]):
+            if mode == "values":
+                after = payload
+                continue
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") != self.stream_node or not chunk.content:
+                continue
+            if request.first_token_at is None:
+                request.first_token_at = time.perf_counter()
+            request.tokens.put_nowait(chunk.content)
+        if request.first_token_at is None and after["messages"][-1].type == "ai":
+            # answered without a model stream (e.g. a semantic cache hit), stream it word by word
+            for piece in re.findall(r"\S+\s*|\s+", after["messages"][-1].content):
+                if request.first_token_at is None:
+                    request.first_token_at = time.perf_counter()
+                request.tokens.put_nowait(piece)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.save_turn, session.thread_id, before, after)
+        session.state = after
+        self.completed += 1
+
+    async def close(self):
+        workers = [s.worker for s in self.sessions.values()]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
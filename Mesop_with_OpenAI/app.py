@@ -1,17 +1,21 @@
 import mesop as me
 import mesop.labs as mel
 import os
+import sys
+import uuid
 from mesop import stateclass
-from llama_index.llms.openai import OpenAI
-from llama_index.core.llms import ChatMessage
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services import reply
 
-llm = OpenAI(model="gpt-3.5-turbo", api_key="sk-") # paste your key
+# the OpenAI client, pool, cache and history store live in services.py and are
+# built once per process on first use (or by launch.py before it serves);
+# reply() is the chat turn itself
 
 
 @stateclass
 class State:
-    pass
+    session_id: str = ""
 
 @me.page(
     security_policy=me.SecurityPolicy(
@@ -24,11 +28,7 @@ def page():
     mel.chat(transform, title="Mesop Chat with OpenAI", bot_user="Mesop Bot")
 
 def transform(input: str, history: list[mel.ChatMessage]):
-    messages = [ChatMessage(role="system", content="You are a helpful assistant.")]
-    messages.extend([ChatMessage(role="user", content=message.content) for message in history])
-    messages.append(ChatMessage(role="user", content=input))
-
-    resp = llm.stream_chat(messages)
-    for r in resp:
-        if r.delta:
-            yield r.delta
+    state = me.state(State)
+    if not state.session_id:
+        state.session_id = uuid.uuid4().hex
+    yield from reply(state.session_id, input, history)
@@ -0,0 +1,139 @@
+"""Concurrent chat sessions against the local mock OpenAI server.
+
+Starts mock_openai_server.py in its own process (so its CPU does not compete
+with the client's) and streams `--sessions` concurrent conversations through
+the shared AsyncLLMPool, and through the same pool with keep-alive turned
+off, alternating the two `--repeats` times and reporting the medians.
+
+On loopback a new connection costs about a millisecond and at 100 sessions
+the client process is CPU bound, so the two modes come out close (about
+2.2 s vs 2.0 s for the defaults here, shared pool slightly behind: httpcore
+checks every idle connection whenever it assigns a request, which is why
+AsyncLLMPool splits its connections over several small clients; with one
+100-connection client the shared pool took 7 s). --connect-delay makes the
+mock charge that much per new connection, standing in for the TCP and TLS
+handshakes against a real API (tens of ms over a WAN), which is the cost
+the shared pool saves; fewer sessions keep the client from being the
+bottleneck, e.g.
+
+    python bench_sessions.py --sessions 20 --concurrency 20 --connect-delay 0.05
+    python bench_sessions.py --sessions 20 --turns 1 --server-rpm 10
+
+With --server-rpm the mock answers 429 with Retry-After up to 60 s; turns
+that are still rate limited after the pool's retries are counted, not fatal.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_pool import AsyncLLMPool, RateLimited
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def session(pool, index, turns, ttfts, totals, failures):
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"session {index} question {turn}"})
+        start = time.perf_counter()
+        first = None
+        parts = []
+        try:
+            async for delta in pool.stream_chat("mock", "gpt-3.5-turbo", messages, max_tokens=128):
+                if first is None:
+                    first = time.perf_counter()
+                parts.append(delta)
+        except RateLimited:
+            # a real UI shows an error for this turn; the session gives up
+            failures.append(index)
+            return
+        totals.append(time.perf_counter() - start)
+        ttfts.append(first - start)
+        messages.append({"role": "assistant", "content": "".join(parts)})
+
+
+async def run(args, base_url, keep_alive):
+    pool = AsyncLLMPool(max_connections=args.connections)
+    pool.add_provider("mock", base_url, "sk-mock", max_concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm)
+    if not keep_alive:
+        import httpx
+
+        # baseline: no keep-alive, every request sets up its own connection
+        pool._clients = [httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=0), timeout=pool.timeout)]
+        pool._busy = [0]
+    ttfts, totals, failures = [], [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(session(pool, i, args.turns, ttfts, totals, failures) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    await pool.aclose()
+    return {"elapsed": elapsed, "turns_per_s": len(totals) / elapsed,
+            "ttft_p50": percentile(ttfts, 50) if ttfts else float("nan"),
+            "ttft_p99": percentile(ttfts, 99) if ttfts else float("nan"),
+            "turn_p99": percentile(totals, 99) if totals else float("nan"),
+            "rate_limited": pool.stats["rate_limited"], "failed": len(failures)}
+
+
+def server_stats(base_url):
+    import httpx
+
+    return json.loads(httpx.get(base_url.rsplit("/v1", 1)[0] + "/stats").text)
+
+
+async def main(args):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_openai_server.py"),
+               "--port", str(args.port), "--first-token", str(args.first_token),
+               "--token-delay", str(args.token_delay), "--connect-delay", str(args.connect_delay)]
+    if args.server_rpm:
+        command += ["--rpm", str(args.server_rpm)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()  # "mock OpenAI API on ..."
+        base_url = f"http://127.0.0.1:{args.port}/v1"
+        results = {"shared pool": [], "no keep-alive": []}
+        connections = {label: 0 for label in results}
+        for _ in range(args.repeats):
+            # alternate, so warm-up and drift do not favour either mode
+            for label, keep_alive in (("shared pool", True), ("no keep-alive", False)):
+                before = server_stats(base_url)["connections"]
+                results[label].append(await run(args, base_url, keep_alive))
+                connections[label] += server_stats(base_url)["connections"] - before - 1
+        for label, runs in results.items():
+            def median(key):
+                return statistics.median(r[key] for r in runs)
+
+            print(f"{label:<14} {median('elapsed'):6.2f}s  {median('turns_per_s'):7.1f} turns/s  "
+                  f"ttft p50 {median('ttft_p50') * 1000:6.0f} ms p99 {median('ttft_p99') * 1000:6.0f} ms  "
+                  f"turn p99 {median('turn_p99') * 1000:6.0f} ms  "
+                  f"connections {connections[label] / len(runs):6.0f}  429s {median('rate_limited'):.0f}  "
+                  f"failed turns {median('failed'):.0f}  (median of {len(runs)})")
+        stats = server_stats(base_url)
+        print(f"mock server saw {stats['requests']} requests, rejected {stats['rejected']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8018)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=64, help="per-provider in-flight limit")
+    parser.add_argument("--rpm", type=int, default=100_000, help="client-side request budget")
+    parser.add_argument("--tpm", type=int, default=10_000_000, help="client-side token budget")
+    parser.add_argument("--server-rpm", type=int, default=None, help="make the mock return 429 above this")
+    parser.add_argument("--first-token", type=float, default=0.1)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="mock cost of each new connection")
+    asyncio.run(main(parser.parse_args()))
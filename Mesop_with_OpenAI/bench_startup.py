@@ -0,0 +1,94 @@
+"""Cold-start latency of the chat backend, offline, against the mock OpenAI server.
+
+    python bench_startup.py --runs 5 --first-token 0.1
+
+Every run is a fresh interpreter that imports services.py and answers one
+question, either lazily (the first request builds the pool, event loop and
+cache) or after services.warm(), as a launch.py worker does before it takes
+traffic. Reported: process start to first token, the first request's own
+time to first token, and warm requests after it. The import profile of
+app.py shows what a worker pays before any of that.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, ".."))
+from common.startup import cold_start, import_profile
+
+PROMPT = [("system", "You are a helpful assistant."), ("user", "What is Mesop?")]
+
+
+def child(mode, spawned, requests):
+    import services
+
+    if mode == "warm":
+        services.warm()
+    ready = time.time() - spawned
+    ttfts = []
+    first_token_at = None
+    for _ in range(requests):
+        start = time.perf_counter()
+        first = None
+        for _ in services.stream_reply(PROMPT):
+            if first is None:
+                first = time.perf_counter() - start
+                first_token_at = first_token_at or time.time() - spawned
+        ttfts.append(first)
+    print(json.dumps({"ready": ready, "to_first_token": first_token_at, "first_ttft": ttfts[0],
+                      "warm_ttft": statistics.median(ttfts[1:]) if len(ttfts) > 1 else None}))
+
+
+def run_child(mode, base_url, requests):
+    env = dict(os.environ, OPENAI_BASE_URL=base_url)
+    out = subprocess.run([sys.executable, __file__, "--child", mode, "--spawned", repr(time.time()),
+                          "--requests", str(requests)], cwd=HERE, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=6, help="requests per fresh process")
+    parser.add_argument("--port", type=int, default=8019)
+    parser.add_argument("--first-token", type=float, default=0.05)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--child", choices=("lazy", "warm"), help=argparse.SUPPRESS)
+    parser.add_argument("--spawned", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.spawned, args.requests)
+        return
+
+    app = os.path.join(HERE, "app.py")
+    print(f"cold import of app.py's modules: {cold_start(app, args.runs) * 1000:8.1f} ms (median of {args.runs})")
+    for package, seconds in import_profile(app, args.top):
+        print(f"    {package:<28} {seconds * 1000:8.1f} ms")
+
+    server = subprocess.Popen([sys.executable, os.path.join(HERE, "mock_openai_server.py"), "--port", str(args.port),
+                               "--first-token", str(args.first_token), "--token-delay", "0.001"],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()  # "mock OpenAI API on ..."
+        base_url = f"http://127.0.0.1:{args.port}/v1"
+        for mode in ("lazy", "warm"):
+            results = [run_child(mode, base_url, args.requests) for _ in range(args.runs)]
+
+            def median(key):
+                return statistics.median(r[key] for r in results) * 1000
+
+            print(f"{mode:<5} ready {median('ready'):7.1f} ms  start to first token {median('to_first_token'):7.1f} ms  "
+                  f"first request ttft {median('first_ttft'):7.1f} ms  warm ttft {median('warm_ttft'):7.1f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import threading
+from collections import OrderedDict
+
+SYSTEM_PROMPT = "You are a helpful assistant."
+
+
+def _make_counter():
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text))
+    except Exception:
+        return lambda text: len(text) // 4 + 1
+
+
+count_tokens = _make_counter()
+
+# per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+
+
+class Turn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role, content):
+        self.role = role
+        self.content = content
+        self.tokens = count_tokens(content) + MESSAGE_OVERHEAD
+
+
+def settled_history(history, user_input):
+    """The UI history without what mel.chat adds for the turn being answered.
+
+    mel.chat's submit() appends the pending user message and then an empty
+    assistant message (the one the reply streams into) before it calls the
+    transform, so both have to go before the history is compared with ours.
+    """
+    history = list(history)
+    if history and history[-1].role == "assistant" and not history[-1].content:
+        history.pop()
+    if history and history[-1].role == "user" and history[-1].content == user_input:
+        history.pop()
+    return history
+
+
+class Conversation:
+    """One chat session's history, appended to turn by turn.
+
+    Token counts are computed once per message. When the history goes over
+    the budget the window start jumps forward far enough to leave `slack`
+    of the budget free, so the prompt prefix (system prompt + oldest kept
+    turns) stays byte-identical for several turns and provider prompt
+    caching keeps hitting, instead of shifting by one message every turn.
+    """
+
+    def __init__(self, system_prompt=SYSTEM_PROMPT, max_prompt_tokens=3000, slack=0.25):
+        self.system = Turn("system", system_prompt)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.slack = slack
+        self.turns = []
+        self.start = 0
+        self.last_report = None
+
+    def sync(self, history):
+        """Rebuild from the UI history only if it no longer matches what we hold"""
+        if len(history) == len(self.turns) and all(
+            t.content == m.content for t, m in zip(self.turns[-2:], history[-2:])
+        ):
+            return
+        self.turns = [Turn("user" if m.role == "user" else "assistant", m.content) for m in history]
+        self.start = 0
+
+    def append(self, role, content):
+        self.turns.append(Turn(role, content))
+
+    def _window_tokens(self, start):
+        return self.system.tokens + sum(t.tokens for t in self.turns[start:])
+
+    def _trim(self):
+        budget = self.max_prompt_tokens
+        if self._window_tokens(self.start) <= budget:
+            return
+        target = int(budget * (1 - self.slack))
+        tokens = self._window_tokens(self.start)
+        # always keep the newest message (the pending user input)
+        while self.start < len(self.turns) - 1 and tokens > target:
+            tokens -= self.turns[self.start].tokens
+            self.start += 1
+        # never open the window on an assistant reply
+        while self.start < len(self.turns) - 1 and self.turns[self.start].role != "user":
+            self.start += 1
+
+    def prompt(self, user_input):
+        """Append the user input and return the [(role, content)] to send"""
+        self.append("user", user_input)
+        self._trim()
+        window = [self.system] + self.turns[self.start:]
+        prompt_tokens = sum(t.tokens for t in window)
+        self.last_report = {
+            "prompt_tokens": prompt_tokens,
+            "untrimmed_tokens": self._window_tokens(0),
+            "dropped_messages": self.start,
+            "history_messages": len(self.turns),
+        }
+        return [(t.role, t.content) for t in window]
+
+
+class ConversationStore:
+    """Conversations by session id, the least recently used dropped past max_sessions"""
+
+    def __init__(self, max_sessions=10_000, **conversation_kwargs):
+        self.max_sessions = max_sessions
+        self.conversation_kwargs = conversation_kwargs
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                conversation = Conversation(**self.conversation_kwargs)
+                self._sessions[session_id] = conversation
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return conversation
@@ -0,0 +1,59 @@
+"""Serve the Mesop app from a pool of warm, preforked workers.
+
+    python launch.py --workers 4 --port 8080
+
+mesop, the app module and its dependencies are imported once in the
+parent; the workers are forked from it and share one listening socket, so
+a worker that starts (or is restarted) only builds its own HTTP client,
+event loop and caches (services.warm()) before taking requests. The chat
+history is rebuilt from the UI's history whenever a request lands on a
+different worker (ConversationStore.sync), so no sticky sessions are needed.
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.startup import prefork, preload
+
+PRELOAD = ("mesop", "mesop.labs", "werkzeug.serving", "httpx", "numpy", "conversation", "services", "app")
+
+
+def warm():
+    import services
+
+    start = time.perf_counter()
+    services.warm()
+    print(f"[{os.getpid()}] services ready in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+def serve(sock):
+    import mesop as me
+    from werkzeug.serving import make_server
+
+    host, port = sock.getsockname()[:2]
+    make_server(host, port, me.create_wsgi_app(), threaded=True, fd=sock.fileno()).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    timings = preload(PRELOAD)
+    print("preloaded:", ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items() if seconds),
+          file=sys.stderr)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+    prefork(lambda index: serve(sock), workers=args.workers, warm=warm)
+
+
+if __name__ == "__main__":
+    main()
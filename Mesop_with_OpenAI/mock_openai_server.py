@@ -0,0 +1,134 @@
+"""Minimal OpenAI-compatible chat server for local benchmarks.
+
+Streams a canned reply over SSE from POST /v1/chat/completions, with a
+configurable time to first token, per-token delay and RPM limit (429 with
+Retry-After above it, in seconds until the 60 s window has room again).
+--connect-delay is paid once per new connection, standing in for the TCP and
+TLS handshakes a keep-alive client saves against a real API. GET /stats
+returns the request, rejection and connection counters. Standard library only.
+
+    python mock_openai_server.py --port 8008 --first-token 0.3 --token-delay 0.02
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+REPLY = ("Mesop is a Python UI framework that lets you build web apps quickly, "
+         "and this reply is streamed token by token from a local mock server.")
+
+
+class MockOpenAIServer:
+    def __init__(self, first_token=0.3, token_delay=0.02, rpm=None, reply=REPLY, connect_delay=0.0):
+        self.first_token = first_token
+        self.token_delay = token_delay
+        self.rpm = rpm
+        self.reply = reply
+        self.connect_delay = connect_delay
+        self.requests = 0
+        self.rejected = 0
+        self.connections = 0
+        self._recent = deque()
+
+    def _retry_after(self):
+        """None when the request fits in the RPM window, else whole seconds until it would"""
+        if self.rpm is None:
+            return None
+        now = time.monotonic()
+        while self._recent and self._recent[0] < now - 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.rpm:
+            return max(1, math.ceil(self._recent[0] + 60 - now))
+        self._recent.append(now)
+        return None
+
+    def stats(self):
+        return {"requests": self.requests, "rejected": self.rejected, "connections": self.connections}
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            await asyncio.sleep(self.connect_delay)
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                if request_line.startswith(b"GET /stats"):
+                    payload = json.dumps(self.stats()).encode()
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: "
+                                 + str(len(payload)).encode() + b"\r\n\r\n" + payload)
+                    await writer.drain()
+                    continue
+                await self._respond(writer, json.loads(body or b"{}"))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, request):
+        self.requests += 1
+        retry_after = self._retry_after()
+        if retry_after is not None:
+            self.rejected += 1
+            payload = b'{"error": {"message": "Rate limit reached", "type": "requests"}}'
+            writer.write(b"HTTP/1.1 429 Too Many Requests\r\nContent-Type: application/json\r\n"
+                         b"Retry-After: " + str(retry_after).encode() + b"\r\nContent-Length: "
+                         + str(len(payload)).encode() + b"\r\n\r\n" + payload)
+            await writer.drain()
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+        words = self.reply.split(" ")
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 4 for m in request.get("messages", []))
+        await asyncio.sleep(self.first_token)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            self._event(writer, {"choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}}]})
+            await writer.drain()
+        self._event(writer, {"choices": [], "usage": {"prompt_tokens": prompt_tokens,
+                                                      "completion_tokens": len(words),
+                                                      "total_tokens": prompt_tokens + len(words)}})
+        self._chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _event(self, writer, payload):
+        self._chunk(writer, b"data: " + json.dumps(payload).encode() + b"\n\n")
+
+    @staticmethod
+    def _chunk(writer, data):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    async def start(self, host="127.0.0.1", port=8008):
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def main(args):
+    mock = MockOpenAIServer(args.first_token, args.token_delay, args.rpm, connect_delay=args.connect_delay)
+    server = await mock.start(args.host, args.port)
+    print(f"mock OpenAI API on http://{args.host}:{args.port}/v1", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--first-token", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--rpm", type=int, default=None)
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="seconds per new connection")
+    asyncio.run(main(parser.parse_args()))
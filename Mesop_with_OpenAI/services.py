@@ -0,0 +1,149 @@
+"""Process-wide service objects for app.py, each built on first use.
+
+Nothing is created at import time. llama_index is only imported if the sync
+client is used (USE_ASYNC_POOL = False). The pool's HTTP client and event
+loop thread, the semantic cache and the conversation store are built by the
+first request, or ahead of it by warm() (launch.py calls it in every worker,
+after fork, since threads and sockets do not survive a fork).
+
+reply() is the whole chat turn behind app.py's transform, with no Mesop in
+it, so common/replay.py can drive it with a mock model injected
+(get_pool.set(make_pool(transport=...))). Like every module here it expects
+the repo root on sys.path; the entry points (app.py, launch.py, the benches)
+put it there.
+"""
+import logging
+import os
+import time
+
+from common.startup import once
+
+log = logging.getLogger(__name__)
+
+OPENAI_API_KEY = "sk-" # paste your key
+# point this at mock_openai_server.py to benchmark without the real API
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+MODEL = "gpt-3.5-turbo"
+# stream through the shared async pool instead of llama_index's sync client
+USE_ASYNC_POOL = True
+
+
+@once
+def get_llm():
+    from llama_index.llms.openai import OpenAI
+
+    return OpenAI(model=MODEL, api_key=OPENAI_API_KEY)
+
+
+def make_pool(transport=None):
+    from common.llm_pool import AsyncLLMPool
+
+    # one keep-alive HTTP client shared by every session;
+    # requests are scheduled against the account's RPM/TPM limits
+    pool = AsyncLLMPool(max_connections=100, transport=transport)
+    pool.add_provider("openai", OPENAI_BASE_URL, OPENAI_API_KEY, max_concurrency=32, rpm=3500, tpm=90_000)
+    return pool
+
+
+@once
+def get_pool():
+    return make_pool()
+
+
+@once
+def get_loop():
+    from common.llm_pool import BackgroundLoop
+
+    return BackgroundLoop()
+
+
+@once
+def get_cache():
+    from common.embeddings import default_embedder
+    from common.semantic_cache import SemanticCache
+
+    # near-duplicate questions are answered from here instead of calling the model
+    # (sentence-transformers when installed; same_terms() guards the hashing fallback)
+    return SemanticCache(default_embedder(), threshold=0.95)
+
+
+@once
+def get_conversations():
+    from conversation import ConversationStore
+
+    # per-session history with the right roles, trimmed to a prompt token budget
+    return ConversationStore(max_prompt_tokens=3000)
+
+
+@once
+def get_recorder():
+    from common.instrumentation import get_recorder
+
+    # latency, TTFT, tokens and cache hits; GENAI_TRACE / GENAI_METRICS_PORT export them
+    return get_recorder("mesop")
+
+
+def warm():
+    """Build everything the first request would, so it does not pay for it"""
+    if USE_ASYNC_POOL:
+        # httpx import and TLS context setup, otherwise paid by the first request
+        get_pool().clients
+        get_loop()
+    else:
+        get_llm()
+    get_cache().embedder.embed("warm up")
+    get_conversations()
+    get_recorder()
+
+
+def stream_reply(prompt):
+    if USE_ASYNC_POOL:
+        # Mesop's transform is a sync generator: this holds its server thread for the whole stream.
+        # No temperature is sent (a chat should not repeat itself), so these streams never coalesce.
+        messages = [{"role": role, "content": content} for role, content in prompt]
+        yield from get_loop().iterate(lambda: get_pool().stream_chat("openai", MODEL, messages))
+        return
+    from llama_index.core.llms import ChatMessage
+
+    resp = get_llm().stream_chat([ChatMessage(role=role, content=content) for role, content in prompt])
+    for r in resp:
+        if r.delta:
+            yield r.delta
+
+
+def reply(session_id, input, history):
+    """Answer one chat turn: history sync, semantic cache, then the model; yields text deltas"""
+    from common.semantic_cache import context_namespace, stream_text
+    from conversation import count_tokens, settled_history
+
+    conversation = get_conversations().get(session_id)
+    conversation.sync(settled_history(history, input))
+
+    cache = get_cache()
+    recorder = get_recorder()
+    # first questions are shared across sessions, follow-ups only within their own history
+    namespace = context_namespace([(t.role, t.content) for t in conversation.turns], scope=session_id)
+    with recorder.span("cache", "semantic_cache", app="mesop", input=input, session=session_id) as span:
+        hit = cache.lookup(input, namespace=namespace)
+        span.hit(hit is not None)
+    if hit is not None:
+        log.debug("semantic cache hit (%.2f), saved ~%.2fs; %s", hit.similarity, hit.saved_seconds or 0, cache.stats())
+        conversation.append("user", input)
+        conversation.append("assistant", hit.answer)
+        yield from stream_text(hit.answer)
+        return
+
+    started = time.perf_counter()
+    parts = []
+    prompt = conversation.prompt(input)
+    log.debug("prompt tokens: %s", conversation.last_report)
+
+    with recorder.span("llm", MODEL, app="mesop", input=prompt, session=session_id) as span:
+        span.tokens(prompt=conversation.last_report["prompt_tokens"])
+        for delta in span.stream(stream_reply(prompt)):
+            parts.append(delta)
+            yield delta
+        span.tokens(completion=count_tokens("".join(parts)))
+    answer = "".join(parts)
+    conversation.append("assistant", answer)
+    cache.store(input, answer, latency=time.perf_counter() - started, namespace=namespace)
@@ -0,0 +1,87 @@
+"""Drive the chat transform the way mesop.labs.chat's submit() does.
+
+    python -m pytest Mesop_with_OpenAI/test_app.py -q
+
+submit() appends the user message and an empty assistant message to the
+output, calls the transform with that list, and streams the deltas into the
+assistant message. Across turns the conversation has to be extended in place
+(not rebuilt from the UI history) and the prompt has to hold each turn once.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# services.py imports common/ from the repo root
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+from conversation import Conversation, settled_history
+
+
+def message(role, content=""):
+    return SimpleNamespace(role=role, content=content)
+
+
+def submit(output, user_input, transform):
+    """What mel.chat's submit() does around the transform"""
+    output.append(message("user", user_input))
+    output.append(message("assistant"))
+    for delta in transform(user_input, output):
+        output[-1].content += delta
+
+
+def test_settled_history_drops_pending_turn():
+    history = [message("user", "hi"), message("assistant", "hello"), message("user", "again"), message("assistant")]
+    assert [(m.role, m.content) for m in settled_history(history, "again")] == [("user", "hi"), ("assistant", "hello")]
+    # a finished assistant message is history, not the pending turn
+    assert len(settled_history(history[:2], "hi")) == 2
+
+
+def test_conversation_is_extended_not_rebuilt():
+    conversation = Conversation()
+    prompts = []
+
+    def transform(user_input, history):
+        conversation.sync(settled_history(history, user_input))
+        prompts.append(conversation.prompt(user_input))
+        answer = f"answer to {user_input}"
+        conversation.append("assistant", answer)
+        yield answer
+
+    output = []
+    submit(output, "first", transform)
+    turns = conversation.turns
+    submit(output, "second", transform)
+    submit(output, "third", transform)
+
+    assert conversation.turns is turns
+    assert prompts[-1] == [
+        ("system", conversation.system.content),
+        ("user", "first"), ("assistant", "answer to first"),
+        ("user", "second"), ("assistant", "answer to second"),
+        ("user", "third"),
+    ]
+
+
+def test_app_transform(monkeypatch):
+    pytest.importorskip("mesop")
+    import app
+    import services
+
+    state = app.State()
+    prompts = []
+
+    def stream_reply(prompt):
+        prompts.append(prompt)
+        yield f"reply {len(prompts)}"
+
+    monkeypatch.setattr(app.me, "state", lambda cls: state)
+    monkeypatch.setattr(services, "stream_reply", stream_reply)
+    output = []
+    for question in ("What is Mesop?", "Who maintains the Rust compiler?", "How fast is SQLite?"):
+        submit(output, question, app.transform)
+
+    assert output[-1].content == "reply 3"
+    assert [role for role, _ in prompts[-1]] == ["system", "user", "assistant", "user", "assistant", "user"]
+    assert prompts[-1][-1] == ("user", "How fast is SQLite?")
@@ -63,6 +63,27 @@ Classification:"""
 chain.invoke({"question": "4-9"})
 ##ans: subtraction
 ##################################################################################
+#case3: tiered classifier (classifier.py), rules and a small local model first, gpt-4o only when unsure
+
+# the repo's common/ folder has to be importable too (upload it next to this notebook)
+import sys
+sys.path.append("..")
+from classifier import SoftmaxClassifier, TieredClassifier
+
+#train on questions the LLM has already labelled, e.g. [("add 3 and 4", "Addition"), ("4-9", "Subtraction"), ...]
+labelled = [("add 3 and 4", "Addition"), ("4-9", "Subtraction"), ("3 times 5", "Multiplication"), ("10 / 2", "Other")]
+model = SoftmaxClassifier().fit([q for q, _ in labelled], [label for _, label in labelled])
+classifier = TieredClassifier(model, llm_chain=chain, threshold=0.8)
+#keep llm_chain: rules + model alone got 54% of bench_classifier.py's hand-written held-out questions right,
+#the model tier only saves gpt-4o calls on phrasings like its training data, it does not replace the LLM tier
+
+classifier.classify("add 3 and 4")
+##ans: ('Addition', 'rules')
+
+classifier.classify_batch(["4-9", "what is 6 x 7", "Tom had 5 apples and ate 2, how many are left"])
+##ans: [('Subtraction', 'model'), ('Multiplication', 'rules'), ('Subtraction', 'rules')]
+#"4-9" is left to the model: a bare digit-dash-digit could be a range or a phone number, so the rules stay below 0.8
+##################################################################################
 
 
 
@@ -278,3 +299,52 @@ LLM called:
 LLM output: 
  Shipwrecked surgeon Lemuel Gulliver finds himself on extraordinary adventures.  In Lilliput, he's a giant among tiny people. In Brobdingnag, he's a miniature marvel to giants. He encounters the flying island of Laputa, ruled by absent-minded intellectuals, and finally, the immortal but miserable Struldbrugs. Through his travels, Gulliver experiences the best and worst of humanity, leaving him forever changed. 
 """
+
+###############
+#LOCAL ROUTER
+#router.py picks the provider in-process (well under a millisecond) from logged outcomes,
+#and only asks NotDiamond when it is not confident. Upload router.py next to this notebook.
+
+import random
+import time
+from router import LocalRouter, OutcomeLog, estimate_cost, judge_quality, make_llm, notdiamond_fallback
+
+log = OutcomeLog("routing_log.jsonl")
+#a cheap model scores this fraction of answers 0..1, which is what the router learns quality from
+judge = make_llm("openai/gpt-3.5-turbo-0125")
+JUDGE_RATE = 0.2
+router = LocalRouter(llm_providers, fallback=notdiamond_fallback(client, llm_providers)).fit(log.load())
+
+messages = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "Summarize the Gullivers' story in 30 words"}
+]
+decision = router.route(messages, tradeoff="cost")
+
+start = time.perf_counter()
+result = make_llm(decision.provider).invoke([(m["role"], m["content"]) for m in messages])
+latency = time.perf_counter() - start
+
+#unjudged calls still train latency and cost; user feedback (0..1) can be logged later the same way:
+#log.record(prompt, provider, quality=score)
+quality = judge_quality(judge, messages[-1]["content"], result.content) if random.random() < JUDGE_RATE else None
+log.record(messages[-1]["content"], decision.provider, quality=quality, latency=latency,
+           cost=estimate_cost(decision.provider, result.usage_metadata or {}))
+
+print("LLM called: \n", decision)
+print("\nLLM output: \n", result.content)
+
+###############
+#HEDGED REQUESTS (hedging.py)
+#for latency-critical traffic: ask the routed provider first, and the next candidate too if no token
+#has arrived by the provider's p95 time to first token; the slower one is cancelled
+
+from hedging import HedgeBudget, HedgedClient, langchain_stream
+
+hedged = HedgedClient(langchain_stream(make_llm), percentile=95, budget=HedgeBudget(ratio=0.05))
+candidates = [decision.provider] + [p for p in llm_providers if p != decision.provider]
+
+async for delta in hedged.stream(messages, candidates):
+    print(delta, end="")
+
+hedged.stats
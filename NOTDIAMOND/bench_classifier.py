@@ -0,0 +1,184 @@
+"""Accuracy vs latency for each tier of the arithmetic classifier.
+
+Questions are generated from templates; the model tier is trained on one
+set of templates and scored on held-out phrasings. The keyword rules were
+written alongside those templates, so HELD_OUT adds hand-written questions
+neither was tuned on (conflicting cues, "each"/"times" in division, numbers
+that are not arithmetic); a rule counts only at or above --threshold, as in
+TieredClassifier. Pass --llm to also run the gpt-4o chain (needs
+OPENAI_API_KEY) on a sample of the questions.
+
+    python bench_classifier.py --questions 5000
+    python bench_classifier.py --llm --llm-sample 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from classifier import LABELS, SoftmaxClassifier, TieredClassifier, classify_rules, make_llm_chain
+
+WORDS = ["one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten"]
+
+TEMPLATES = {
+    "Addition": {
+        "train": ["add {a} and {b}", "{a} + {b}", "what is {a} plus {b}", "sum of {a} and {b}",
+                  "Tom has {a} apples and gets {b} more, how many does he have now",
+                  "put {a} and {b} together", "{a} and {b} makes how much"],
+        "test": ["what do you get if you combine {a} with {b}", "{a}+{b}=?", "increase {a} by {b}",
+                 "Sara had {a} pens and found {b} more. How many now?", "{a} together with {b}"],
+    },
+    "Subtraction": {
+        "train": ["subtract {b} from {a}", "{a} - {b}", "what is {a} minus {b}", "difference between {a} and {b}",
+                  "Tom had {a} apples and ate {b}, how many are left", "take {b} away from {a}",
+                  "{a} less {b}"],
+        "test": ["{a}-{b}", "if you remove {b} from {a} what remains",
+                 "Sara had {a} pens and lost {b}. How many now?", "reduce {a} by {b}", "{a} take away {b}"],
+    },
+    "Multiplication": {
+        "train": ["multiply {a} and {b}", "{a} * {b}", "what is {a} times {b}", "product of {a} and {b}",
+                  "{a} boxes with {b} apples each, how many apples", "{a} x {b}", "{a} groups of {b}"],
+        "test": ["{a}*{b}", "{a} rows of {b} chairs, how many chairs",
+                 "what is {a} lots of {b}", "{a} multiplied by {b}", "{b} packs of {a} cards each, total cards"],
+    },
+    "Other": {
+        "train": ["divide {a} by {b}", "{a} / {b}", "what is the square root of {a}", "who is the first president of USA",
+                  "split {a} cookies between {b} kids", "what is {a} to the power of {b}",
+                  "summarize the gullivers story in 30 words"],
+        "test": ["{a}/{b}", "share {a} sweets equally among {b} friends", "what is {a} percent of {b}",
+                 "what is the temperature at New Delhi", "give me python code for 2 sum problem"],
+    },
+}
+
+HELD_OUT = [
+    ("split 12 apples so each of 3 kids gets the same", "Other"),
+    ("how many times does 3 go into 12", "Other"),
+    ("call 555-1234", "Other"),
+    ("my flight is 2024-05-01, what time should I leave", "Other"),
+    ("each ticket costs 7 dollars, what do 4 tickets cost", "Multiplication"),
+    ("4 friends share a 20 dollar bill, how much does each get", "Other"),
+    ("how many times bigger is 40 than 8", "Other"),
+    ("a car goes 60 km each hour, how far in 3 hours", "Multiplication"),
+    ("I had 9 marbles and gave each of my 2 friends 3, how many do I have", "Subtraction"),
+    ("a dozen eggs times 5 cartons", "Multiplication"),
+    ("what is 8 more than 15", "Addition"),
+    ("15 is how much more than 8", "Subtraction"),
+    ("double 21", "Multiplication"),
+    ("the team scored 3 goals in the first half and 2 in the second, total goals", "Addition"),
+    ("what is the average of 4, 8 and 12", "Other"),
+    ("room 101 is on which floor", "Other"),
+    ("what is 7 and 5 combined", "Addition"),
+    ("after spending 30 of my 100 dollars, what is left", "Subtraction"),
+    ("how many legs do 6 spiders have", "Multiplication"),
+    ("I read 12 pages on monday and 9 on tuesday, how many pages", "Addition"),
+    ("what's 3 x 7", "Multiplication"),
+    ("give me 3 tips for learning python", "Other"),
+    ("how many times did the beatles play in hamburg", "Other"),
+    ("each of the 5 shelves holds 8 books, how many books", "Multiplication"),
+]
+
+
+def make_questions(split, n, rng):
+    rows = []
+    for _ in range(n):
+        label = rng.choice(LABELS)
+        a, b = rng.randint(2, 99), rng.randint(2, 20)
+        if rng.random() < 0.2:
+            a, b = rng.choice(WORDS), rng.choice(WORDS)
+        rows.append((rng.choice(TEMPLATES[label][split]).format(a=a, b=b), label))
+    return rows
+
+
+def report(name, predictions, labels, seconds, covered=None):
+    scored = [(p, l) for p, l in zip(predictions, labels) if p is not None]
+    accuracy = sum(p == l for p, l in scored) / max(len(scored), 1)
+    coverage = len(scored) / len(labels)
+    print(f"{name:<22} accuracy {accuracy:6.1%}  coverage {coverage:6.1%}  "
+          f"{seconds / len(labels) * 1e6:8.1f} us/question{'' if covered is None else '  ' + covered}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--train", type=int, default=3000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--llm", action="store_true")
+    parser.add_argument("--llm-sample", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    train = make_questions("train", args.train, rng)
+    test = make_questions("test", args.questions, rng)
+    questions, labels = [q for q, _ in test], [l for _, l in test]
+
+    start = time.perf_counter()
+    model = SoftmaxClassifier().fit([q for q, _ in train], [l for _, l in train])
+    print(f"model trained on {len(train)} questions in {time.perf_counter() - start:.2f}s\n")
+
+    def rules_at(ruled):
+        return [r[0] if r is not None and r[1] >= args.threshold else None for r in ruled]
+
+    start = time.perf_counter()
+    ruled = [classify_rules(q) for q in questions]
+    report("rules", rules_at(ruled), labels, time.perf_counter() - start)
+
+    model.embedder.embed.cache_clear()
+    start = time.perf_counter()
+    proba = model.predict_proba(questions)
+    report("model (batch)", [LABELS[i] for i in proba.argmax(axis=1)], labels, time.perf_counter() - start)
+
+    confident = proba.max(axis=1) >= args.threshold
+    report(f"model (p >= {args.threshold})", [LABELS[i] if c else None for i, c in zip(proba.argmax(axis=1), confident)],
+           labels, time.perf_counter() - start)
+
+    model.embedder.embed.cache_clear()
+    tiered = TieredClassifier(model, threshold=args.threshold)
+    start = time.perf_counter()
+    results = tiered.classify_batch(questions)
+    report("rules + model (batch)", [label for label, _ in results], labels, time.perf_counter() - start,
+           f"tiers {tiered.stats}")
+
+    # how many would reach the LLM if it were configured
+    unsure = proba.max(axis=1) < args.threshold
+    escalated = sum(1 for r, u in zip(rules_at(ruled), unsure) if r is None and u)
+    print(f"{'':<22} {escalated} of {len(questions)} questions ({escalated / len(questions):.1%}) would go to the LLM")
+
+    print(f"\n{len(HELD_OUT)} hand-written held-out questions")
+    held_questions, held_labels = [q for q, _ in HELD_OUT], [l for _, l in HELD_OUT]
+    start = time.perf_counter()
+    held_ruled = [classify_rules(q) for q in held_questions]
+    report("rules", rules_at(held_ruled), held_labels, time.perf_counter() - start)
+    held_proba = model.predict_proba(held_questions)
+    held_unsure = held_proba.max(axis=1) < args.threshold
+    tiered = TieredClassifier(model, threshold=args.threshold)
+    start = time.perf_counter()
+    results = tiered.classify_batch(held_questions)
+    report("rules + model (batch)", [label for label, _ in results], held_labels, time.perf_counter() - start,
+           f"tiers {tiered.stats}")
+    for question, label, ruled_label, (got, tier), unsure in zip(held_questions, held_labels, rules_at(held_ruled),
+                                                                 results, held_unsure):
+        if ruled_label is not None and ruled_label != label:
+            print(f"{'':<22} rules wrong: {question!r} -> {ruled_label}, expected {label}")
+        elif ruled_label is None and unsure:
+            print(f"{'':<22} to the LLM:  {question!r}")
+    escalated = sum(1 for r, u in zip(rules_at(held_ruled), held_unsure) if r is None and u)
+    print(f"{'':<22} {escalated} of {len(HELD_OUT)} would go to the LLM")
+
+    if args.llm:
+        sample = rng.sample(test, args.llm_sample)
+        chain = make_llm_chain()
+        llm_only = TieredClassifier(llm_chain=chain)
+        start = time.perf_counter()
+        answers = chain.batch([{"question": q} for q, _ in sample], config={"max_concurrency": 8})
+        from classifier import normalize_label
+
+        report("llm only (batch of 8)", [normalize_label(a) for a in answers], [l for _, l in sample],
+               time.perf_counter() - start)
+        full = TieredClassifier(model, chain, threshold=args.threshold)
+        start = time.perf_counter()
+        results = full.classify_batch([q for q, _ in sample])
+        report("all tiers", [label for label, _ in results], [l for _, l in sample],
+               time.perf_counter() - start, f"tiers {full.stats}")
@@ -0,0 +1,83 @@
+"""p50/p99 with and without hedging against simulated providers.
+
+Each simulated provider has a lognormal time to first token and, with
+probability --stall, stalls for --stall-seconds before answering, which is
+what sets the tail in practice.
+
+    python bench_hedging.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from hedging import HedgeBudget, HedgedClient
+
+PROVIDERS = ["openai/gpt-3.5-turbo-0125", "google/gemini-1.5-pro-latest"]
+
+
+def simulated(args, rng):
+    median = {PROVIDERS[0]: args.ttft, PROVIDERS[1]: args.ttft * 1.5}
+
+    async def call(provider, messages):
+        ttft = median[provider] * rng.lognormvariate(0, 0.3)
+        if rng.random() < args.stall:
+            ttft += args.stall_seconds
+        await asyncio.sleep(ttft)
+        for i in range(args.tokens):
+            if i:
+                await asyncio.sleep(args.token_delay)
+            yield f"token{i} "
+
+    return call
+
+
+async def run(label, args, hedge):
+    rng = random.Random(args.seed)
+    budget = HedgeBudget(ratio=args.budget, burst=10) if hedge else HedgeBudget(ratio=0, burst=0)
+    client = HedgedClient(simulated(args, rng), percentile=args.percentile,
+                          initial_deadline=args.ttft * 3, budget=budget)
+    ttfts, totals = [], []
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with slots:
+            start = time.perf_counter()
+            first = None
+            async for _ in client.stream([{"role": "user", "content": f"question {i}"}], PROVIDERS):
+                if first is None:
+                    first = time.perf_counter() - start
+            ttfts.append(first)
+            totals.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    ttfts, totals = np.array(ttfts) * 1000, np.array(totals) * 1000
+    stats = client.stats
+    print(f"{label:<10} ttft p50 {np.percentile(ttfts, 50):6.0f} ms  p99 {np.percentile(ttfts, 99):6.0f} ms  "
+          f"total p99 {np.percentile(totals, 99):6.0f} ms  "
+          f"hedged {stats['hedged'] / stats['requests']:5.1%}  backup won {stats['backup_won']}")
+
+
+async def main(args):
+    await run("no hedge", args, hedge=False)
+    await run("hedged", args, hedge=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--ttft", type=float, default=0.05, help="median time to first token of the preferred provider")
+    parser.add_argument("--stall", type=float, default=0.03, help="probability of a stalled request")
+    parser.add_argument("--stall-seconds", type=float, default=1.0)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--budget", type=float, default=0.1, help="hedges allowed per request")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
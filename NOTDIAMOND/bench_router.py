@@ -0,0 +1,93 @@
+"""Routing accuracy and latency of LocalRouter on synthetic outcomes.
+
+Prompts come from a few task families; each provider has its own quality,
+latency and cost per family plus noise. The router is trained on a log of
+random (prompt, provider) outcomes and scored against the oracle choice on
+held-out prompts.
+
+    python bench_router.py --train 3000 --test 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from router import LocalRouter
+
+PROVIDERS = ["openai/gpt-3.5-turbo-0125", "google/gemini-1.5-pro-latest"]
+
+FAMILIES = {
+    "code": ["give me python code for {} problem", "write a function that solves {}", "implement {} in python"],
+    "facts": ["who is the first {} of USA", "what is the capital of {}", "when was {} founded"],
+    "summary": ["summarize the {} story in 30 words", "give a short summary of {}", "tl;dr of {}"],
+    "math": ["add {} and 4", "what is {} times 7", "subtract 3 from {}"],
+}
+SUBJECTS = ["two sum", "gulliver", "france", "president", "binary search", "hamlet", "12", "the moon", "linked list"]
+
+# (quality, latency s, cost $) per provider per family
+PROFILE = {
+    "code": [(0.70, 1.2, 0.002), (0.85, 2.5, 0.010)],
+    "facts": [(0.80, 0.6, 0.001), (0.82, 1.5, 0.006)],
+    "summary": [(0.75, 1.0, 0.002), (0.88, 2.0, 0.009)],
+    "math": [(0.90, 0.4, 0.001), (0.86, 1.0, 0.004)],
+}
+
+
+def sample_prompt(rng):
+    family = rng.choice(list(FAMILIES))
+    return family, rng.choice(FAMILIES[family]).format(rng.choice(SUBJECTS))
+
+
+def outcome(rng, family, j):
+    quality, latency, cost = PROFILE[family][j]
+    return quality + rng.gauss(0, 0.05), latency * rng.uniform(0.8, 1.3), cost * rng.uniform(0.9, 1.1)
+
+
+def oracle(family, tradeoff, tolerance):
+    profile = PROFILE[family]
+    best = max(range(len(profile)), key=lambda j: profile[j][0])
+    if tradeoff is None:
+        return best
+    index = {"latency": 1, "cost": 2}[tradeoff]
+    acceptable = [j for j in range(len(profile)) if profile[j][0] >= profile[best][0] - tolerance]
+    return min(acceptable, key=lambda j: profile[j][index])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", type=int, default=3000)
+    parser.add_argument("--test", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    log = []
+    for _ in range(args.train):
+        family, prompt = sample_prompt(rng)
+        j = rng.randrange(len(PROVIDERS))
+        quality, latency, cost = outcome(rng, family, j)
+        log.append({"prompt": prompt, "provider": PROVIDERS[j], "quality": quality, "latency": latency, "cost": cost})
+
+    start = time.perf_counter()
+    router = LocalRouter(PROVIDERS, fallback=lambda messages, tradeoff: PROVIDERS[0]).fit(log)
+    print(f"trained on {len(log)} outcomes in {time.perf_counter() - start:.2f}s")
+
+    tests = [sample_prompt(rng) for _ in range(args.test)]
+    for tradeoff in (None, "cost", "latency"):
+        correct, remote, timings = 0, 0, []
+        for family, prompt in tests:
+            decision = router.route([{"role": "user", "content": prompt}], tradeoff)
+            timings.append(decision.seconds)
+            if decision.source == "remote":
+                remote += 1
+            elif decision.provider == PROVIDERS[oracle(family, tradeoff, router.tolerance)]:
+                correct += 1
+        local = len(tests) - remote
+        timings = np.array(timings) * 1e6
+        print(f"tradeoff={str(tradeoff):<8} local accuracy {correct / max(local, 1):6.1%}  "
+              f"remote fallback {remote / len(tests):6.1%}  "
+              f"route p50 {np.percentile(timings, 50):5.0f}us p99 {np.percentile(timings, 99):5.0f}us")
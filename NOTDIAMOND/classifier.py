@@ -0,0 +1,213 @@
+"""Tiered classifier for the "addition / subtraction / multiplication / other" chain.
+
+    tier "rules"  keyword regexes and an ast parse of inline expressions ("4 - 9")
+    tier "model"  softmax regression on hashed text features, trained locally
+    tier "llm"    the original PromptTemplate | ChatOpenAI | StrOutputParser chain
+
+A question only moves on to the next tier when the current one is not sure,
+so the gpt-4o round trip is paid for the ambiguous cases only.
+classify_batch() runs every tier over a whole list at once: one matrix
+product for the model tier and chain.batch() for what is left.
+"""
+import ast
+import re
+
+import numpy as np
+
+from common.embeddings import HashingEmbedder
+
+LABELS = ("Addition", "Subtraction", "Multiplication", "Other")
+
+PROMPT = """Given the user mathematical problem ,  classify them either addition or subtraction or multiplication or other category.
+
+Do not respond with more than one word.
+
+<question>
+{question}
+</question>
+
+Classification:"""
+
+KEYWORDS = {
+    "Addition": r"\b(add|adding|added|plus|sum of|altogether|combined|increased? by)\b",
+    "Subtraction": r"\b(subtract|subtracting|subtracted|minus|difference|take away|decreased? by|how many (more|left)|(are|is) left|left over|remain(s|ing)?)\b",
+    "Multiplication": r"\b(multiply|multiplied|multiplying|times|product|twice|double|triple|each)\b",
+    "Other": r"\b(divide|divided|division|quotient|square root|sqrt|power|percent|percentage|average|mean|modulo|remainder|split|share|shared|equally|go(es)? into)\b",
+}
+KEYWORD_RES = {label: re.compile(pattern, re.IGNORECASE) for label, pattern in KEYWORDS.items()}
+# cues that also show up in other operations ("each of 3 kids gets the same",
+# "how many times does 3 go into 12"); on their own they are only a hint
+AMBIGUOUS = re.compile(r"\b(each|times)\b", re.IGNORECASE)
+# "555-1234", "2024-05-01", "3-5 days": a dash between digits is not always a minus
+BARE_DASH = re.compile(r"^\s*\d+(-\d+)+\s*$")
+NUMBER_WORDS = r"\b(zero|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|twenty|hundred|thousand)\b"
+HAS_NUMBER = re.compile(rf"\d|{NUMBER_WORDS}", re.IGNORECASE)
+# "3 times 4" is multiplication, "how many times does 3 go into 12" is not
+NUMBER_TIMES_NUMBER = re.compile(rf"(\d|{NUMBER_WORDS})\s+times\s+(\d|{NUMBER_WORDS})", re.IGNORECASE)
+EXPRESSION = re.compile(r"[\d.(][\d.\s()+\-*/x×÷^]*[\d.)]")
+OPERATORS = {ast.Add: "Addition", ast.Sub: "Subtraction", ast.Mult: "Multiplication"}
+SYMBOLS = {"+": " plus ", "-": " minus ", "*": " times ", "x": " times ", "×": " times ", "/": " divided ", "÷": " divided "}
+
+
+def parse_expression(question):
+    """(label, text) of the top-level operator of an inline arithmetic expression, or None"""
+    for match in EXPRESSION.finditer(question):
+        text = match.group(0).replace("×", "*").replace("x", "*").replace("÷", "/").replace("^", "**")
+        if not re.search(r"\d\s*[-+*/]", text):
+            continue
+        try:
+            node = ast.parse(text.strip(), mode="eval").body
+        except SyntaxError:
+            continue
+        if isinstance(node, ast.BinOp):
+            return OPERATORS.get(type(node.op), "Other"), match.group(0)
+    return None
+
+
+def _only_ambiguous(label, question):
+    """True when every cue for label in the question is an ambiguous word"""
+    if label == "Multiplication" and NUMBER_TIMES_NUMBER.search(question):
+        return False
+    return all(AMBIGUOUS.fullmatch(m.group(0)) for m in KEYWORD_RES[label].finditer(question))
+
+
+def classify_rules(question):
+    """(label, confidence): 0.9 and up when the rules are sure, lower when cues conflict or are ambiguous.
+
+    None when they have nothing to go on. TieredClassifier only takes a rule
+    label at or above its threshold and passes the rest on to the next tier.
+    """
+    parsed = parse_expression(question)
+    matched = {label for label, regex in KEYWORD_RES.items() if regex.search(question)}
+    if parsed is not None:
+        label, text = parsed
+        if matched - {label}:
+            # "12 - 3, how many each": the words disagree with the symbol
+            return label, 0.5
+        if not matched and BARE_DASH.match(text):
+            return label, 0.6
+        return label, 1.0
+    if len(matched) > 1:
+        # several operations' cues: a guess, but not one to stop at
+        return next(label for label in LABELS if label in matched), 0.5
+    if len(matched) == 1:
+        label = next(iter(matched))
+        return label, 0.6 if _only_ambiguous(label, question) else 0.9
+    if not HAS_NUMBER.search(question):
+        # no numbers and no arithmetic words: not an arithmetic problem
+        return "Other", 0.9
+    return None
+
+
+def spell_symbols(question):
+    """Operators as words, so the word-based embedder sees them"""
+    return re.sub(r"(?<=[\d\s])[x×](?=[\d\s])|[+\-*/÷]", lambda m: SYMBOLS[m.group(0)], question)
+
+
+class SoftmaxClassifier:
+    """Multinomial logistic regression on HashingEmbedder features"""
+
+    def __init__(self, embedder=None, l2=1e-3):
+        self.embedder = embedder or HashingEmbedder()
+        self.l2 = l2
+        self.weights = np.zeros((self.embedder.dim + 1, len(LABELS)), np.float32)
+
+    def features(self, questions):
+        X = self.embedder.embed_many([spell_symbols(q) for q in questions])
+        return np.hstack([X, np.ones((len(X), 1), np.float32)])
+
+    def fit(self, questions, labels, epochs=300, lr=2.0):
+        X = self.features(questions)
+        Y = np.zeros((len(labels), len(LABELS)), np.float32)
+        Y[np.arange(len(labels)), [LABELS.index(label) for label in labels]] = 1
+        W = np.zeros_like(self.weights)
+        for _ in range(epochs):
+            P = self._softmax(X @ W)
+            W -= lr * (X.T @ (P - Y) / len(X) + self.l2 * W)
+        self.weights = W
+        return self
+
+    @staticmethod
+    def _softmax(Z):
+        Z = Z - Z.max(axis=1, keepdims=True)
+        E = np.exp(Z)
+        return E / E.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, questions):
+        return self._softmax(self.features(questions) @ self.weights)
+
+    def save(self, path):
+        np.save(path, self.weights)
+
+    def load(self, path):
+        self.weights = np.load(path)
+        return self
+
+
+def normalize_label(text):
+    """Map the LLM's one-word answer onto LABELS"""
+    word = text.strip().strip(".").lower()
+    for label in LABELS:
+        if word.startswith(label.lower()[:5]):
+            return label
+    return "Other"
+
+
+def make_llm_chain(model="gpt-4o"):
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from langchain_openai import ChatOpenAI
+
+    return PromptTemplate.from_template(PROMPT) | ChatOpenAI(model=model) | StrOutputParser()
+
+
+class TieredClassifier:
+    def __init__(self, model=None, llm_chain=None, threshold=0.8, max_concurrency=8):
+        self.model = model
+        self.llm_chain = llm_chain
+        self.threshold = threshold
+        self.max_concurrency = max_concurrency
+        self.stats = {"rules": 0, "model": 0, "llm": 0}
+
+    def classify(self, question):
+        """(label, tier)"""
+        return self.classify_batch([question])[0]
+
+    def classify_batch(self, questions):
+        """[(label, tier)] for every question, each tier run once over what is left"""
+        results = [None] * len(questions)
+        guesses = {}
+        pending = []
+        for i, question in enumerate(questions):
+            ruled = classify_rules(question)
+            if ruled is not None and ruled[1] >= self.threshold:
+                results[i] = (ruled[0], "rules")
+            else:
+                if ruled is not None:
+                    guesses[i] = ruled[0]
+                pending.append(i)
+        self.stats["rules"] += len(questions) - len(pending)
+
+        if pending and self.model is not None:
+            proba = self.model.predict_proba([questions[i] for i in pending])
+            best = proba.argmax(axis=1)
+            confident = proba[np.arange(len(pending)), best] >= self.threshold
+            # without an LLM the model has the last word, confident or not
+            for i, label, sure in zip(pending, best, confident):
+                if sure or self.llm_chain is None:
+                    results[i] = (LABELS[label], "model")
+            pending = [i for i in pending if results[i] is None]
+            self.stats["model"] += int(len(best) - len(pending))
+
+        if pending and self.llm_chain is not None:
+            answers = self.llm_chain.batch([{"question": questions[i]} for i in pending],
+                                           config={"max_concurrency": self.max_concurrency})
+            for i, answer in zip(pending, answers):
+                results[i] = (normalize_label(answer), "llm")
+            self.stats["llm"] += len(pending)
+            pending = []
+
+        for i in pending:
+            # no tier was sure and none is left: the rules' guess beats a blind default
+            results[i] = (guesses[i], "rules") if i in guesses else ("Other", "default")
+        return results
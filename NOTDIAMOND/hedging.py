@@ -0,0 +1,190 @@
+"""Hedged requests across the candidate providers.
+
+The preferred provider is asked first. If its first token has not arrived
+by that provider's p95 time to first token, the same request goes to the
+next candidate as well; whichever starts streaming first wins and the
+other is cancelled. Deadlines come from per-provider TTFT histograms kept
+online, so they follow each provider as it speeds up or slows down, and a
+budget caps hedges to a fraction of traffic so a general slowdown does not
+double the bill.
+"""
+import asyncio
+import math
+import time
+
+import numpy as np
+
+from common.instrumentation import get_recorder
+
+
+class LatencyHistogram:
+    """Log-bucketed latencies with exponential decay, so old samples fade out"""
+
+    def __init__(self, low=0.001, high=120.0, growth=1.05, decay=0.999):
+        self.low = low
+        self.growth = growth
+        self.decay = decay
+        self.buckets = np.zeros(int(math.log(high / low, growth)) + 2)
+        self.count = 0
+
+    def observe(self, seconds):
+        index = int(math.log(max(seconds, self.low) / self.low, self.growth)) + 1
+        self.buckets *= self.decay
+        self.buckets[min(index, len(self.buckets) - 1)] += 1.0
+        self.count += 1
+
+    def percentile(self, p):
+        total = self.buckets.sum()
+        if not total:
+            return None
+        index = int(np.searchsorted(np.cumsum(self.buckets), total * p / 100))
+        # upper edge of the bucket
+        return self.low * self.growth ** index
+
+
+class HedgeBudget:
+    """Each request earns `ratio` of a hedge, each hedge spends one; at most `burst` saved up"""
+
+    def __init__(self, ratio=0.05, burst=10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def earn(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self):
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class _Attempt:
+    def __init__(self, provider, stream):
+        self.provider = provider
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.first = asyncio.ensure_future(stream.__anext__())
+
+    async def cancel(self):
+        self.first.cancel()
+        try:
+            await self.stream.aclose()
+        except (RuntimeError, asyncio.CancelledError):
+            pass
+
+
+class HedgedClient:
+    """Race the preferred provider against a delayed backup.
+
+    call(provider, messages) must return an async iterator of text deltas,
+    e.g. langchain_stream below.
+    """
+
+    def __init__(self, call, percentile=95, initial_deadline=2.0, min_samples=20, budget=None):
+        self.call = call
+        self.percentile = percentile
+        self.initial_deadline = initial_deadline
+        self.min_samples = min_samples
+        self.budget = budget or HedgeBudget()
+        self.histograms = {}
+        self.stats = {"requests": 0, "hedged": 0, "backup_won": 0, "over_budget": 0, "failed_over": 0}
+        self.recorder = get_recorder("notdiamond")
+
+    def histogram(self, provider):
+        return self.histograms.setdefault(provider, LatencyHistogram())
+
+    def deadline(self, provider):
+        histogram = self.histogram(provider)
+        if histogram.count < self.min_samples:
+            return self.initial_deadline
+        return histogram.percentile(self.percentile)
+
+    def _hedge(self, attempts, backups, messages):
+        backup = next(backups, None)
+        if backup is None:
+            return
+        if not self.budget.spend():
+            self.stats["over_budget"] += 1
+            return
+        self.stats["hedged"] += 1
+        attempts.append(_Attempt(backup, self.call(backup, messages)))
+
+    async def stream(self, messages, candidates):
+        """Async iterator over the deltas of whichever candidate answers first"""
+        with self.recorder.span("llm", "hedged", app="notdiamond", input=messages) as span:
+            inner = self._stream(messages, candidates, span)
+            try:
+                async for delta in span.astream(inner):
+                    yield delta
+            finally:
+                # closing explicitly runs _stream's cleanup now, not when it is garbage collected
+                await inner.aclose()
+
+    async def _stream(self, messages, candidates, span):
+        self.stats["requests"] += 1
+        self.budget.earn()
+        attempts = [_Attempt(candidates[0], self.call(candidates[0], messages))]
+        backups = iter(candidates[1:])
+        winner = None
+        try:
+            timeout = self.deadline(candidates[0])
+            while winner is None:
+                done = [a for a in attempts if a.first.done()]
+                if not done:
+                    await asyncio.wait([a.first for a in attempts], timeout=timeout,
+                                       return_when=asyncio.FIRST_COMPLETED)
+                    done = [a for a in attempts if a.first.done()]
+                    if not done:
+                        # no first token by the deadline
+                        timeout = None
+                        self._hedge(attempts, backups, messages)
+                        continue
+                attempt = done[0]
+                error = attempt.first.exception()
+                if error is None or isinstance(error, StopAsyncIteration):
+                    winner = attempt
+                    continue
+                # failed before its first token: fail over to the next candidate
+                attempts.remove(attempt)
+                if not attempts:
+                    backup = next(backups, None)
+                    if backup is None:
+                        raise error
+                    self.stats["failed_over"] += 1
+                    attempts.append(_Attempt(backup, self.call(backup, messages)))
+
+            self.histogram(winner.provider).observe(time.perf_counter() - winner.started)
+            if winner.provider != candidates[0]:
+                self.stats["backup_won"] += 1
+            for attempt in attempts:
+                if attempt is not winner:
+                    # censored: it was at least this slow, which keeps its deadline honest
+                    self.histogram(attempt.provider).observe(time.perf_counter() - attempt.started)
+                    await attempt.cancel()
+            attempts = [winner]
+            span.attrs["provider"] = winner.provider
+            if winner.first.exception() is not None:
+                return
+            yield winner.first.result()
+            async for delta in winner.stream:
+                yield delta
+        finally:
+            # also closes the winner if the caller stops reading early
+            for attempt in attempts:
+                await attempt.cancel()
+
+
+def langchain_stream(make_llm):
+    """call() for HedgedClient from a provider -> chat model factory (e.g. router.make_llm)"""
+    models = {}
+
+    async def call(provider, messages):
+        if provider not in models:
+            models[provider] = make_llm(provider)
+        async for chunk in models[provider].astream([(m["role"], m["content"]) for m in messages]):
+            if chunk.content:
+                yield chunk.content
+
+    return call
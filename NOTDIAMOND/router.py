@@ -0,0 +1,272 @@
+"""Local model router trained on logged outcomes.
+
+Instead of asking NotDiamond which model to call on every request, the
+router embeds the prompt (cached, local HashingEmbedder by default) and
+predicts quality, latency and cost for each provider in `llm_providers`
+with one ridge regression per provider and target. Routing is one
+embedding lookup and a small matrix product, well under a millisecond.
+
+Modes follow NotDiamond's `tradeoff`:
+    None       highest predicted quality
+    "cost"     cheapest provider whose quality is within `tolerance` of the best
+    "latency"  fastest provider whose quality is within `tolerance` of the best
+
+Quality labels come from judge_quality() (a cheap model scoring a sample
+of answers) or user feedback, logged as their own OutcomeLog rows when they
+arrive. Until every provider has enough of them, "cost" and "latency" route
+on that target alone, as if the providers were equally good.
+
+When the prediction is not confident (too few outcomes for a provider, or
+the providers are too close to call) the remote router is asked instead,
+and the outcome of that call is logged like any other so the local model
+keeps learning.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from common.embeddings import HashingEmbedder
+from common.instrumentation import get_recorder, langchain_callback
+
+TARGETS = ("quality", "latency", "cost")
+
+
+def prompt_text(messages):
+    """The text that is routed on: the last user message"""
+    if isinstance(messages, str):
+        return messages
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content", "")
+    return ""
+
+
+class OutcomeLog:
+    """Append-only JSONL of (prompt, provider, quality, latency, cost)"""
+
+    def __init__(self, path="routing_log.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, prompt, provider, quality=None, latency=None, cost=None, **extra):
+        row = {"prompt": prompt, "provider": provider, "quality": quality, "latency": latency,
+               "cost": cost, "time": time.time(), **extra}
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row) + "\n")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+class Decision:
+    def __init__(self, provider, confidence, source, predicted=None, seconds=0.0):
+        self.provider = provider
+        self.confidence = confidence
+        self.source = source  # "local" or "remote"
+        self.predicted = predicted or {}
+        self.seconds = seconds
+
+    def __repr__(self):
+        return (f"Decision({self.provider!r}, confidence={self.confidence:.2f}, source={self.source!r}, "
+                f"{self.seconds * 1e6:.0f}us)")
+
+
+def _normal_cdf(x):
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+
+class LocalRouter:
+    def __init__(self, providers, embedder=None, alpha=1.0, tolerance=0.05, min_confidence=0.6,
+                 min_samples=20, fallback=None):
+        self.providers = list(providers)
+        self.embedder = embedder or HashingEmbedder()
+        self.alpha = alpha
+        self.tolerance = tolerance
+        self.min_confidence = min_confidence
+        self.min_samples = min_samples
+        self.fallback = fallback
+        dim = self.embedder.dim + 1
+        # weights[target] is (dim + bias) x providers, so one product scores every provider
+        self.weights = {t: np.zeros((dim, len(self.providers)), np.float32) for t in TARGETS}
+        self.residual = {t: np.full(len(self.providers), np.inf, np.float32) for t in TARGETS}
+        self.samples = {t: np.zeros(len(self.providers), np.int64) for t in TARGETS}
+        self.stats = {"local": 0, "remote": 0, "low_confidence": 0}
+        self.recorder = get_recorder("notdiamond")
+
+    def _features(self, text):
+        return np.append(self.embedder.embed(text), np.float32(1.0))
+
+    def fit(self, outcomes):
+        """Train on OutcomeLog rows; rows for unknown providers are ignored"""
+        by_provider = {p: [] for p in self.providers}
+        for row in outcomes:
+            if row.get("provider") in by_provider:
+                by_provider[row["provider"]].append(row)
+        for j, provider in enumerate(self.providers):
+            rows = by_provider[provider]
+            for target in TARGETS:
+                labelled = [r for r in rows if r.get(target) is not None]
+                self.samples[target][j] = len(labelled)
+                if not labelled:
+                    continue
+                X = np.stack([self._features(prompt_text(r["prompt"])) for r in labelled])
+                y = np.array([r[target] for r in labelled], np.float64)
+                mean = y.mean()
+                # ridge on centered targets: shrinks towards the provider's average, not towards 0
+                penalty = self.alpha * np.eye(X.shape[1])
+                penalty[-1, -1] = 0.0
+                inverse = np.linalg.inv(X.T @ X + penalty)
+                w = inverse @ (X.T @ (y - mean))
+                w[-1] += mean
+                self.weights[target][:, j] = w
+                # leave-one-out residuals, so a small log does not look overconfident
+                leverage = np.sum((X @ inverse) * X, axis=1)
+                residuals = (y - X @ w) / np.maximum(1 - leverage, 1e-6)
+                self.residual[target][j] = max(float(np.sqrt(np.mean(residuals ** 2))), 1e-3)
+        return self
+
+    def predict(self, text):
+        x = self._features(text)
+        return {t: x @ self.weights[t] for t in TARGETS}
+
+    def _choose(self, predicted, tradeoff):
+        quality = predicted["quality"]
+        best = int(np.argmax(quality))
+        sigma = self.residual["quality"]
+        if tradeoff is None:
+            runner_up = np.partition(quality, -2)[-2] if len(quality) > 1 else -np.inf
+            runner = int(np.flatnonzero(quality == runner_up)[0]) if len(quality) > 1 else best
+            spread = math.sqrt(float(sigma[best] ** 2 + sigma[runner] ** 2))
+            return best, _normal_cdf((quality[best] - runner_up) / spread)
+        if tradeoff not in ("cost", "latency"):
+            raise ValueError(f"tradeoff must be None, 'cost' or 'latency', not {tradeoff!r}")
+        floor = quality[best] - self.tolerance
+        acceptable = np.flatnonzero(quality >= floor)
+        choice = int(acceptable[np.argmin(predicted[tradeoff][acceptable])])
+        return choice, _normal_cdf((quality[choice] - floor) / float(sigma[choice]))
+
+    def _cheapest(self, predicted, tradeoff):
+        # no quality labels to go on: the lowest predicted cost/latency, sure by how far ahead it is
+        values = predicted[tradeoff]
+        order = np.argsort(values)
+        if len(order) == 1:
+            return int(order[0]), 1.0
+        choice, runner = int(order[0]), int(order[1])
+        sigma = self.residual[tradeoff]
+        spread = math.sqrt(float(sigma[choice] ** 2 + sigma[runner] ** 2))
+        return choice, _normal_cdf((values[runner] - values[choice]) / spread)
+
+    def _enough(self, target):
+        return bool((self.samples[target] >= self.min_samples).all())
+
+    def route(self, messages, tradeoff=None):
+        start = time.perf_counter()
+        text = prompt_text(messages)
+        choice, confidence, predicted = 0, 0.0, {}
+        if self._enough("quality") and (tradeoff is None or self._enough(tradeoff)):
+            predicted = self.predict(text)
+            choice, confidence = self._choose(predicted, tradeoff)
+        elif tradeoff is not None and self._enough(tradeoff):
+            predicted = self.predict(text)
+            del predicted["quality"]
+            choice, confidence = self._cheapest(predicted, tradeoff)
+        seconds = time.perf_counter() - start
+        prediction = {t: float(v[choice]) for t, v in predicted.items()}
+        if confidence >= self.min_confidence or self.fallback is None:
+            self.stats["local"] += 1
+            return Decision(self.providers[choice], confidence, "local", prediction, seconds)
+        self.stats["low_confidence"] += 1
+        self.stats["remote"] += 1
+        with self.recorder.span("router", "notdiamond.model_select", app="notdiamond", input=text) as span:
+            provider = self.fallback(messages, tradeoff)
+            span.output = provider
+        return Decision(provider, confidence, "remote", prediction, time.perf_counter() - start)
+
+    def save(self, path):
+        np.savez(path, providers=np.array(self.providers),
+                 **{f"w_{t}": self.weights[t] for t in TARGETS},
+                 **{f"r_{t}": self.residual[t] for t in TARGETS},
+                 **{f"n_{t}": self.samples[t] for t in TARGETS})
+
+    def load(self, path):
+        data = np.load(path)
+        if list(data["providers"]) != self.providers:
+            raise ValueError(f"{path} was trained for {list(data['providers'])}")
+        for t in TARGETS:
+            self.weights[t], self.residual[t], self.samples[t] = data[f"w_{t}"], data[f"r_{t}"], data[f"n_{t}"]
+        return self
+
+
+JUDGE_PROMPT = """Rate how well the answer responds to the request, from 0 (wrong or useless) to 10 (correct and complete).
+
+Reply with the number only.
+
+<request>
+{prompt}
+</request>
+
+<answer>
+{answer}
+</answer>
+
+Score:"""
+
+
+def judge_quality(judge, prompt, answer):
+    """Quality 0..1 of an answer as scored by a judge chat model, None if it does not reply with a number"""
+    reply = judge.invoke(JUDGE_PROMPT.format(prompt=prompt, answer=answer))
+    match = re.search(r"\d+(\.\d+)?", getattr(reply, "content", reply))
+    if match is None:
+        return None
+    return min(max(float(match.group(0)) / 10, 0.0), 1.0)
+
+
+def notdiamond_fallback(client, providers):
+    """Ask NotDiamond for the model only (no completion), as the low-confidence fallback"""
+
+    def select(messages, tradeoff):
+        kwargs = {"tradeoff": tradeoff} if tradeoff else {}
+        _, provider = client.chat.completions.model_select(messages=messages, model=providers, **kwargs)
+        return f"{provider.provider}/{provider.model}"
+
+    return select
+
+
+# $ per 1M (input, output) tokens, for logging the cost of a call
+PRICES = {
+    "openai/gpt-3.5-turbo-0125": (0.50, 1.50),
+    "google/gemini-1.5-pro-latest": (3.50, 10.50),
+}
+
+
+def estimate_cost(provider, usage):
+    """Cost in $ from a LangChain usage_metadata dict"""
+    price_in, price_out = PRICES.get(provider, (0.0, 0.0))
+    return (usage.get("input_tokens", 0) * price_in + usage.get("output_tokens", 0) * price_out) / 1e6
+
+
+def make_llm(provider):
+    """LangChain chat model for a "vendor/model" provider string, its calls recorded per provider"""
+    vendor, model = provider.split("/", 1)
+    callbacks = [langchain_callback(get_recorder("notdiamond"), provider, app="notdiamond")]
+    if vendor == "openai":
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(model=model, callbacks=callbacks)
+    if vendor == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(model=model, callbacks=callbacks)
+    if vendor == "mistral":
+        from langchain_mistralai import ChatMistralAI
+
+        return ChatMistralAI(model=model, callbacks=callbacks)
+    raise ValueError(f"no client for {provider}")
@@ -52,6 +52,14 @@ graph_documents=llm_transformer.convert_to_graph_documents(documents)
 
 graph_documents[0].nodes
 
+### Extract a whole folder of documents: chunked, concurrent and resumable (upload ingest.py next to this notebook)
+
+from ingest import Checkpoint, ingest, iter_chunks, iter_documents
+
+checkpoint=Checkpoint("ingest.db")
+progress=await ingest(llm_transformer, iter_chunks(iter_documents("corpus/")), checkpoint, concurrency=8)
+print(progress.report())
+
 ### Load the dataset of movie
 
 movie_query="""
@@ -73,8 +81,20 @@ FOREACH (genre in split(row.genres, '|') |
     MERGE (m)-[:IN_GENRE]->(g))
 """
 
+# graph.query(movie_query) runs the whole file as one transaction; load it in UNWIND batches
+# instead (upload writer.py next to this notebook), after creating the constraints the MERGEs use
 
-graph.query(movie_query)
+from entities import EntityIndex
+from writer import GraphWriter, load_movies, read_movies
+
+# name variants are merged before they are written, and the index later resolves entities in questions
+entities=EntityIndex()
+load_movies(graph, read_movies(), batch_size=1000, entities=entities)
+
+# the extracted graph documents go through the same batched writer
+with GraphWriter(graph, batch_size=1000, entities=entities) as writer:
+    for graph_document in graph_documents:
+        writer.add_graph_document(graph_document)
 
 graph.refresh_schema()
 print(graph.schema)
@@ -84,10 +104,28 @@ from langchain.chains import GraphCypherQAChain
 chain=GraphCypherQAChain.from_llm(llm=llm,graph=graph,verbose=True,allow_dangerous_requests = True)
 chain
 
-response=chain.invoke({"query":"Who was the director of the moview GoldenEye"})
+# reuse validated Cypher for questions that only differ by an entity name (upload cypher_cache.py next to this notebook)
+# the repo's common/ folder has to be importable too (upload it next to this notebook)
+import sys
+sys.path.append("..")
+from cypher_cache import CachedCypherQA, SchemaSnapshot
+# generated Cypher is checked with EXPLAIN, LIMITed, streamed with a timeout and cut to a token budget (cypher_guard.py)
+from cypher_guard import CypherExecutor
+
+executor=CypherExecutor(graph, row_limit=200, max_estimated_rows=1_000_000, timeout=10.0, token_budget=2000)
+qa=CachedCypherQA(chain, SchemaSnapshot(graph, path="schema_snapshot.json"), entities=entities, executor=executor)
+
+response=qa.invoke({"query":"Who was the director of the moview GoldenEye"})
 
 response
 
-response=chain.invoke({"query":"tell me the genre of th movie GoldenEye"})
+# same question shape: runs the cached template with {"p0": ...}, no Cypher-generation call
+response=qa.invoke({"query":"Who was the director of the moview Heat"})
 
 response
+
+response=qa.invoke({"query":"tell me the genre of th movie GoldenEye"})
+
+response
+
+qa.cache.stats, qa.llm_calls, executor.stats
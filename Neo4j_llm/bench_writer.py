@@ -0,0 +1,86 @@
+"""Movie load throughput: one statement per row vs UNWIND batches.
+
+Runs against the in-memory stand-in (with a simulated round trip) by
+default, or against a real Neo4j with --uri, e.g. a throwaway local
+container. Each run starts from an empty movie graph, so with --uri the
+benchmark refuses to touch a database that already has Movie, Person or
+Genre nodes unless --wipe is given; never point it at the app's graph.
+
+    docker run -p 7687:7687 -e NEO4J_AUTH=neo4j/password neo4j:5
+    python bench_writer.py --uri bolt://localhost:7687 --password password --csv movies_small.csv --wipe
+    python bench_writer.py --movies 2000 --round-trip 0.001
+"""
+import argparse
+import random
+import sys
+import time
+
+from standin import StandInGraph
+from writer import load_movies, read_movies
+
+
+def synthetic_movies(n, seed=0):
+    """Rows shaped like movies_small.csv, with a realistic overlap of people and genres"""
+    rng = random.Random(seed)
+    people = [f"Person {i}" for i in range(max(10, n))]
+    genres = ["Action", "Adventure", "Comedy", "Crime", "Drama", "Romance", "Sci-Fi", "Thriller"]
+    for i in range(n):
+        yield {
+            "movieId": str(i),
+            "title": f"Movie {i}",
+            "released": f"{rng.randint(1950, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "imdbRating": f"{rng.uniform(1, 10):.1f}",
+            "director": rng.choice(people),
+            "actors": "|".join(rng.sample(people, 4)),
+            "genres": "|".join(rng.sample(genres, 2)),
+        }
+
+
+def check_scratch(args):
+    """Exit unless the --uri database has no movie graph yet, or --wipe was given"""
+    from langchain_community.graphs import Neo4jGraph
+
+    graph = Neo4jGraph(url=args.uri, username=args.user, password=args.password, refresh_schema=False)
+    existing = graph.query("MATCH (n) WHERE n:Movie OR n:Person OR n:Genre RETURN count(n) AS n")[0]["n"]
+    if existing and not args.wipe:
+        sys.exit(f"{args.uri} already has {existing} Movie/Person/Genre nodes; "
+                 f"the benchmark deletes them, pass --wipe if that is intended")
+
+
+def make_graph(args):
+    if args.uri:
+        from langchain_community.graphs import Neo4jGraph
+
+        graph = Neo4jGraph(url=args.uri, username=args.user, password=args.password, refresh_schema=False)
+        graph.query("MATCH (n) WHERE n:Movie OR n:Person OR n:Genre DETACH DELETE n")
+        return graph
+    return StandInGraph(round_trip=args.round_trip)
+
+
+def run(label, args, rows, batch_size):
+    graph = make_graph(args)
+    start = time.perf_counter()
+    stats = load_movies(graph, rows, batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<18} {elapsed:7.2f}s  {len(rows) / elapsed:8.0f} movies/s  "
+          f"{stats['statements']:6d} statements  {stats['nodes']} nodes, {stats['relationships']} rels")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movies", type=int, default=1000, help="synthetic movies when --csv is not given")
+    parser.add_argument("--csv", help="URL or path of the movie CSV")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--round-trip", type=float, default=0.001, help="stand-in latency per query")
+    parser.add_argument("--uri")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--wipe", action="store_true",
+                        help="delete existing Movie/Person/Genre nodes in the --uri database (scratch databases only)")
+    args = parser.parse_args()
+
+    if args.uri:
+        check_scratch(args)
+    rows = list(read_movies(args.csv)) if args.csv else list(synthetic_movies(args.movies))
+    run("row at a time", args, rows, batch_size=1)
+    run(f"batches of {args.batch_size}", args, rows, batch_size=args.batch_size)
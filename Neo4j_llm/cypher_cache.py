@@ -0,0 +1,297 @@
+"""Cypher template cache and schema snapshot for GraphCypherQAChain.
+
+`CachedCypherQA` wraps a GraphCypherQAChain. The first time a question
+shape is seen, Cypher is generated by the chain's LLM, from a compact schema
+instead of the full graph.schema text. String literals in that Cypher that
+also appear in the question ('GoldenEye') become parameters. Once the query
+has run successfully it is stored as a template, so "director of the moview
+Heat" reuses it with {"p0": "Heat"} and does not call the Cypher LLM at all.
+
+Templates are tied to a schema version. `SchemaSnapshot` only calls
+graph.refresh_schema() when the labels, relationship types or property keys
+change, which it checks with one cheap query at most every `min_interval`
+seconds.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from cypher_guard import CypherRejected
+
+from common.instrumentation import get_recorder
+
+FINGERPRINT_QUERY = """
+CALL db.labels() YIELD label WITH collect(label) AS labels
+CALL db.relationshipTypes() YIELD relationshipType WITH labels, collect(relationshipType) AS types
+CALL db.propertyKeys() YIELD propertyKey RETURN labels, types, collect(propertyKey) AS keys
+"""
+
+STRING_LITERAL = re.compile(r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"")
+
+
+def compact_schema(structured_schema):
+    """One line per label and per relationship pattern"""
+    lines = []
+    for label, props in sorted(structured_schema.get("node_props", {}).items()):
+        fields = ", ".join(f"{p['property']}:{p['type']}" for p in props)
+        lines.append(f"(:{label} {{{fields}}})")
+    for label, props in sorted(structured_schema.get("rel_props", {}).items()):
+        fields = ", ".join(f"{p['property']}:{p['type']}" for p in props)
+        lines.append(f"[:{label} {{{fields}}}]")
+    for rel in structured_schema.get("relationships", []):
+        lines.append(f"(:{rel['start']})-[:{rel['type']}]->(:{rel['end']})")
+    return "\n".join(lines)
+
+
+class SchemaSnapshot:
+    """Compact schema text with a version that changes only with the schema.
+
+    With a path the snapshot is kept on disk, so a restart against an
+    unchanged database skips refresh_schema() entirely.
+    """
+
+    def __init__(self, graph, min_interval=30.0, path=None):
+        self.graph = graph
+        self.min_interval = min_interval
+        self.path = path
+        self.fingerprint = None
+        self.text = ""
+        self.version = None
+        self.refreshes = 0
+        self.checked = 0.0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            self.fingerprint, self.text, self.version = saved["fingerprint"], saved["text"], saved["version"]
+
+    def _fingerprint(self):
+        row = self.graph.query(FINGERPRINT_QUERY)[0]
+        payload = json.dumps([sorted(row["labels"]), sorted(row["types"]), sorted(row["keys"])])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def refresh(self, force=False):
+        """Return the current version, rebuilding the snapshot if the schema changed"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.version is not None and now - self.checked < self.min_interval:
+                return self.version
+            self.checked = now
+            fingerprint = self._fingerprint()
+            if force or fingerprint != self.fingerprint:
+                self.graph.refresh_schema()
+                self.text = compact_schema(self.graph.structured_schema)
+                self.fingerprint = fingerprint
+                self.version = hashlib.sha256(self.text.encode()).hexdigest()[:12]
+                self.refreshes += 1
+                if self.path:
+                    with open(self.path, "w") as f:
+                        json.dump({"fingerprint": fingerprint, "text": self.text, "version": self.version}, f)
+            return self.version
+
+
+def normalize_question(question):
+    return " ".join(question.split()).rstrip("?.! ")
+
+
+def extract_cypher(text):
+    """The Cypher inside ``` fences if the LLM added them"""
+    match = re.search(r"```(?:cypher)?(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    return (match.group(1) if match else text).strip()
+
+
+def _case(literal, entity):
+    for name in ("lower", "upper"):
+        if literal == getattr(entity, name)() and literal != entity:
+            return name
+    return None
+
+
+class Template:
+    __slots__ = ("pattern", "cypher", "cases", "version", "hits")
+
+    def __init__(self, pattern, cypher, cases, version):
+        self.pattern = pattern
+        self.cypher = cypher
+        self.cases = cases
+        self.version = version
+        self.hits = 0
+
+    def params(self, match):
+        values = {}
+        for i, case in enumerate(self.cases):
+            value = match.group(f"s{i}")
+            values[f"p{i}"] = getattr(value, case)() if case else value
+        return values
+
+
+def make_template(question, cypher, version):
+    """Parameterize the string literals of cypher that occur in question.
+
+    Returns None when the Cypher already uses parameters, which we would not
+    know how to fill.
+    """
+    if "$" in cypher:
+        return None
+    question = normalize_question(question)
+    slots = []  # (start, end) in the question
+    cases = []
+    pieces = []
+    last = 0
+    for match in STRING_LITERAL.finditer(cypher):
+        literal = match.group(1) if match.group(1) is not None else match.group(2)
+        if not literal:
+            continue
+        found = re.search(rf"(?<!\w){re.escape(literal)}(?!\w)", question, re.IGNORECASE)
+        if found is None or any(s < found.end() and found.start() < e for s, e in slots):
+            continue
+        entity = found.group(0)
+        if literal != entity and _case(literal, entity) is None:
+            continue
+        slots.append((found.start(), found.end()))
+        pieces.append(cypher[last:match.start()] + f"$p{len(cases)}")
+        cases.append(_case(literal, entity))
+        last = match.end()
+    pieces.append(cypher[last:])
+
+    # the question pattern, with the slots in the order the parameters were numbered
+    order = sorted(range(len(slots)), key=lambda i: slots[i][0])
+    pattern, position = "", 0
+    for i in order:
+        start, end = slots[i]
+        pattern += re.escape(question[position:start]) + f"(?P<s{i}>.+?)"
+        position = end
+    pattern += re.escape(question[position:])
+    return Template(re.compile(rf"^{pattern}$", re.IGNORECASE), "".join(pieces), cases, version)
+
+
+class TemplateCache:
+    """Validated Cypher templates, least recently used dropped past max_templates"""
+
+    def __init__(self, max_templates=1000):
+        self.max_templates = max_templates
+        self.templates = OrderedDict()  # pattern source -> Template
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "stale": 0}
+        self._lock = threading.Lock()
+
+    def lookup(self, question, version):
+        """(template, params) for the first template matching question, or None"""
+        question = normalize_question(question)
+        with self._lock:
+            for key, template in list(self.templates.items()):
+                if template.version != version:
+                    # generated against an older schema
+                    del self.templates[key]
+                    self.stats["stale"] += 1
+                    continue
+                match = template.pattern.match(question)
+                if match:
+                    template.hits += 1
+                    self.templates.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return template, template.params(match)
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, question, cypher, version):
+        template = make_template(question, cypher, version)
+        if template is None:
+            return None
+        with self._lock:
+            self.templates[template.pattern.pattern] = template
+            self.templates.move_to_end(template.pattern.pattern)
+            if len(self.templates) > self.max_templates:
+                self.templates.popitem(last=False)
+            self.stats["stored"] += 1
+        return template
+
+    def discard(self, template):
+        with self._lock:
+            self.templates.pop(template.pattern.pattern, None)
+
+
+def _text(result):
+    """LLMChain returns {"text": ...}, runnables return a string"""
+    return result.get("text", "") if isinstance(result, dict) else str(result)
+
+
+class CachedCypherQA:
+    """GraphCypherQAChain.invoke with the template cache in front of Cypher generation"""
+
+    def __init__(self, chain, snapshot=None, cache=None, top_k=None, entities=None, executor=None, recorder=None):
+        self.chain = chain
+        self.recorder = recorder or get_recorder("neo4j")
+        self.entities = entities
+        self.executor = executor
+        self.graph = chain.graph
+        self.snapshot = snapshot or SchemaSnapshot(self.graph)
+        self.cache = cache or TemplateCache()
+        self.top_k = top_k or chain.top_k
+        self.llm_calls = {"cypher": 0, "qa": 0}
+        self.last_execution = None
+
+    def generate(self, question, version):
+        self.llm_calls["cypher"] += 1
+        with self.recorder.span("llm", "cypher_generation", app="neo4j", input=question) as span:
+            result = self.chain.cypher_generation_chain.invoke({"question": question, "schema": self.snapshot.text})
+            span.output = _text(result)
+        return extract_cypher(span.output)
+
+    def query(self, cypher, params=None):
+        """Records for the QA prompt, through the executor (cypher_guard.py) when there is one"""
+        with self.recorder.span("graph", "cypher", app="neo4j", input={"cypher": cypher, "params": params or {}}) as span:
+            if self.executor is None:
+                records = self.graph.query(cypher, params or {})[: self.top_k]
+            else:
+                self.last_execution = self.executor.run(cypher, params)
+                records = self.last_execution.records
+                span.attrs["truncated"] = self.last_execution.truncated
+            span.output = records
+        return records
+
+    def invoke(self, inputs):
+        question = inputs["query"] if isinstance(inputs, dict) else inputs
+        self.last_execution = None
+        if self.entities is not None:
+            # "moview goldeneye" -> "moview GoldenEye", the title as stored in the graph
+            question = self.entities.canonicalize_question(question)
+        version = self.snapshot.refresh()
+        with self.recorder.span("cache", "cypher_template", app="neo4j", input=question) as span:
+            cached = self.cache.lookup(question, version)
+            span.hit(cached is not None)
+        context = None
+        if cached is not None:
+            template, params = cached
+            cypher = template.cypher
+            try:
+                context = self.query(cypher, params)
+            except CypherRejected:
+                context = None
+            if not context:
+                # the question only looked like the template, generate a fresh query
+                self.cache.discard(template)
+                cached, context = None, None
+        if cached is None:
+            cypher, params = self.generate(question, version), {}
+            try:
+                context = self.query(cypher)
+            except CypherRejected as e:
+                # answer from nothing rather than run an unbounded query
+                context = [{"error": f"query not run: {e}"}]
+            else:
+                if context:
+                    self.cache.store(question, cypher, version)
+        self.llm_calls["qa"] += 1
+        with self.recorder.span("llm", "qa", app="neo4j", input={"question": question, "context": context}) as span:
+            answer = self.chain.qa_chain.invoke({"question": question, "context": context})
+            span.output = _text(answer)
+        result = {"query": question, "result": _text(answer), "cypher": cypher, "params": params,
+                  "cached": cached is not None}
+        if self.last_execution is not None:
+            result["guard"] = self.last_execution.notes
+            self.last_execution = None
+        return result
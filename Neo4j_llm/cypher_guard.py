@@ -0,0 +1,147 @@
+"""Cost-guarded, streaming execution of LLM-written Cypher.
+
+Before a generated query runs, its final RETURN gets a LIMIT (or its LIMIT
+is capped), and EXPLAIN is checked: a CartesianProduct, or any operator
+estimated above `max_estimated_rows` (many-hop ACTED_IN/DIRECTED expansions),
+gets the query rejected. Records are then pulled `fetch_size` at a time in
+a transaction with a server-side timeout, and reading stops as soon as the
+serialized rows reach `token_budget`, so the QA prompt never sees more
+context than it can use. Closing the transaction early stops the server
+from producing the rest.
+"""
+import json
+import re
+import time
+
+
+class CypherRejected(Exception):
+    """The query was not run (or was stopped); the message says why"""
+
+
+class Execution:
+    def __init__(self, cypher, records, truncated, tokens, seconds, notes):
+        self.cypher = cypher
+        self.records = records
+        self.truncated = truncated
+        self.tokens = tokens
+        self.seconds = seconds
+        self.notes = notes
+
+
+def approx_tokens(text):
+    return len(text) // 4 + 1
+
+
+def strip_comments(cypher):
+    """Cypher without // and /* */ comments; string literals are left alone"""
+    return re.sub(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)|//[^\n]*|/\*.*?\*/",
+                  lambda m: m.group(1) or "", cypher, flags=re.DOTALL)
+
+
+def inject_limit(cypher, limit):
+    """Add LIMIT to the final RETURN, or lower a larger literal one; (cypher, note or None)"""
+    # a trailing "// top ten" would otherwise hide the LIMIT in front of it
+    cypher = strip_comments(cypher).strip().rstrip(";").strip()
+    if re.search(r"\bUNION\b", cypher, re.IGNORECASE):
+        return cypher, None
+    tail = re.search(r"\bLIMIT\s+(\d+)\s*$", cypher, re.IGNORECASE)
+    if tail:
+        if int(tail.group(1)) <= limit:
+            return cypher, None
+        return cypher[:tail.start(1)] + str(limit), f"lowered LIMIT {tail.group(1)} to {limit}"
+    if re.search(r"\bLIMIT\s+\$\w+\s*$", cypher, re.IGNORECASE):
+        return cypher, None
+    returns = list(re.finditer(r"\bRETURN\b", cypher, re.IGNORECASE))
+    if not returns:
+        return cypher, None
+    return f"{cypher}\nLIMIT {limit}", f"added LIMIT {limit}"
+
+
+def plan_operators(plan):
+    """(operatorType, estimated rows) for every operator of an EXPLAIN plan"""
+    stack = [plan] if plan else []
+    while stack:
+        node = stack.pop()
+        args = node.get("args", {})
+        yield node.get("operatorType", ""), float(args.get("EstimatedRows", 0))
+        stack.extend(node.get("children", []))
+
+
+class CypherExecutor:
+    """Runs Cypher through the Neo4jGraph's driver with the checks described above"""
+
+    def __init__(self, graph, row_limit=200, max_estimated_rows=1_000_000, timeout=10.0,
+                 token_budget=2000, count_tokens=approx_tokens, fetch_size=50):
+        self.graph = graph
+        self.row_limit = row_limit
+        self.max_estimated_rows = max_estimated_rows
+        self.timeout = timeout
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self.fetch_size = fetch_size
+        self.stats = {"run": 0, "rejected": 0, "limited": 0, "truncated": 0, "timed_out": 0}
+
+    def _session(self):
+        return self.graph._driver.session(database=self.graph._database, fetch_size=self.fetch_size)
+
+    def check(self, cypher, params=None):
+        """(cypher to run, notes), or raise CypherRejected"""
+        notes = []
+        cypher, note = inject_limit(cypher, self.row_limit)
+        if note:
+            notes.append(note)
+            self.stats["limited"] += 1
+        try:
+            with self._session() as session:
+                plan = session.run("EXPLAIN " + cypher, params or {}).consume().plan
+        except Exception as e:
+            # CypherSyntaxError and friends: the generated query is wrong, not the database
+            if str(getattr(e, "code", "") or "").startswith("Neo.ClientError.Statement"):
+                self.stats["rejected"] += 1
+                raise CypherRejected(f"the query does not compile: {getattr(e, 'message', e)}") from e
+            raise
+        worst, worst_rows = None, 0.0
+        for operator, rows in plan_operators(plan):
+            if operator.startswith("CartesianProduct"):
+                self.stats["rejected"] += 1
+                raise CypherRejected("the query builds a cartesian product; connect the patterns with a relationship")
+            if rows > worst_rows:
+                worst, worst_rows = operator, rows
+        if worst_rows > self.max_estimated_rows:
+            self.stats["rejected"] += 1
+            raise CypherRejected(f"{worst} is estimated at {worst_rows:,.0f} rows "
+                                 f"(limit {self.max_estimated_rows:,}); use fewer hops or a more specific match")
+        return cypher, notes
+
+    def run(self, cypher, params=None):
+        cypher, notes = self.check(cypher, params)
+        self.stats["run"] += 1
+        start = time.perf_counter()
+        records, tokens, truncated = [], 2, False  # 2 for the surrounding brackets
+        with self._session() as session:
+            tx = session.begin_transaction(timeout=self.timeout)
+            try:
+                for record in tx.run(cypher, params or {}):
+                    row = record.data()
+                    cost = self.count_tokens(json.dumps(row, default=str)) + 1
+                    if tokens + cost > self.token_budget:
+                        truncated = True
+                        break
+                    if time.perf_counter() - start > self.timeout:
+                        truncated = True
+                        notes.append(f"stopped reading after {self.timeout:g}s")
+                        break
+                    records.append(row)
+                    tokens += cost
+            except Exception as e:
+                if "TransactionTimedOut" in str(e) or "timed out" in str(e).lower():
+                    self.stats["timed_out"] += 1
+                    raise CypherRejected(f"the query ran longer than {self.timeout:g}s") from e
+                raise
+            finally:
+                # rolls back the read and tells the server to stop streaming
+                tx.close()
+        if truncated:
+            self.stats["truncated"] += 1
+            notes.append(f"kept {len(records)} records within {self.token_budget} tokens")
+        return Execution(cypher, records, truncated, tokens, time.perf_counter() - start, notes)
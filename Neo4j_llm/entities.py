@@ -0,0 +1,160 @@
+"""Client-side entity index: normalized names, trigram lookup, canonical keys.
+
+Names are normalized (case, accents, punctuation, whitespace) so "Tom Hanks"
+and " tom  hanks" are one Person before anything is written, which saves
+MERGEs. A trigram inverted index maps misspelled or differently cased
+mentions in questions ("moview goldeneye") to the canonical node, so the
+Cypher that gets generated uses the exact title stored in the graph.
+
+The index is updated incrementally: add() per name, add_graph_document() per
+extracted document, or load() once from an existing graph.
+"""
+import re
+import threading
+import unicodedata
+
+_PUNCT = re.compile(r"[^\w\s]")
+
+# function words and question vocabulary: a span that starts or ends with one of
+# these is only a mention if it is a stored name exactly ("The Net"), since
+# "the" alone scores 0.67 against every title that starts with it
+STOPWORDS = frozenset("a about actor actors acted after all also an and any are as at be been before "
+                      "best but by can could did direct directed director directors do does during "
+                      "each film films for from genre genres give had has have he her his how i if "
+                      "in into is it its list many me more most movie movies much my name named no "
+                      "not of on or other play played show some star starred tell than that the "
+                      "their them there these they this those to top was were what when where which "
+                      "who whom whose why will with would year years you".split())
+
+
+def normalize_name(name):
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(_PUNCT.sub(" ", name.casefold()).split())
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class EntityIndex:
+    def __init__(self, min_score=0.6, single_word_score=0.85, min_span=4, common_postings=200):
+        self.min_score = min_score
+        # one-word spans ("drama", "moview") match far more names by accident
+        self.single_word_score = single_word_score
+        self.min_span = min_span
+        self.common_postings = common_postings
+        self.canonical = {}  # (label, normalized) -> entity number
+        self.by_name = {}  # normalized -> [entity numbers]
+        self.entities = []  # (label, name, key, trigrams)
+        self.postings = {}  # trigram -> [entity numbers]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entities)
+
+    def add(self, label, name, key=None):
+        """Index a name and return the canonical key of its entity.
+
+        key defaults to the name itself (Person, Genre); movies are indexed
+        by title with their movieId as key.
+        """
+        normalized = normalize_name(name)
+        if not normalized:
+            return key if key is not None else name
+        with self._lock:
+            number = self.canonical.get((label, normalized))
+            if number is not None:
+                return self.entities[number][2]
+            grams = trigrams(normalized)
+            number = len(self.entities)
+            self.entities.append((label, name.strip(), key if key is not None else name.strip(), grams))
+            self.canonical[(label, normalized)] = number
+            self.by_name.setdefault(normalized, []).append(number)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(number)
+            return self.entities[number][2]
+
+    def add_graph_document(self, graph_document):
+        for node in graph_document.nodes:
+            self.add(node.type, str(node.id))
+
+    def load(self, graph, labels=(("Person", "name", None), ("Genre", "name", None), ("Movie", "title", "id"))):
+        """Index every (label, name property, key property) already in Neo4j"""
+        for label, name_property, key_property in labels:
+            key = f"n.`{key_property}`" if key_property else "null"
+            for row in graph.query(f"MATCH (n:`{label}`) WHERE n.`{name_property}` IS NOT NULL "
+                                   f"RETURN n.`{name_property}` AS name, {key} AS key"):
+                self.add(label, row["name"], row["key"])
+
+    def search(self, text, labels=None, limit=5):
+        """[(score, label, name, key)] by trigram Dice similarity, best first"""
+        normalized = normalize_name(text)
+        if not normalized:
+            return []
+        exact = [n for n in self.by_name.get(normalized, ()) if not labels or self.entities[n][0] in labels]
+        if exact:
+            return [(1.0, *self.entities[n][:3]) for n in exact][:limit]
+        grams = trigrams(normalized)
+        # candidates come from the rarer trigrams only ("smi" in every Smith would
+        # pull in half the index), then every candidate is scored on all of them;
+        # a span made only of common trigrams is not specific enough to be a name
+        rare = [p for p in map(self.postings.get, grams) if p and len(p) <= self.common_postings]
+        candidates = set().union(*rare)
+        results = []
+        for number in candidates:
+            label, name, key, entity_grams = self.entities[number]
+            if labels and label not in labels:
+                continue
+            score = 2 * len(grams & entity_grams) / (len(grams) + len(entity_grams))
+            if score >= self.min_score:
+                results.append((score, label, name, key))
+        results.sort(key=lambda r: -r[0])
+        return results[:limit]
+
+    def resolve(self, text, labels=None):
+        """(label, name, key) of the best match, or None"""
+        results = self.search(text, labels, limit=1)
+        return results[0][1:] if results else None
+
+    def find_in_question(self, question, labels=None, max_words=4):
+        """Non-overlapping [(start, end, score, label, name, key)] mentions, best scores first"""
+        words = [(m.start(), m.end()) for m in re.finditer(r"\S+", question)]
+        candidates = []
+        for i in range(len(words)):
+            for j in range(i + 1, min(len(words), i + max_words) + 1):
+                start, end = words[i][0], words[j - 1][1]
+                span = question[start:end]
+                normalized = normalize_name(span)
+                if len(normalized) < self.min_span:
+                    continue
+                first, last = normalize_name(question[words[i][0]:words[i][1]]), normalize_name(question[words[j - 1][0]:end])
+                if first in STOPWORDS or last in STOPWORDS:
+                    if normalized not in self.by_name:
+                        continue
+                min_score = self.single_word_score if j == i + 1 else self.min_score
+                for score, label, name, key in self.search(span, labels, limit=1):
+                    if score >= min_score:
+                        candidates.append((score, end - start, start, end, label, name, key))
+        taken = []
+        for score, _, start, end, label, name, key in sorted(candidates, key=lambda c: (-c[0], -c[1])):
+            if all(end <= s or start >= e for s, e, *_ in taken):
+                taken.append((start, end, score, label, name, key))
+        return sorted(taken)
+
+    def canonicalize_question(self, question, labels=None):
+        """Replace fuzzy entity mentions with the names stored in the graph; the rest is kept as typed"""
+        out, position = [], 0
+        for start, end, score, label, name, key in self.find_in_question(question, labels):
+            # keep trailing punctuation that was part of the word ("GoldenEye?")
+            span = question[start:end]
+            tail = span[len(span.rstrip("?.!,;:")):]
+            span = span[:len(span) - len(tail)]
+            if span == name:
+                continue
+            out.append(question[position:start])
+            out.append(name)
+            position = start + len(span)
+        out.append(question[position:])
+        return "".join(out)
@@ -0,0 +1,76 @@
+"""In-memory stand-in for Neo4jGraph, for benchmarks without a database.
+
+It understands only the statements writer.py sends (constraints, UNWIND
+node MERGE, UNWIND relationship MERGE) and adds a fixed round-trip latency
+per query. MERGE on a label with a uniqueness constraint is a dict lookup,
+without one it scans every node of the label, like Neo4j without an index.
+"""
+import re
+import time
+
+_NAME = r"`((?:[^`]|``)*)`"
+CONSTRAINT = re.compile(rf"CREATE CONSTRAINT .* FOR \(n:{_NAME}\) REQUIRE n\.{_NAME} IS UNIQUE")
+MERGE_NODE = re.compile(rf"UNWIND \$rows AS row MERGE \(n:{_NAME} \{{{_NAME}: row\.key\}}\)")
+MERGE_REL = re.compile(rf"UNWIND \$rows AS row MATCH \(s:{_NAME} \{{{_NAME}: row\.source\}}\) "
+                       rf"MATCH \(t:{_NAME} \{{{_NAME}: row\.target\}}\) MERGE \(s\)-\[r:{_NAME}\]->\(t\)")
+
+
+def _unquote(name):
+    return name.replace("``", "`")
+
+
+class StandInGraph:
+    def __init__(self, round_trip=0.001):
+        self.round_trip = round_trip
+        self.nodes = {}  # label -> list of property dicts
+        self.indexes = {}  # (label, key) -> {value: node}
+        self.relationships = {}  # (source id, type, target id) -> properties
+        self.queries = 0
+        self.rows = 0
+
+    def query(self, query, params=None):
+        time.sleep(self.round_trip)
+        self.queries += 1
+        params = params or {}
+        if match := CONSTRAINT.match(query):
+            label, key = map(_unquote, match.groups())
+            index = self.indexes.setdefault((label, key), {})
+            for node in self.nodes.get(label, []):
+                index[node.get(key)] = node
+            return []
+        if match := MERGE_NODE.match(query):
+            label, key = map(_unquote, match.groups())
+            for row in params["rows"]:
+                self._merge_node(label, key, row["key"]).update(row["properties"])
+            self.rows += len(params["rows"])
+            return []
+        if match := MERGE_REL.match(query):
+            source_label, source_key, target_label, target_key, rel_type = map(_unquote, match.groups())
+            for row in params["rows"]:
+                source = self._find(source_label, source_key, row["source"])
+                target = self._find(target_label, target_key, row["target"])
+                if source is not None and target is not None:
+                    self.relationships.setdefault((id(source), rel_type, id(target)), {}).update(row["properties"])
+            self.rows += len(params["rows"])
+            return []
+        raise NotImplementedError(f"stand-in does not understand: {query[:80]}")
+
+    def _find(self, label, key, value):
+        index = self.indexes.get((label, key))
+        if index is not None:
+            return index.get(value)
+        return next((node for node in self.nodes.get(label, []) if node.get(key) == value), None)
+
+    def _merge_node(self, label, key, value):
+        node = self._find(label, key, value)
+        if node is None:
+            node = {key: value}
+            self.nodes.setdefault(label, []).append(node)
+            index = self.indexes.get((label, key))
+            if index is not None:
+                index[value] = node
+        return node
+
+    def counts(self):
+        return {"nodes": sum(len(nodes) for nodes in self.nodes.values()),
+                "relationships": len(self.relationships)}
@@ -0,0 +1,217 @@
+"""Batched writes of graph documents and the movie CSV into Neo4j.
+
+Nodes are grouped by label and relationships by (source label, type, target
+label), deduplicated in memory, and sent as parameterized `UNWIND $rows`
+statements of `batch_size` rows. The uniqueness constraints the MERGEs rely
+on are created first, so every MERGE is an index lookup and not a label scan.
+
+    python writer.py --uri bolt://localhost:7687 --user neo4j --password secret
+"""
+import argparse
+import csv
+import datetime
+import io
+import urllib.request
+
+MOVIES_CSV = "https://raw.githubusercontent.com/tomasonjo/blog-datasets/main/movies/movies_small.csv"
+
+# merge key per label; labels not listed here (e.g. from LLMGraphTransformer) use "id"
+MOVIE_KEYS = {"Movie": "id", "Person": "name", "Genre": "name"}
+# merge keys that hold a name, the only ones an EntityIndex can canonicalize
+NAME_KEYS = frozenset({"name", "title"})
+
+
+def quote(name):
+    """Backtick-quote a label, type or property name for Cypher"""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def ensure_constraints(graph, keys):
+    """CREATE CONSTRAINT IF NOT EXISTS for every (label, key) the writer merges on"""
+    for label, key in keys.items():
+        name = f"unique_{label}_{key}".lower().replace(" ", "_")
+        graph.query(f"CREATE CONSTRAINT {quote(name)} IF NOT EXISTS "
+                    f"FOR (n:{quote(label)}) REQUIRE n.{quote(key)} IS UNIQUE")
+
+
+class GraphWriter:
+    """Buffers nodes and relationships and writes them in UNWIND batches.
+
+    Rows for the same node or relationship are merged in the buffer, so a
+    person who appears in a hundred movies is sent once per flush. Nodes are
+    always flushed before the relationships that point at them.
+
+    With an EntityIndex (entities.py), string keys of resolve_labels are
+    replaced by their canonical spelling, so name variants end up as one
+    node. By default that is every label merged on a name: the ones keyed by
+    name or title, and the unlisted ones, whose "id" is the name
+    LLMGraphTransformer extracted. Labels keyed by anything else (Movie's
+    movieId) are left alone.
+    """
+
+    def __init__(self, graph, batch_size=1000, keys=None, default_key="id", entities=None, resolve_labels=None):
+        self.graph = graph
+        self.batch_size = batch_size
+        self.keys = dict(keys or {})
+        self.default_key = default_key
+        self.entities = entities
+        self.resolve_labels = resolve_labels
+        self.nodes = {}
+        self.relationships = {}
+        self.pending = 0
+        self.stats = {"nodes": 0, "relationships": 0, "statements": 0}
+        self._constrained = set()
+
+    def key(self, label):
+        return self.keys.get(label, self.default_key)
+
+    def canonical(self, label, key):
+        if self.entities is None or not isinstance(key, str):
+            return key
+        if self.resolve_labels is None:
+            if label in self.keys and self.keys[label] not in NAME_KEYS:
+                return key
+        elif label not in self.resolve_labels:
+            return key
+        return self.entities.add(label, key)
+
+    def add_node(self, label, key, properties=None):
+        key = self.canonical(label, key)
+        rows = self.nodes.setdefault(label, {})
+        row = rows.get(key)
+        if row is None:
+            rows[key] = {"key": key, "properties": dict(properties or {})}
+            self._added()
+        elif properties:
+            row["properties"].update(properties)
+
+    def add_relationship(self, source_label, source_key, rel_type, target_label, target_key, properties=None):
+        source_key = self.canonical(source_label, source_key)
+        target_key = self.canonical(target_label, target_key)
+        rows = self.relationships.setdefault((source_label, rel_type, target_label), {})
+        row = rows.get((source_key, target_key))
+        if row is None:
+            rows[(source_key, target_key)] = {"source": source_key, "target": target_key,
+                                              "properties": dict(properties or {})}
+            self._added()
+        elif properties:
+            row["properties"].update(properties)
+
+    def add_graph_document(self, graph_document):
+        for node in graph_document.nodes:
+            self.add_node(node.type, node.id, node.properties)
+        for rel in graph_document.relationships:
+            # endpoints are not always listed in nodes, merge them too
+            self.add_node(rel.source.type, rel.source.id)
+            self.add_node(rel.target.type, rel.target.id)
+            self.add_relationship(rel.source.type, rel.source.id, rel.type,
+                                  rel.target.type, rel.target.id, rel.properties)
+
+    def _added(self):
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def _ensure_constraints(self, labels):
+        missing = {label: self.key(label) for label in labels if label not in self._constrained}
+        if missing:
+            ensure_constraints(self.graph, missing)
+            self._constrained.update(missing)
+
+    def _write(self, statement, rows):
+        for i in range(0, len(rows), self.batch_size):
+            self.graph.query(statement, {"rows": rows[i:i + self.batch_size]})
+            self.stats["statements"] += 1
+
+    def flush(self):
+        labels = set(self.nodes)
+        for source_label, _, target_label in self.relationships:
+            labels.update((source_label, target_label))
+        self._ensure_constraints(labels)
+
+        for label, rows in self.nodes.items():
+            statement = (f"UNWIND $rows AS row "
+                         f"MERGE (n:{quote(label)} {{{quote(self.key(label))}: row.key}}) "
+                         f"SET n += row.properties")
+            self._write(statement, list(rows.values()))
+            self.stats["nodes"] += len(rows)
+        for (source_label, rel_type, target_label), rows in self.relationships.items():
+            statement = (f"UNWIND $rows AS row "
+                         f"MATCH (s:{quote(source_label)} {{{quote(self.key(source_label))}: row.source}}) "
+                         f"MATCH (t:{quote(target_label)} {{{quote(self.key(target_label))}: row.target}}) "
+                         f"MERGE (s)-[r:{quote(rel_type)}]->(t) "
+                         f"SET r += row.properties")
+            self._write(statement, list(rows.values()))
+            self.stats["relationships"] += len(rows)
+        self.nodes = {}
+        self.relationships = {}
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.flush()
+
+
+def read_movies(source=MOVIES_CSV):
+    """Yield the movie CSV rows from a URL or a local path"""
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source) as response:
+            yield from csv.DictReader(io.TextIOWrapper(response, encoding="utf-8"))
+    else:
+        with open(source, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+
+def _split(value):
+    return [part.strip() for part in (value or "").split("|") if part.strip()]
+
+
+def add_movie(writer, row):
+    """The same graph as the LOAD CSV query in app.py, for one CSV row"""
+    properties = {"title": row["title"]}
+    if row.get("released"):
+        properties["released"] = datetime.date.fromisoformat(row["released"])
+    if row.get("imdbRating"):
+        properties["imdbRating"] = float(row["imdbRating"])
+    writer.add_node("Movie", row["movieId"], properties)
+    if writer.entities is not None:
+        writer.entities.add("Movie", row["title"], key=row["movieId"])
+    for director in _split(row.get("director")):
+        writer.add_node("Person", director)
+        writer.add_relationship("Person", director, "DIRECTED", "Movie", row["movieId"])
+    for actor in _split(row.get("actors")):
+        writer.add_node("Person", actor)
+        writer.add_relationship("Person", actor, "ACTED_IN", "Movie", row["movieId"])
+    for genre in _split(row.get("genres")):
+        writer.add_node("Genre", genre)
+        writer.add_relationship("Movie", row["movieId"], "IN_GENRE", "Genre", genre)
+
+
+def load_movies(graph, rows, batch_size=1000, entities=None):
+    with GraphWriter(graph, batch_size, keys=MOVIE_KEYS, entities=entities,
+                     resolve_labels={"Person", "Genre"}) as writer:
+        for row in rows:
+            add_movie(writer, row)
+    return writer.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="bolt://localhost:7687")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--csv", default=MOVIES_CSV, help="URL or path of the movie CSV")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    from langchain_community.graphs import Neo4jGraph
+
+    graph = Neo4jGraph(url=args.uri, username=args.user, password=args.password)
+    print(load_movies(graph, read_movies(args.csv), args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
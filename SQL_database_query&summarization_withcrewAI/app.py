@@ -1,11 +1,17 @@
-import sqlite3
 import os
+import sys
 import pandas as pd
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.tools import tool
 from crewai import Agent, Task, Crew, Process
-import csv
+from db_pool import get_pool
+from query_guard import IndexAdvisor
+from query_tool import make_guard, run_query
+from result_cache import QueryCache
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.instrumentation import get_recorder, langchain_callback
 
 
 load_dotenv()
@@ -13,25 +19,23 @@ load_dotenv()
 # Retrieve the secrets
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 
+# model calls, queries and cache hits; GENAI_TRACE / GENAI_METRICS_PORT export them
+recorder = get_recorder("sql_crew")
+
 # Using Gemini Pro as LLM
 llm = ChatGoogleGenerativeAI(
-    model='gemini-pro', verbose=True, temperature=0.9, google_api_key=GOOGLE_API_KEY
+    model='gemini-pro', verbose=True, temperature=0.9, google_api_key=GOOGLE_API_KEY,
+    callbacks=[langchain_callback(recorder, "gemini-pro", app="sql_crew")]
 )
 
+cache = QueryCache(lambda: get_pool().data_version())
+advisor = IndexAdvisor(min_count=3, auto_create=os.getenv("AUTO_CREATE_INDEXES") == "1")
+guard = make_guard(lambda: get_pool().data_version(), advisor)
+
 @tool
 def query_database(query: str,file_name):
-    """Execute SQL query and return the result"""
-    conn = sqlite3.connect("database.db")
-    cursor = conn.cursor()
-    cursor.execute(query)
-    results = cursor.fetchall()
-    column_names = [description[0] for description in cursor.description]  # Get column names
-    conn.close()
-    with open(file_name, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(column_names)  # Write the column headers
-        writer.writerows(results) 
-    return results
+    """Execute SQL query, stream the result to file_name (.csv, .parquet or .arrow) and return the row count, column stats and a preview of the rows"""
+    return run_query(query, file_name, get_pool(), guard, cache, recorder)
 
 
 # Creating the Database Agent
@@ -47,9 +51,11 @@ db_query_agent = Agent(
     tools=[query_database]
 )
 
-if __name__ == "__main__":
-    user_query = "get me the names of top 3 highest earning persons from the employee table"
-    csv_file = "results.csv"
+def answer(user_query, csv_file):
+    """Answer a question with the crew, reusing the cached summary for repeated questions"""
+    summary = cache.get_summary(user_query)
+    if summary is not None:
+        return summary
 
     # Creating the task
     query = Task(
@@ -65,4 +71,18 @@ if __name__ == "__main__":
         process=Process.sequential
     )
 
-    crew.kickoff()
+    cache.queried = False
+    summary = crew.kickoff()
+    if cache.queried:
+        cache.put_summary(user_query, summary)
+    return summary
+
+
+if __name__ == "__main__":
+    user_query = "get me the names of top 3 highest earning persons from the employee table"
+    csv_file = "results.csv"
+
+    print(answer(user_query, csv_file))
+    print("Connection pool stats:", get_pool().stats.snapshot())
+    print("Cache stats:", cache.stats())
+    print("Query guard:", dict(guard.stats), "suggested indexes:", advisor.suggestions())
@@ -0,0 +1,145 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+
+DB_PATH = "database.db"
+
+
+class PooledConnection:
+    """Read-only sqlite3 connection; sqlite3 keeps its compiled statements (``cached_statements``)"""
+
+    def __init__(self, db_path, stats, statement_cache_size=128):
+        self.conn = sqlite3.connect(
+            f"file:{db_path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=statement_cache_size,
+        )
+        self._stats = stats
+
+    def execute(self, query, params=()):
+        start = time.perf_counter()
+        cursor = self.conn.execute(query, params)
+        self._stats.record("execute", time.perf_counter() - start)
+        return cursor
+
+    def close(self):
+        self.conn.close()
+
+
+class PoolStats:
+    """Thread-safe counters and accumulated latencies for the pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.seconds = {}
+
+    def record(self, name, seconds=None):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if seconds is not None:
+                self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def snapshot(self):
+        with self._lock:
+            snap = dict(self.counts)
+            for name, total in self.seconds.items():
+                snap[f"{name}_avg_ms"] = 1000 * total / self.counts[name]
+        return snap
+
+
+class ConnectionPool:
+    """Thread-safe pool of read-only connections to the Employee database"""
+
+    def __init__(self, db_path=DB_PATH, size=4, statement_cache_size=128, timeout=30.0):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.statement_cache_size = statement_cache_size
+        self.stats = PoolStats()
+        self._idle = LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._enable_wal()
+        self._watch = None
+        self._watch_lock = threading.Lock()
+
+    def _enable_wal(self):
+        # journal_mode can't be changed from a read-only connection, and WAL
+        # is persistent, so switch it once with a read-write one (mode=rw
+        # never creates the file, unlike a plain connect)
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"{self.db_path} does not exist, create and seed it with sql.py first")
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=rw", uri=True)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+
+    def _get(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                self.stats.record("connections_opened")
+                return PooledConnection(self.db_path, self.stats, self.statement_cache_size)
+        return self._idle.get(timeout=self.timeout)
+
+    def data_version(self):
+        """Return PRAGMA data_version from a dedicated connection.
+
+        The value changes whenever another connection commits to the database,
+        so callers can compare it to detect that the Employee table changed.
+        """
+        with self._watch_lock:
+            if self._watch is None:
+                self._watch = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, returning it to the pool afterwards"""
+        start = time.perf_counter()
+        conn = self._get()
+        self.stats.record("acquire", time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+        with self._lock:
+            self._created = 0
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = None
+
+
+_pool = None
+_pool_args = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH, **kwargs):
+    """Return the process-wide pool, creating it on first use; later calls must not ask for a different one"""
+    global _pool, _pool_args
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(db_path, **kwargs)
+            _pool_args = (db_path, kwargs)
+        elif (db_path, kwargs) != _pool_args:
+            raise ValueError(f"get_pool{(db_path, kwargs)} after the pool was created with {_pool_args}")
+        return _pool
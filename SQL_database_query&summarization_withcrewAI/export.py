@@ -0,0 +1,195 @@
+import csv
+import os
+
+CHUNK_SIZE = 10_000
+PREVIEW_ROWS = 10
+
+
+class ColumnStats:
+    """Running count/null/min/max (and mean for numbers) of one column"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self._total = 0.0
+        self._numeric = True
+        self._orderable = True
+
+    def update(self, value):
+        if value is None:
+            self.nulls += 1
+            return
+        self.count += 1
+        if not isinstance(value, (int, float)):
+            self._numeric = False
+        if self._orderable:
+            try:
+                if self.min is None or value < self.min:
+                    self.min = value
+                if self.max is None or value > self.max:
+                    self.max = value
+            except TypeError:
+                # mixed types in a column, ordering is meaningless
+                self._orderable = False
+                self.min = self.max = None
+        if self._numeric:
+            self._total += value
+
+    def as_dict(self):
+        stats = {"count": self.count, "nulls": self.nulls, "min": self.min, "max": self.max}
+        if self._numeric and self.count:
+            stats["mean"] = self._total / self.count
+        return stats
+
+
+class _CsvSink:
+    def __init__(self, file_name, column_names):
+        self._file = open(file_name, mode='w', newline='')
+        self._writer = csv.writer(self._file)
+        if column_names:
+            self._writer.writerow(column_names)  # Write the column headers
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowSink:
+    """Parquet or Arrow IPC writer; each fetched chunk becomes one record batch.
+
+    sqlite's cursor.description carries no types, so the schema comes from the
+    data. A column that is all None so far would be null-typed and reject the
+    next chunk's values, so chunks are held back (up to max_buffered_rows)
+    until every column has seen a value, then the types of all buffered
+    chunks are unified and the file is opened with that schema. Columns that
+    are still untyped at that point are written as strings.
+    """
+
+    def __init__(self, file_name, column_names, kind, max_buffered_rows=100_000):
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("pyarrow is required for parquet/arrow output, install it with `pip install pyarrow`") from e
+        self._pa = pa
+        self._file_name = file_name
+        self._column_names = column_names
+        self._kind = kind
+        self.max_buffered_rows = max_buffered_rows
+        self._writer = None
+        self._schema = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def _open(self, schema):
+        if self._kind == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self._file_name, schema)
+        import pyarrow.ipc as ipc
+        return ipc.new_file(self._file_name, schema)
+
+    def _array(self, values, type=None):
+        pa = self._pa
+        if type is not None and pa.types.is_string(type):
+            return pa.array([None if v is None else str(v) for v in values], type)
+        try:
+            return pa.array(values, type=type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError) as e:
+            raise ValueError(f"cannot write a {type or 'typed'} column: {e}; "
+                             f"the query mixes types in one column, CAST it in the SQL") from e
+
+    def _flush(self, final):
+        pa = self._pa
+        # widen across chunks (int64 + double -> double, null + anything -> anything)
+        schema = pa.unify_schemas([batch.schema for batch in self._pending], promote_options="permissive")
+        if not final:
+            schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+        self._schema = schema
+        self._writer = self._open(schema)
+        for batch in self._pending:
+            self._write_batch(pa.RecordBatch.from_arrays(
+                [column.cast(field.type) for column, field in zip(batch.columns, schema)], schema=schema))
+        self._pending = []
+
+    def _write_batch(self, batch):
+        if self._kind == "parquet":
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write(batch)
+
+    def write(self, rows):
+        pa = self._pa
+        columns = list(zip(*rows))
+        if self._writer is not None:
+            self._write_batch(pa.RecordBatch.from_arrays(
+                [self._array(col, field.type) for col, field in zip(columns, self._schema)], schema=self._schema))
+            return
+        self._pending.append(pa.RecordBatch.from_arrays([self._array(col) for col in columns], names=self._column_names))
+        self._pending_rows += len(rows)
+        typed = pa.unify_schemas([batch.schema for batch in self._pending], promote_options="permissive")
+        if not any(pa.types.is_null(field.type) for field in typed) or self._pending_rows >= self.max_buffered_rows:
+            self._flush(final=False)
+
+    def close(self):
+        if self._writer is None:
+            if self._pending:
+                self._flush(final=True)
+            else:
+                # no rows, still leave a valid empty file behind
+                schema = self._pa.schema([(name, self._pa.null()) for name in self._column_names])
+                self._writer = self._open(schema)
+        self._writer.close()
+
+
+def open_sink(file_name, column_names):
+    """Pick the output writer from the file extension"""
+    ext = os.path.splitext(file_name)[1].lower()
+    if ext == ".parquet":
+        return _ArrowSink(file_name, column_names, "parquet")
+    if ext in (".arrow", ".feather", ".ipc"):
+        return _ArrowSink(file_name, column_names, "arrow")
+    return _CsvSink(file_name, column_names)
+
+
+def stream_cursor(cursor, file_name, chunk_size=CHUNK_SIZE, preview_rows=PREVIEW_ROWS):
+    """Write a cursor's rows to file_name in fetchmany chunks.
+
+    Only one chunk is held in memory at a time. Returns a summary with the
+    row count, per-column stats and the first preview_rows rows.
+    """
+    if cursor.description is None:
+        # not a query (DDL, INSERT/UPDATE...): no result set, only an affected row count
+        open_sink(file_name, []).close()
+        return {"file": file_name, "columns": [], "row_count": 0, "preview": [], "truncated": False, "column_stats": {},
+                "affected_rows": cursor.rowcount}
+    column_names = [description[0] for description in cursor.description]
+    stats = [ColumnStats(name) for name in column_names]
+    preview = []
+    row_count = 0
+    sink = open_sink(file_name, column_names)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            sink.write(rows)
+            row_count += len(rows)
+            if len(preview) < preview_rows:
+                preview.extend(rows[:preview_rows - len(preview)])
+            for row in rows:
+                for col, value in zip(stats, row):
+                    col.update(value)
+    finally:
+        sink.close()
+    return {
+        "file": file_name,
+        "columns": column_names,
+        "row_count": row_count,
+        "preview": preview,
+        "truncated": row_count > len(preview),
+        "column_stats": {col.name: col.as_dict() for col in stats},
+    }
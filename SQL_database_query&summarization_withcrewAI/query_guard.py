@@ -0,0 +1,311 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from db_pool import DB_PATH
+from result_cache import _TOKEN_RE, _tokens
+
+log = logging.getLogger(__name__)
+
+# EXPLAIN QUERY PLAN details, e.g. "SCAN Employee", "SCAN TABLE Employee AS e",
+# "SEARCH e USING INDEX idx_employee_salary (salary>?)"
+_LOOP_RE = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$")
+_COMPARISONS = {"=", "<", ">", "!", "like", "in", "between", "is", "glob"}
+_CLAUSE_END = {"limit", "offset", "union", "except", "intersect", ")", ";"}
+_AGGREGATES = {"count", "sum", "avg", "min", "max", "total", "group_concat"}
+_NOT_ALIAS = {"where", "join", "inner", "left", "right", "full", "outer", "cross", "natural", "on", "using",
+              "group", "order", "limit", "having", "union", "except", "intersect", "window"}
+
+
+class QueryRejected(Exception):
+    """The query was not run; the message says why and what to change"""
+
+
+class Verdict:
+    def __init__(self, query, plan, estimated_rows, notes):
+        self.query = query
+        self.plan = plan
+        self.estimated_rows = estimated_rows
+        self.notes = notes
+
+
+def _aliases(tokens):
+    """alias or table name -> table name, for the tables after FROM/JOIN and in FROM a, b lists"""
+    names = {}
+    in_from = False
+    for i, token in enumerate(tokens[:-1]):
+        if token == "from":
+            in_from = True
+        elif token in _NOT_ALIAS or token in ("select", "(", ")"):
+            in_from = token in ("join", "inner", "left", "right", "full", "outer", "cross", "natural")
+        if (token in ("from", "join") or (token == "," and in_from)) and re.match(r"\w+$", tokens[i + 1]):
+            table = tokens[i + 1]
+            names[table] = table
+            j = i + 2
+            if j < len(tokens) and tokens[j] == "as":
+                j += 1
+            if j < len(tokens) and re.match(r"\w+$", tokens[j]) and tokens[j] not in _NOT_ALIAS:
+                names[tokens[j]] = table
+    return names
+
+
+def predicate_columns(tokens):
+    """[(qualifier or None, column)] compared in WHERE/ON or sorted by in ORDER BY"""
+    columns = []
+    for i, token in enumerate(tokens[:-1]):
+        if re.match(r"[a-z_]\w*$", token) and tokens[i + 1] in _COMPARISONS:
+            qualifier = tokens[i - 2] if i >= 2 and tokens[i - 1] == "." else None
+            columns.append((qualifier, token))
+    for i, token in enumerate(tokens[:-1]):
+        if token == "order" and tokens[i + 1] == "by":
+            j = i + 2
+            while j < len(tokens) and tokens[j] not in _CLAUSE_END:
+                if re.match(r"[a-z_]\w*$", tokens[j]) and tokens[j] not in ("asc", "desc", "nulls", "first", "last"):
+                    qualified = j >= 2 and tokens[j - 1] == "."
+                    if not (j + 1 < len(tokens) and tokens[j + 1] in (".", "(")):
+                        columns.append((tokens[j - 2] if qualified else None, tokens[j]))
+                j += 1
+    return columns
+
+
+def _has_top_level_limit(tokens):
+    depth = 0
+    for token in tokens:
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif token == "limit" and depth == 0:
+            return True
+    return False
+
+
+def _is_aggregate(tokens):
+    """True for a top-level GROUP BY or aggregate call: the result is far smaller than the rows scanned"""
+    depth = 0
+    for i, token in enumerate(tokens[:-1]):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and ((token == "group" and tokens[i + 1] == "by")
+                             or (token in _AGGREGATES and tokens[i + 1] == "(")):
+            return True
+    return False
+
+
+def _statement_end(query):
+    """Offset just past the last token that is not a comment or a semicolon"""
+    end = 0
+    for match in _TOKEN_RE.finditer(query):
+        token = match.group()
+        if token != ";" and not token.startswith(("--", "/*")):
+            end = match.end()
+    return end
+
+
+def _search_rows(rows, constraint):
+    # like sqlite's own guesses: an equality on the primary key is one row,
+    # other equalities a tenth, one range bound a quarter, two a sixteenth
+    if "=" in constraint and not any(op in constraint for op in "<>"):
+        return 1 if "PRIMARY KEY" in constraint else max(1, rows // 10)
+    bounds = sum(constraint.count(op) for op in "<>")
+    return max(1, rows // (4 if bounds < 2 else 16))
+
+
+class IndexAdvisor:
+    """Counts predicates on fully scanned tables and proposes (or creates) indexes.
+
+    With auto_create, CREATE INDEX runs on a background thread so the query
+    that crossed min_count is not held up by it.
+    """
+
+    def __init__(self, db_path=DB_PATH, min_count=3, auto_create=False):
+        self.db_path = db_path
+        self.min_count = min_count
+        self.auto_create = auto_create
+        self.seen = Counter()  # (table, column) -> queries that scanned table filtering/sorting on column
+        self.created = []
+        self._lock = threading.Lock()
+
+    def record(self, table, column):
+        with self._lock:
+            self.seen[(table, column)] += 1
+            due = self.auto_create and self.seen[(table, column)] == self.min_count
+        if due:
+            threading.Thread(target=self._create_in_background, args=(table, column), daemon=True).start()
+
+    def _create_in_background(self, table, column):
+        try:
+            self.create(table, column)
+        except sqlite3.Error as e:
+            log.warning("could not create index on %s(%s): %s", table, column, e)
+
+    def suggestions(self):
+        with self._lock:
+            return [f"CREATE INDEX IF NOT EXISTS idx_{table.lower()}_{column} ON {table}({column})"
+                    for (table, column), count in self.seen.most_common()
+                    if count >= self.min_count and (table, column) not in self.created]
+
+    def create(self, table, column):
+        # the pool's connections are read-only
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table.lower()}_{column}" ON "{table}"("{column}")')
+                conn.execute(f'ANALYZE "{table}"')
+        finally:
+            conn.close()
+        with self._lock:
+            self.created.append((table, column))
+
+
+class QueryGuard:
+    """Checks agent-written SQL with EXPLAIN QUERY PLAN before it runs.
+
+    Row counts come from count(*) per table, cached per data_version. A
+    nested-loop plan multiplies the rows of its loops; SEARCH loops count a
+    fraction of the table (see _search_rows). Cartesian products above
+    max_rows are rejected, other plans above max_rows without a LIMIT get
+    LIMIT row_limit appended (not aggregates, whose result is small however
+    many rows they read), plans whose loops other than range SEARCHes
+    multiply out above reject_rows are rejected outright, and every query
+    runs under a time budget.
+    """
+
+    def __init__(self, max_rows=100_000, row_limit=1000, reject_rows=10_000_000, time_budget=5.0,
+                 advisor=None, version_fn=None):
+        self.max_rows = max_rows
+        self.reject_rows = reject_rows
+        self.row_limit = row_limit
+        self.time_budget = time_budget
+        self.advisor = advisor
+        self.version_fn = version_fn
+        self.stats = Counter()
+        self._row_counts = {}
+
+    def _table_rows(self, conn, table):
+        version = self.version_fn() if self.version_fn else None
+        key = (table, version)
+        if key not in self._row_counts:
+            # counts from an older data_version are stale
+            self._row_counts = {k: v for k, v in self._row_counts.items() if k[1] == version}
+            self._row_counts[key] = conn.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+        return self._row_counts[key]
+
+    def _unindexed_columns(self, conn, table):
+        """Columns that are neither the primary key nor the first column of an index"""
+        columns = {row[1].lower() for row in conn.execute(f'PRAGMA table_info("{table}")') if not row[5]}
+        for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+            first = conn.execute(f'PRAGMA index_info("{index[1]}")').fetchone()
+            if first is not None and first[2] is not None:
+                columns.discard(first[2].lower())
+        return columns
+
+    def _canonical_table(self, conn, name):
+        row = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND lower(name) = ?",
+                           (name.lower(),)).fetchone()
+        return row[0] if row else None
+
+    def check(self, conn, query):
+        """Return a Verdict for the query to run, or raise QueryRejected"""
+        tokens = list(_tokens(query))
+        while tokens and tokens[-1] == ";":
+            tokens.pop()
+        if not tokens or tokens[0] not in ("select", "with"):
+            self.stats["rejected"] += 1
+            raise QueryRejected("Only SELECT queries can be run against the Employee database.")
+        if ";" in tokens:
+            self.stats["rejected"] += 1
+            raise QueryRejected("Run one statement at a time.")
+
+        try:
+            plan = [tuple(row) for row in conn.execute("EXPLAIN QUERY PLAN " + query.strip().rstrip(";"))]
+        except sqlite3.Error as e:
+            self.stats["rejected"] += 1
+            raise QueryRejected(f"The query does not compile: {e}")
+        names = _aliases(tokens)
+
+        loops = {}  # parent id -> [(kind, table, rows, ranged)]
+        scanned = set()
+        for node_id, parent, _, detail in plan:
+            match = _LOOP_RE.match(detail)
+            if not match:
+                continue
+            kind, name, alias, rest = match.groups()
+            table = self._canonical_table(conn, names.get(name.lower(), name))
+            if table is None:
+                continue  # a CTE or subquery
+            rows = self._table_rows(conn, table)
+            ranged = False
+            if kind == "SEARCH":
+                rows = _search_rows(rows, rest)
+                ranged = "<" in rest or ">" in rest
+            elif "INDEX" not in rest:
+                scanned.add(table)
+            loops.setdefault(parent, []).append((kind, table, rows, ranged))
+
+        estimate = 0
+        # a range bound's selectivity is a guess (a quarter), so it can limit a query but not
+        # reject it: rejection only counts the loops whose row counts are not range guesses
+        firm_estimate = 0
+        notes = []
+        for group in loops.values():
+            product = 1
+            firm_product = 1
+            for _, _, rows, ranged in group:
+                product *= rows
+                if not ranged:
+                    firm_product *= rows
+            estimate += product
+            firm_estimate += firm_product
+            scans = [table for kind, table, _, _ in group if kind == "SCAN"]
+            if len(scans) > 1 and product > self.max_rows:
+                self.stats["rejected"] += 1
+                raise QueryRejected(
+                    f"Rejected: the plan is a cartesian product of {', '.join(scans)} (~{product:,} rows). "
+                    f"Join the tables on a key or add a WHERE condition."
+                )
+
+        if self.advisor is not None and scanned:
+            columns = {table: self._unindexed_columns(conn, table) for table in scanned}
+            for qualifier, column in predicate_columns(tokens):
+                owners = [t for t in scanned if column in columns[t]
+                          and (qualifier is None or names.get(qualifier, qualifier).lower() == t.lower())]
+                if len(owners) == 1:
+                    self.advisor.record(owners[0], column)
+
+        if firm_estimate > self.reject_rows:
+            self.stats["rejected"] += 1
+            raise QueryRejected(
+                f"Rejected: the plan ({'; '.join(row[3] for row in plan)}) touches ~{firm_estimate:,} rows or more. "
+                f"Filter on an indexed column or aggregate before joining."
+            )
+        if estimate > self.max_rows and not _has_top_level_limit(tokens) and not _is_aggregate(tokens):
+            # cut trailing comments and semicolons, and start a new line so nothing can comment the LIMIT out
+            query = f"{query[:_statement_end(query)]}\nLIMIT {self.row_limit}"
+            notes.append(f"plan reads ~{estimate:,} rows without LIMIT, added LIMIT {self.row_limit}")
+            self.stats["rewritten"] += 1
+        self.stats["checked"] += 1
+        return Verdict(query, plan, estimate, notes)
+
+    @contextmanager
+    def budget(self, conn, seconds=None):
+        """Abort statements on conn that run longer than the budget, including while rows are fetched"""
+        raw = getattr(conn, "conn", conn)
+        seconds = self.time_budget if seconds is None else seconds
+        deadline = time.perf_counter() + seconds
+        raw.set_progress_handler(lambda: 1 if time.perf_counter() > deadline else 0, 10_000)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if "interrupt" not in str(e):
+                raise
+            self.stats["timed_out"] += 1
+            raise QueryRejected(f"Rejected: the query ran longer than {seconds:g}s. Filter or aggregate more.")
+        finally:
+            raw.set_progress_handler(None, 0)
@@ -0,0 +1,37 @@
+from export import stream_cursor
+from query_guard import QueryGuard, QueryRejected
+
+
+def make_guard(version_fn, advisor=None):
+    """The limits the agent's queries run under"""
+    return QueryGuard(max_rows=100_000, row_limit=1000, time_budget=5.0, advisor=advisor, version_fn=version_fn)
+
+
+def run_query(query, file_name, pool, guard, cache, recorder, app="sql_crew"):
+    """What the agent's query_database tool does: result cache, query guard, pooled connection, streamed export.
+
+    Kept free of crewai and the LLM so common/replay.py can run recorded
+    queries through the same path.
+    """
+    with recorder.span("cache", "query_cache", app=app, input=query, file=file_name) as span:
+        result = cache.get_result(query, file_name)
+        span.hit(result is not None)
+    if result is not None:
+        return result
+    try:
+        with recorder.span("db", "query_database", app=app, input=query) as span, \
+                pool.connection() as conn:
+            verdict = guard.check(conn, query)
+            # rows are produced while streaming, so the budget covers the fetch too
+            with guard.budget(conn):
+                cursor = conn.execute(verdict.query)
+                result = stream_cursor(cursor, file_name)
+            span.attrs["estimated_rows"] = verdict.estimated_rows
+            span.output = result
+    except QueryRejected as e:
+        # the agent reads this and can rewrite the query
+        return {"error": str(e)}
+    if verdict.notes:
+        result["guard"] = verdict.notes
+    cache.put_result(query, result)
+    return result
@@ -0,0 +1,235 @@
+import atexit
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# string literals, quoted identifiers, comments, words, numbers, punctuation
+_TOKEN_RE = re.compile(
+    r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/|\w+|\S""",
+    re.S,
+)
+_ALIAS_AFTER = {"from", "join"}
+_NOT_ALIAS = {
+    "where", "join", "inner", "left", "right", "full", "outer", "cross", "natural", "on", "using",
+    "group", "order", "limit", "having", "union", "except", "intersect", "window", "as",
+}
+
+
+def _tokens(query):
+    for token in _TOKEN_RE.findall(query):
+        if token.startswith("--") or token.startswith("/*"):
+            continue
+        if token[0] in "'\"`[":
+            yield token  # literals and quoted names keep their case
+        else:
+            yield token.lower()
+
+
+def normalize_sql(query):
+    """Canonical form of a query for use as a cache key.
+
+    Drops comments, whitespace differences and a trailing semicolon,
+    lowercases everything outside quotes and replaces table aliases with the
+    table name (or t0, t1, ... when a table is used more than once).
+    """
+    tokens = list(_tokens(query))
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+
+    aliases = {}
+    tables = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] in _ALIAS_AFTER and i + 1 < len(tokens) and tokens[i + 1] != "(":
+            table = tokens[i + 1]
+            j = i + 2
+            if j < len(tokens) and tokens[j] == "as":
+                j += 1
+            if j < len(tokens) and re.match(r"\w+$", tokens[j]) and tokens[j] not in _NOT_ALIAS:
+                aliases[tokens[j]] = (table, j)
+            tables.append(table)
+        i += 1
+
+    renames = {}
+    drop = set()
+    for alias, (table, pos) in aliases.items():
+        if tables.count(table) == 1:
+            renames[alias] = table
+        else:
+            renames[alias] = f"t{len(renames)}"
+            continue
+        drop.add(pos)
+        if tokens[pos - 1] == "as":
+            drop.add(pos - 1)
+
+    declared = {pos for _, pos in aliases.values()}
+    out = []
+    for pos, token in enumerate(tokens):
+        if pos in drop:
+            continue
+        qualifier = pos + 1 < len(tokens) and tokens[pos + 1] == "."
+        if token in renames and (qualifier or pos in declared):
+            token = renames[token]
+        out.append(token)
+    return " ".join(out)
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def normalize_question(question):
+    """Lowercase and strip punctuation/whitespace differences from a question"""
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after ttl seconds; on_evict(value) sees every entry dropped"""
+
+    def __init__(self, maxsize=256, ttl=3600.0, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _dropped(self, values):
+        if self.on_evict is not None:
+            for value in values:
+                self.on_evict(value)
+
+    def get(self, key, valid=None):
+        """The value for key, or None; an entry that fails valid(value) is dropped and counted as a miss"""
+        dropped = []
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[1] < time.monotonic() or (valid is not None and not valid(item[0]))):
+                del self._data[key]
+                dropped.append(item[0])
+                item = None
+            if item is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        self._dropped(dropped)
+        return None if item is None else item[0]
+
+    def put(self, key, value):
+        dropped = []
+        with self._lock:
+            old = self._data.get(key)
+            if old is not None and old[0] is not value:
+                dropped.append(old[0])
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                dropped.append(self._data.popitem(last=False)[1][0])
+        self._dropped(dropped)
+
+    def clear(self):
+        with self._lock:
+            dropped = [value for value, _ in self._data.values()]
+            self._data.clear()
+        self._dropped(dropped)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class QueryCache:
+    """Two-level cache: (normalized SQL, output format) -> result, question -> summary.
+
+    A repeated question is answered from the summary level without the
+    database or the LLM; a new question whose agent writes a query that was
+    already run gets the result without the database. Both levels are
+    dropped when version_fn (e.g. the pool's data_version) changes.
+
+    Every query writes to the same output file (results.csv), so each cached
+    result keeps its own copy of the output under cache_dir (a temporary
+    directory removed at exit by default), which is copied to the requested
+    file on a hit and deleted when the entry is dropped.
+    """
+
+    def __init__(self, version_fn, maxsize=256, ttl=3600.0, summary_ttl=24 * 3600.0, cache_dir=None):
+        self.version_fn = version_fn
+        if cache_dir is None:
+            cache_dir = tempfile.mkdtemp(prefix="query_cache-")
+            atexit.register(shutil.rmtree, cache_dir, True)
+        self.cache_dir = cache_dir
+        self.results = TTLCache(maxsize, ttl, on_evict=self._remove_copy)
+        self.summaries = TTLCache(maxsize, summary_ttl)
+        # set by get_result/put_result, so answer() only caches summaries of a run that queried
+        self.queried = False
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        version = self.version_fn()
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self.results.clear()
+                self.summaries.clear()
+
+    @staticmethod
+    def _result_key(query, file_name):
+        # the file is reused as is, so a CSV result cannot answer a .parquet request
+        return normalize_sql(query), os.path.splitext(file_name)[1].lower()
+
+    @staticmethod
+    def _remove_copy(result):
+        try:
+            os.remove(result["file"])
+        except OSError:
+            pass
+
+    def get_result(self, query, file_name):
+        """Return a cached result for query, copying its output file to file_name"""
+        self._check_version()
+        # a copy that was deleted or changed behind our back is a miss
+        result = self.results.get(self._result_key(query, file_name),
+                                  valid=lambda cached: _file_stamp(cached["file"]) == cached["file_stamp"])
+        if result is None:
+            return None
+        shutil.copyfile(result["file"], file_name)
+        self.queried = True
+        result = dict(result, file=file_name)
+        del result["file_stamp"]
+        return result
+
+    def put_result(self, query, result):
+        self._check_version()
+        key = self._result_key(query, result["file"])
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # a fresh name, so replacing an entry cannot delete the copy that replaces it
+        copy = os.path.join(self.cache_dir, uuid.uuid4().hex + key[1])
+        shutil.copyfile(result["file"], copy)
+        result = dict(result, file=copy, file_stamp=_file_stamp(copy))
+        self.results.put(key, result)
+        self.queried = True
+
+    def get_summary(self, question):
+        self._check_version()
+        return self.summaries.get(normalize_question(question))
+
+    def put_summary(self, question, summary):
+        self._check_version()
+        self.summaries.put(normalize_question(question), summary)
+
+    def stats(self):
+        return {
+            name: {"hits": cache.hits, "misses": cache.misses, "size": len(cache)}
+            for name, cache in (("results", self.results), ("summaries", self.summaries))
+        }
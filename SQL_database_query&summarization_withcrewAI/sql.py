@@ -1,9 +1,15 @@
+import argparse
 import sqlite3
+import time
+from multiprocessing import Pool
 from faker import Faker
 
-def create_table():
+DB_PATH = "database.db"
+
+
+def create_table(db_path=DB_PATH):
     """Create Employee table"""
-    conn = sqlite3.connect("database.db")
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     cursor.execute('''CREATE TABLE IF NOT EXISTS Employee (
                       id INTEGER PRIMARY KEY,
@@ -13,25 +19,89 @@ def create_table():
     conn.commit()
     conn.close()
 
-def insert_employee(id, name, dept, salary):
+def insert_employee(id, name, dept, salary, db_path=DB_PATH):
     """Insert a new employee into the Employee table"""
-    conn = sqlite3.connect("database.db")
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     cursor.execute("INSERT INTO Employee (id, name, dept, salary) VALUES (?, ?, ?, ?)", (id, name, dept, salary))
     conn.commit()
     conn.close()
 
-def generate_fake_data(num_records):
-    """Generate fake data using faker"""
+def generate_rows(start, stop, seed=None):
+    """Generate fake Employee rows with ids in [start, stop)"""
     fake = Faker()
-    for i in range(1, num_records + 1):
-        name = fake.name()
-        dept = fake.job()
-        salary = fake.random_number(digits=5)
-        insert_employee(i, name, dept, salary)
+    if seed is not None:
+        # seed per chunk so parallel runs are reproducible
+        fake.seed_instance(seed + start)
+    return [
+        (i, fake.name(), fake.job(), fake.random_number(digits=5))
+        for i in range(start, stop)
+    ]
+
+def _generate_chunk(args):
+    return generate_rows(*args)
+
+def _row_chunks(num_records, chunk_size, workers, seed):
+    """Yield lists of rows, generated in worker processes when workers > 1"""
+    ranges = [
+        (start, min(start + chunk_size, num_records + 1), seed)
+        for start in range(1, num_records + 1, chunk_size)
+    ]
+    if workers <= 1:
+        for r in ranges:
+            yield generate_rows(*r)
+        return
+    with Pool(workers) as pool:
+        # imap keeps ordering and only holds a few chunks in memory at a time
+        for rows in pool.imap(_generate_chunk, ranges):
+            yield rows
+
+def bulk_load_employees(num_records, db_path=DB_PATH, batch_size=50_000, workers=1,
+                        journal_mode="WAL", synchronous="NORMAL", seed=None):
+    """Load fake employees through one connection, committing every batch_size rows.
+
+    Rows are generated in `workers` processes and written by this process with
+    executemany, so the load is bound by disk writes instead of one fsync per row.
+    Returns the number of rows inserted.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        inserted = 0
+        for rows in _row_chunks(num_records, batch_size, workers, seed):
+            with conn:  # one transaction per batch
+                conn.executemany(
+                    "INSERT INTO Employee (id, name, dept, salary) VALUES (?, ?, ?, ?)", rows
+                )
+            inserted += len(rows)
+        return inserted
+    finally:
+        conn.close()
+
+def generate_fake_data(num_records, db_path=DB_PATH, **kwargs):
+    """Generate fake data using faker"""
+    return bulk_load_employees(num_records, db_path=db_path, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the Employee table with fake data")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--journal-mode", default="WAL")
+    parser.add_argument("--synchronous", default="NORMAL")
+    args = parser.parse_args()
 
-# Create the Employee table if it doesn't exist
-create_table()
+    # Create the Employee table if it doesn't exist
+    create_table(args.db)
 
-# Generate and insert fake data
-generate_fake_data(100)
+    # Generate and insert fake data
+    start = time.perf_counter()
+    count = generate_fake_data(args.rows, db_path=args.db, batch_size=args.batch_size,
+                               workers=args.workers, journal_mode=args.journal_mode,
+                               synchronous=args.synchronous)
+    elapsed = time.perf_counter() - start
+    print(f"Inserted {count} rows in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
@@ -0,0 +1 @@
+"""Helpers shared by the apps in this repo (add the repo root to sys.path to import them)."""
@@ -0,0 +1,75 @@
+import re
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """Local, dependency-free text embeddings.
+
+    Words and character n-grams are hashed into `dim` buckets (crc32, so
+    vectors are stable across processes) and the result is L2-normalized.
+    Good enough for catching rephrasings of the same question; swap in
+    SentenceTransformerEmbedder for real semantic similarity.
+    """
+
+    def __init__(self, dim=512, ngram_range=(3, 5), cache_size=4096):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.embed = lru_cache(maxsize=cache_size)(self._embed)
+
+    def _features(self, text):
+        words = _WORD_RE.findall(text.lower())
+        for word in words:
+            yield "w:" + word, 2.0
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(len(padded) - n + 1):
+                    yield padded[i:i + n], 1.0
+        for a, b in zip(words, words[1:]):
+            yield f"b:{a} {b}", 1.5
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode())
+            # the sign bit keeps collisions from only ever adding up
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        vector.setflags(write=False)
+        return vector
+
+    def embed_many(self, texts):
+        return np.stack([self.embed(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+
+class SentenceTransformerEmbedder:
+    """sentence-transformers model run locally, with a small LRU of recent texts"""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", cache_size=4096):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.embed = lru_cache(maxsize=cache_size)(self._embed)
+
+    def _embed(self, text):
+        vector = self.model.encode(text, normalize_embeddings=True).astype(np.float32)
+        vector.setflags(write=False)
+        return vector
+
+    def embed_many(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True).astype(np.float32)
+
+
+def default_embedder():
+    """sentence-transformers when it is installed, hashing otherwise"""
+    try:
+        return SentenceTransformerEmbedder()
+    except Exception:
+        return HashingEmbedder()
@@ -0,0 +1,319 @@
+"""One instrumentation surface for every model, DB and graph call in the repo.
+
+    recorder = get_recorder()
+    with recorder.span("llm", "bedrock.invoke_model", app="bedrock", input=prompt) as span:
+        for delta in span.stream(deltas):   # marks time to first token
+            ...
+        span.tokens(prompt=120, completion=48)
+        span.output = text
+
+Spans end up in per-(app, kind, name) counters and latency histograms,
+exported in Prometheus text format (prometheus_text(), or an HTTP endpoint
+with serve_metrics()), and, when a trace path is set, as one JSON line per
+span. Those JSONL traces are what common/replay.py replays offline.
+
+Configuration through the environment, so apps need no code to opt in:
+    GENAI_TRACE=traces.jsonl      write spans to this file
+    GENAI_METRICS_PORT=9464       serve /metrics on this port
+
+Workers forked by common.startup.prefork each serve their own counters on
+GENAI_METRICS_PORT + worker index (9464, 9465, ...): scrape every port.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# seconds; Prometheus-style cumulative buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Span:
+    __slots__ = ("id", "kind", "name", "app", "start", "ttft", "duration", "prompt_tokens",
+                 "completion_tokens", "cache_hit", "error", "input", "output", "attrs", "_t0")
+
+    def __init__(self, kind, name, app, input=None, **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind  # "llm", "db", "graph", "cache", "router"
+        self.name = name
+        self.app = app
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.ttft = None
+        self.duration = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.cache_hit = None
+        self.error = None
+        self.input = input
+        self.output = None
+        self.attrs = attrs
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self._t0
+
+    def tokens(self, prompt=None, completion=None):
+        if prompt is not None:
+            self.prompt_tokens = (self.prompt_tokens or 0) + prompt
+        if completion is not None:
+            self.completion_tokens = (self.completion_tokens or 0) + completion
+
+    def hit(self, hit=True):
+        self.cache_hit = bool(hit)
+
+    def stream(self, iterator):
+        """Pass an iterator of text deltas through, timing the first one and keeping the text"""
+        parts = []
+        for item in iterator:
+            self.first_token()
+            parts.append(item if isinstance(item, str) else str(item))
+            yield item
+        if self.output is None:
+            self.output = "".join(parts)
+
+    async def astream(self, iterator):
+        parts = []
+        async for item in iterator:
+            self.first_token()
+            parts.append(item if isinstance(item, str) else str(item))
+            yield item
+        if self.output is None:
+            self.output = "".join(parts)
+
+    def as_dict(self, max_payload=None):
+        # structured payloads (graph params and records, chat prompts) are kept
+        # whole so they can be replayed; only long text is cut, and marked
+        clipped = []
+
+        def clip(field, value):
+            if max_payload is None or not isinstance(value, str) or len(value) <= max_payload:
+                return value
+            clipped.append(field)
+            return value[:max_payload]
+
+        data = {"id": self.id, "kind": self.kind, "name": self.name, "app": self.app, "start": self.start,
+                "ttft": self.ttft, "duration": self.duration, "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens, "cache_hit": self.cache_hit, "error": self.error,
+                "input": clip("input", self.input), "output": clip("output", self.output), "attrs": self.attrs}
+        if clipped:
+            data["attrs"] = dict(self.attrs, clipped=clipped)
+        return data
+
+
+class _Series:
+    __slots__ = ("count", "errors", "hits", "misses", "seconds", "ttft_seconds", "ttft_count",
+                 "prompt_tokens", "completion_tokens", "buckets")
+
+    def __init__(self):
+        self.count = self.errors = self.hits = self.misses = self.ttft_count = 0
+        self.seconds = self.ttft_seconds = 0.0
+        self.prompt_tokens = self.completion_tokens = 0
+        self.buckets = [0] * len(BUCKETS)
+
+
+def _labels(app, kind, name):
+    return f'app="{app}",kind="{kind}",name="{name}"'
+
+
+class Recorder:
+    def __init__(self, app="genai", trace_path=None, max_payload=4000):
+        self.app = app
+        self.trace_path = trace_path
+        self.max_payload = max_payload
+        self.series = {}
+        self._lock = threading.Lock()
+        self._trace = None
+
+    @contextmanager
+    def span(self, kind, name, app=None, input=None, **attrs):
+        span = Span(kind, name, app or self.app, input, **attrs)
+        try:
+            yield span
+        except GeneratorExit:
+            # the caller stopped reading a stream early
+            span.attrs["cancelled"] = True
+            raise
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._t0
+            self.finish(span)
+
+    def finish(self, span):
+        with self._lock:
+            series = self.series.get((span.app, span.kind, span.name))
+            if series is None:
+                series = self.series[(span.app, span.kind, span.name)] = _Series()
+            series.count += 1
+            series.seconds += span.duration
+            series.errors += span.error is not None
+            if span.cache_hit is not None:
+                series.hits += span.cache_hit
+                series.misses += not span.cache_hit
+            if span.ttft is not None:
+                series.ttft_count += 1
+                series.ttft_seconds += span.ttft
+            series.prompt_tokens += span.prompt_tokens or 0
+            series.completion_tokens += span.completion_tokens or 0
+            for i, bound in enumerate(BUCKETS):
+                if span.duration <= bound:
+                    series.buckets[i] += 1
+            if self.trace_path:
+                if self._trace is None:
+                    self._trace = open(self.trace_path, "a", encoding="utf-8")
+                self._trace.write(json.dumps(span.as_dict(self.max_payload), default=str) + "\n")
+                self._trace.flush()
+
+    def prometheus_text(self):
+        lines = []
+
+        def family(metric, kind, help_text):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+        with self._lock:
+            items = sorted(self.series.items())
+            family("genai_call_duration_seconds", "histogram", "Latency of model, DB and graph calls")
+            for (app, kind, name), s in items:
+                labels = _labels(app, kind, name)
+                for bound, count in zip(BUCKETS, s.buckets):
+                    lines.append(f'genai_call_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'genai_call_duration_seconds_bucket{{{labels},le="+Inf"}} {s.count}')
+                lines.append(f"genai_call_duration_seconds_sum{{{labels}}} {s.seconds:.6f}")
+                lines.append(f"genai_call_duration_seconds_count{{{labels}}} {s.count}")
+            for metric, help_text, value in (
+                ("genai_call_errors_total", "Calls that raised", lambda s: s.errors),
+                ("genai_cache_hits_total", "Calls answered from a cache", lambda s: s.hits),
+                ("genai_cache_misses_total", "Cache lookups that missed", lambda s: s.misses),
+                ("genai_prompt_tokens_total", "Prompt tokens sent", lambda s: s.prompt_tokens),
+                ("genai_completion_tokens_total", "Completion tokens received", lambda s: s.completion_tokens),
+                ("genai_time_to_first_token_seconds_sum", "Summed time to first token", lambda s: s.ttft_seconds),
+                ("genai_time_to_first_token_seconds_count", "Streams with a first token", lambda s: s.ttft_count),
+            ):
+                family(metric, "counter", help_text)
+                for (app, kind, name), s in items:
+                    lines.append(f"{metric}{{{_labels(app, kind, name)}}} {value(s)}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """{"app/kind/name": {...}} averages, e.g. for a regression baseline"""
+        with self._lock:
+            return {
+                f"{app}/{kind}/{name}": {
+                    "count": s.count,
+                    "avg_seconds": s.seconds / s.count,
+                    "avg_ttft": s.ttft_seconds / s.ttft_count if s.ttft_count else None,
+                    "errors": s.errors,
+                    "hit_rate": s.hits / (s.hits + s.misses) if s.hits + s.misses else None,
+                    "prompt_tokens": s.prompt_tokens,
+                    "completion_tokens": s.completion_tokens,
+                }
+                for (app, kind, name), s in sorted(self.series.items())
+            }
+
+    def close(self):
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+
+def serve_metrics(recorder, port=9464, host="0.0.0.0"):
+    """Serve recorder.prometheus_text() at /metrics from a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = recorder.prometheus_text().encode()
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def langchain_callback(recorder, name, app=None):
+    """A LangChain callback handler that records every LLM call it sees as a span.
+
+    Attach it to any LangChain chat model (ChatOpenAI, ChatGoogleGenerativeAI,
+    the Neo4j QA chain's LLM, ...) with `callbacks=[...]`.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class SpanCallback(BaseCallbackHandler):
+        def __init__(self):
+            self.open = {}
+
+        def _start(self, run_id, prompt):
+            self.open[run_id] = Span("llm", name, app or recorder.app, prompt)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id, "\n".join(prompts))
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id, "\n".join(f"{m.type}: {m.content}" for batch in messages for m in batch))
+
+        def on_llm_new_token(self, token, *, run_id, **kwargs):
+            span = self.open.get(run_id)
+            if span is not None:
+                span.first_token()
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            span = self.open.pop(run_id, None)
+            if span is None:
+                return
+            generations = [g for batch in response.generations for g in batch]
+            span.output = "".join(g.text for g in generations)
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt = usage.get("prompt_tokens")
+            completion = usage.get("completion_tokens")
+            for g in generations:
+                metadata = getattr(getattr(g, "message", None), "usage_metadata", None)
+                if metadata and prompt is None:
+                    span.tokens(metadata.get("input_tokens"), metadata.get("output_tokens"))
+            span.tokens(prompt, completion)
+            span.duration = time.perf_counter() - span._t0
+            recorder.finish(span)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            span = self.open.pop(run_id, None)
+            if span is not None:
+                span.error = type(error).__name__
+                span.duration = time.perf_counter() - span._t0
+                recorder.finish(span)
+
+    return SpanCallback()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder(app=None):
+    """The process-wide recorder, configured from GENAI_TRACE / GENAI_METRICS_PORT on first use"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = Recorder(app or "genai", trace_path=os.getenv("GENAI_TRACE") or None)
+            port = os.getenv("GENAI_METRICS_PORT")
+            if port:
+                # prefork() sets the index, so forked workers do not fight over one port
+                port = int(port) + int(os.getenv("GENAI_WORKER_INDEX", "0"))
+                try:
+                    serve_metrics(_recorder, port)
+                except OSError as e:
+                    # no /metrics is not a reason to stop serving requests
+                    print(f"[{os.getpid()}] not serving /metrics on port {port}: {e}", file=sys.stderr)
+        return _recorder
@@ -0,0 +1,280 @@
+import asyncio
+import email.utils
+import hashlib
+import json
+import queue
+import threading
+import time
+
+
+class RateLimited(Exception):
+    """The provider answered 429 more often than max_retries allows"""
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to `per_minute` in the bucket"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1.0):
+        # asking for more than fits in the bucket would never succeed
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def block_for(self, seconds):
+        """Stop handing out tokens, e.g. after a 429 with Retry-After"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class Provider:
+    def __init__(self, name, base_url, api_key, max_concurrency=16, rpm=3500, tpm=90_000):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+
+def retry_after_seconds(value, default):
+    """Seconds to wait from a Retry-After header, which is either delta-seconds or an HTTP date"""
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, when.timestamp() - time.time())
+
+
+def estimate_tokens(messages, max_tokens):
+    """Upper bound used for the TPM bucket before the real usage is known"""
+    prompt = sum(len(str(m.get("content", ""))) // 4 + 4 for m in messages)
+    return prompt + max_tokens
+
+
+class AsyncLLMPool:
+    """Shared async client for OpenAI-compatible chat APIs.
+
+    A few httpx.AsyncClients (keep-alive connection pools of `shard_size`
+    connections each) serve every session, each request going to the least
+    busy one: httpcore rescans its whole pool for every queued request, which
+    with ~100 reused connections costs more CPU than new connections would.
+    Each provider has its own concurrency limit and RPM/TPM token buckets, so
+    requests wait their turn locally instead of collecting 429s; a 429 that
+    still gets through pauses the provider for Retry-After. Identical
+    temperature=0 requests in flight at the same time share one upstream
+    stream; the stream is cancelled when every reader has stopped.
+    """
+
+    def __init__(self, max_connections=200, timeout=60.0, max_retries=3, coalesce=True, transport=None,
+                 shard_size=16):
+        self.max_connections = max_connections
+        self.shard_size = shard_size
+        # an httpx transport to use instead of the network, e.g. replay.MockLLM.transport()
+        self.transport = transport
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.coalesce = coalesce
+        self.providers = {}
+        self.stats = {"requests": 0, "coalesced": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._clients = None
+        self._busy = []
+        self._inflight = {}
+
+    @property
+    def clients(self):
+        if self._clients is None:
+            import httpx
+
+            shards = max(1, -(-self.max_connections // self.shard_size))
+            size = -(-self.max_connections // shards)
+            limits = httpx.Limits(max_connections=size, max_keepalive_connections=size)
+            # loading the CA bundle is the slow part of a client, do it once for all of them
+            verify = httpx.create_ssl_context()
+            self._clients = [httpx.AsyncClient(limits=limits, timeout=self.timeout, verify=verify,
+                                               transport=self.transport) for _ in range(shards)]
+            self._busy = [0] * shards
+        return self._clients
+
+    def add_provider(self, name, base_url, api_key, **limits):
+        self.providers[name] = Provider(name, base_url, api_key, **limits)
+
+    async def stream_chat(self, provider, model, messages, max_tokens=512, **params):
+        """Async iterator over the content deltas of one chat completion"""
+        body = {"model": model, "messages": messages, "max_tokens": max_tokens, "stream": True,
+                "stream_options": {"include_usage": True}, **params}
+        # only deterministic requests can share an answer
+        if not self.coalesce or body.get("temperature") != 0:
+            async for delta in self._stream(self.providers[provider], body):
+                yield delta
+            return
+
+        key = hashlib.sha256(json.dumps([provider, body], sort_keys=True).encode()).hexdigest()
+        subscriber = asyncio.Queue()
+        fanout = self._inflight.get(key)
+        if fanout is None:
+            fanout = self._inflight[key] = {"subscribers": [subscriber], "sent": []}
+            # the task is kept here so it is not garbage collected mid-stream and can be cancelled
+            fanout["task"] = asyncio.create_task(self._broadcast(key, fanout, self.providers[provider], body))
+        else:
+            self.stats["coalesced"] += 1
+            # replay what the leader already received, then follow along
+            for delta in fanout["sent"]:
+                subscriber.put_nowait(delta)
+            fanout["subscribers"].append(subscriber)
+        try:
+            while True:
+                item = await subscriber.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            fanout["subscribers"].remove(subscriber)
+            if not fanout["subscribers"] and not fanout["task"].done():
+                # nobody is reading any more (closed or cancelled): stop the upstream request
+                self._release(key, fanout)
+                fanout["task"].cancel()
+
+    def _release(self, key, fanout):
+        # a newer request with the same key may already have its own fanout
+        if self._inflight.get(key) is fanout:
+            del self._inflight[key]
+
+    async def _broadcast(self, key, fanout, provider, body):
+        try:
+            async for delta in self._stream(provider, body):
+                fanout["sent"].append(delta)
+                for subscriber in fanout["subscribers"]:
+                    subscriber.put_nowait(delta)
+            end = None
+        except Exception as e:
+            end = e
+        finally:
+            self._release(key, fanout)
+        for subscriber in fanout["subscribers"]:
+            subscriber.put_nowait(end)
+
+    async def _stream(self, provider, body):
+        estimate = estimate_tokens(body["messages"], body["max_tokens"])
+        for attempt in range(self.max_retries + 1):
+            await provider.requests.acquire(1)
+            await provider.tokens.acquire(estimate)
+            async with provider.slots:
+                self.stats["requests"] += 1
+                headers = {"Authorization": f"Bearer {provider.api_key}"}
+                clients = self.clients
+                shard = self._busy.index(min(self._busy))
+                self._busy[shard] += 1
+                try:
+                    async with clients[shard].stream("POST", f"{provider.base_url}/chat/completions",
+                                                     json=body, headers=headers) as response:
+                        if response.status_code == 429:
+                            self.stats["rate_limited"] += 1
+                            retry_after = retry_after_seconds(response.headers.get("retry-after"), 2 ** attempt)
+                            provider.requests.block_for(retry_after)
+                            # nothing was generated, the next attempt reserves its tokens again
+                            provider.tokens.refund(estimate)
+                            continue
+                        response.raise_for_status()
+                        usage = None
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data: "):
+                                continue
+                            data = line[6:]
+                            if data == "[DONE]":
+                                # keep reading to the end of the body: a response left
+                                # half-read closes its connection instead of going back to the pool
+                                continue
+                            chunk = json.loads(data)
+                            usage = chunk.get("usage") or usage
+                            for choice in chunk.get("choices", []):
+                                delta = choice.get("delta", {}).get("content")
+                                if delta:
+                                    yield delta
+                        if usage:
+                            self.stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                            self.stats["completion_tokens"] += usage.get("completion_tokens", 0)
+                            # give back what the estimate over-reserved
+                            provider.tokens.refund(max(0, estimate - usage.get("total_tokens", estimate)))
+                        return
+                finally:
+                    self._busy[shard] -= 1
+        raise RateLimited(f"{provider.name}: still rate limited after {self.max_retries} retries")
+
+    async def aclose(self):
+        if self._clients is not None:
+            for client in self._clients:
+                await client.aclose()
+            self._clients = None
+
+
+class BackgroundLoop:
+    """An event loop on a daemon thread, so sync code (e.g. Mesop handlers) can use the pool"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def iterate(self, async_iterable_factory):
+        """Consume an async iterator on the loop and yield its items here.
+
+        The calling thread blocks on a queue until the stream ends, so a
+        sync caller still holds one thread per open stream; only the HTTP
+        side is shared on the loop.
+        """
+        items = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in async_iterable_factory():
+                    items.put(item)
+                items.put(done)
+            except BaseException as e:
+                items.put(e)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
@@ -0,0 +1,508 @@
+"""Replay recorded traces offline, as a regression benchmark.
+
+Record a trace from any app with GENAI_TRACE=traces.jsonl (see
+instrumentation.py), then replay it with no network, API keys or Neo4j:
+
+    python -m common.replay traces.jsonl --save-baseline baseline.json
+    python -m common.replay traces.jsonl --baseline baseline.json --tolerance 0.2
+    python -m common.replay --synthetic 300 --speed 0.1
+
+Recorded work is run again through the apps' own code, with only the
+outside world replaced, so a regression in that code shows up in the numbers:
+    sql_crew  each recorded query_cache lookup is a query_tool.run_query call
+              (result cache, query guard, connection pool, streamed export)
+              on a seeded SQLite Employee table
+    neo4j     each recorded question goes through CachedCypherQA (template
+              cache, schema snapshot) with MockGraph as Neo4j and MockLLM
+              answering the Cypher-generation and QA chains
+    mesop     each recorded turn goes through services.reply (history sync,
+              semantic cache, AsyncLLMPool) with MockLLM behind the pool's
+              HTTP transport, one conversation per recorded session
+The spans those paths record are what gets measured. Spans of the other
+apps, whose code needs boto3, Streamlit or a real model to run, are timed
+stand-ins: llm spans stream the recorded output with the recorded timing,
+graph spans query MockGraph, db spans run on the bare seeded table and cache
+spans repeat their recorded hit.
+
+Text payloads longer than the recorder's max_payload were cut when recorded
+(attrs["clipped"]); those spans cannot be matched and are skipped.
+
+The replay prints p50/p95 latency and time to first token per app/kind/name
+and exits 1 when a p50 is more than `tolerance` slower than the baseline.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+from common.instrumentation import Recorder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the app folders whose modules the replay imports
+APP_FOLDERS = ("SQL_database_query&summarization_withcrewAI", "Neo4j_llm", "Mesop_with_OpenAI")
+
+DEPARTMENTS = ("Engineering", "Sales", "Marketing", "Finance", "Support", "Legal", "Operations", "Research")
+FIRST_NAMES = ("Ada", "Alan", "Grace", "Linus", "Barbara", "Ken", "Margaret", "Dennis", "Frances", "John")
+LAST_NAMES = ("Lovelace", "Turing", "Hopper", "Torvalds", "Liskov", "Thompson", "Hamilton", "Ritchie", "Allen")
+
+
+def load_trace(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _key(value):
+    text = value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _parse(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _clipped(span):
+    return (span.get("attrs") or {}).get("clipped") or []
+
+
+def _last_user(prompt):
+    """The last user message of a chat prompt ([(role, content)] or [{"role", "content"}]), or None"""
+    if not isinstance(prompt, list):
+        return None
+    for message in reversed(prompt):
+        if isinstance(message, dict):
+            message = (message.get("role"), message.get("content"))
+        if isinstance(message, (list, tuple)) and len(message) == 2 and message[0] == "user":
+            return message[1]
+    return None
+
+
+class MockLLM:
+    """Answers recorded inputs with the recorded output and timing; anything else gets a canned reply.
+
+    Chat prompts are also matched on their last user message, so a turn
+    whose history or system prompt changed still gets its recorded answer.
+    """
+
+    def __init__(self, spans=(), speed=1.0, default_ttft=0.2, default_duration=1.0, chunk_words=1):
+        self.speed = speed
+        self.default_ttft = default_ttft
+        self.default_duration = default_duration
+        self.chunk_words = chunk_words
+        self.recorded = {}
+        for span in spans:
+            if span.get("kind") == "llm" and span.get("error") is None and not _clipped(span):
+                self.recorded[_key(span.get("input"))] = span
+                question = _last_user(span.get("input"))
+                if question is not None:
+                    self.recorded.setdefault(_key(["user", question]), span)
+
+    def _lookup(self, prompt):
+        span = self.recorded.get(_key(prompt))
+        if span is None and _last_user(prompt) is not None:
+            span = self.recorded.get(_key(["user", _last_user(prompt)]))
+        if span is None:
+            digest = _key(prompt)[:8]
+            return f"mock answer {digest}", self.default_ttft, self.default_duration, {}
+        output = span.get("output") or ""
+        output = output if isinstance(output, str) else json.dumps(output)
+        duration = span.get("duration") or 0.0
+        ttft = span.get("ttft") if span.get("ttft") is not None else duration
+        return output, ttft, duration, span
+
+    def _timeline(self, prompt):
+        """[(seconds to wait, chunk)] for streaming the answer to prompt"""
+        output, ttft, duration, _ = self._lookup(prompt)
+        words = output.split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) for i in range(0, len(words), self.chunk_words)]
+        rest = max(0.0, duration - ttft) * self.speed / max(1, len(chunks) - 1)
+        return [(ttft * self.speed if i == 0 else rest, chunk if i == len(chunks) - 1 else chunk + " ")
+                for i, chunk in enumerate(chunks)]
+
+    def stream(self, prompt):
+        for delay, chunk in self._timeline(prompt):
+            time.sleep(delay)
+            yield chunk
+
+    async def astream(self, prompt):
+        for delay, chunk in self._timeline(prompt):
+            await asyncio.sleep(delay)
+            yield chunk
+
+    def invoke(self, prompt):
+        return "".join(self.stream(prompt))
+
+    def transport(self):
+        """An httpx transport serving OpenAI-style streamed chat completions, for AsyncLLMPool(transport=...)"""
+        import httpx
+
+        async def handle(request):
+            body = json.loads(request.content)
+            prompt = [[m["role"], m["content"]] for m in body["messages"]]
+            span = self._lookup(prompt)[3]
+
+            async def events():
+                async for chunk in self.astream(prompt):
+                    yield f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n".encode()
+                if span.get("prompt_tokens") is not None:
+                    usage = {"prompt_tokens": span["prompt_tokens"], "completion_tokens": span.get("completion_tokens") or 0}
+                    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                    yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode()
+                yield b"data: [DONE]\n\n"
+
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events())
+
+        return httpx.MockTransport(handle)
+
+
+class _MockChain:
+    """An LLM chain's invoke(), answered by MockLLM for the span input key(inputs) was recorded with"""
+
+    def __init__(self, llm, key):
+        self.llm = llm
+        self.key = key
+
+    def invoke(self, inputs):
+        return {"text": self.llm.invoke(self.key(inputs))}
+
+
+class MockGraph:
+    """Neo4jGraph stand-in answering recorded Cypher with the recorded records"""
+
+    def __init__(self, spans=(), speed=1.0):
+        self.speed = speed
+        self.structured_schema = {}
+        self.recorded = {}
+        for span in spans:
+            if span.get("kind") == "graph" and span.get("error") is None and not _clipped(span):
+                query = _parse(span.get("input"))
+                if isinstance(query, dict):
+                    key = _key({"cypher": query.get("cypher"), "params": query.get("params") or {}})
+                    self.recorded[key] = (_parse(span.get("output")) or [], span.get("duration") or 0.0)
+
+    def refresh_schema(self):
+        pass
+
+    def query(self, cypher, params=None):
+        if "db.labels()" in cypher:
+            # SchemaSnapshot's fingerprint query: the schema never changes here
+            return [{"labels": [], "types": [], "keys": []}]
+        records, duration = self.recorded.get(_key({"cypher": cypher, "params": params or {}}), ([], 0.0))
+        time.sleep(duration * self.speed)
+        return records if isinstance(records, list) else []
+
+
+class ReplayRecorder(Recorder):
+    """A Recorder that also keeps every finished span, for percentiles"""
+
+    def __init__(self, app="replay"):
+        super().__init__(app)
+        self.spans = []
+        self.skipped = Counter()
+
+    def finish(self, span):
+        super().finish(span)
+        self.spans.append(span)
+
+
+def build_employee_db(path, rows=50_000, seed=0):
+    """The SQL app's Employee table with seeded rows (no faker needed)"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS Employee")
+            conn.execute("CREATE TABLE Employee (id INTEGER PRIMARY KEY, name TEXT, dept TEXT, salary REAL)")
+            conn.executemany(
+                "INSERT INTO Employee VALUES (?, ?, ?, ?)",
+                ((i, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.choice(DEPARTMENTS),
+                  rng.randrange(10_000, 100_000)) for i in range(1, rows + 1)),
+            )
+    finally:
+        conn.close()
+    return path
+
+
+class SqlReplay:
+    """sql_crew: each recorded query_cache lookup runs query_tool.run_query again"""
+
+    def __init__(self, recorder, db_path, workdir):
+        from db_pool import ConnectionPool
+        from query_tool import make_guard, run_query
+        from result_cache import QueryCache
+
+        self.recorder = recorder
+        self.workdir = workdir
+        self.run_query = run_query
+        self.pool = ConnectionPool(db_path)
+        self.guard = make_guard(self.pool.data_version)
+        self.cache = QueryCache(self.pool.data_version)
+
+    def run(self, recorded):
+        if recorded.get("kind") != "cache":
+            return  # the db span is recorded again by run_query
+        extension = os.path.splitext((recorded.get("attrs") or {}).get("file") or "result.csv")[1]
+        file_name = os.path.join(self.workdir, "result" + (extension or ".csv"))
+        try:
+            self.run_query(recorded["input"], file_name, self.pool, self.guard, self.cache, self.recorder)
+        except sqlite3.Error as e:
+            # the fixture lacks a table the recording used
+            self.recorder.skipped[f"sql_crew: {e}"] += 1
+
+    def close(self):
+        self.pool.close()
+
+
+class Neo4jReplay:
+    """neo4j: each recorded question (its cypher_template lookup) goes through CachedCypherQA.invoke"""
+
+    def __init__(self, recorder, llm, graph):
+        from cypher_cache import CachedCypherQA
+
+        chain = SimpleNamespace(graph=graph, top_k=10,
+                                cypher_generation_chain=_MockChain(llm, lambda inputs: inputs["question"]),
+                                qa_chain=_MockChain(llm, lambda inputs: inputs))
+        self.qa = CachedCypherQA(chain, recorder=recorder)
+
+    def run(self, recorded):
+        if recorded.get("kind") == "cache":
+            self.qa.invoke(recorded["input"])
+
+    def close(self):
+        pass
+
+
+class MesopReplay:
+    """mesop: each recorded turn (its semantic_cache lookup) goes through services.reply"""
+
+    def __init__(self, recorder, llm):
+        import services
+
+        services.get_recorder.set(recorder)
+        services.get_pool.set(services.make_pool(transport=llm.transport()))
+        self.services = services
+        self.histories = {}
+
+    def run(self, recorded):
+        if recorded.get("kind") != "cache":
+            return
+        session = (recorded.get("attrs") or {}).get("session") or uuid.uuid4().hex
+        # what mesop.labs.chat's submit() passes to the transform
+        history = self.histories.setdefault(session, [])
+        history += [SimpleNamespace(role="user", content=recorded["input"]), SimpleNamespace(role="assistant", content="")]
+        for delta in self.services.reply(session, recorded["input"], history):
+            history[-1].content += delta
+
+    def close(self):
+        pass
+
+
+def synthetic_trace(n=300, seed=0):
+    """A trace shaped like real recordings of every app, for trying the harness without one"""
+    rng = random.Random(seed)
+    spans = []
+
+    def span(kind, app, name, **fields):
+        spans.append({"kind": kind, "app": app, "name": name, "error": None, "cache_hit": None, "ttft": None,
+                      "duration": 0.0, "attrs": {}, **fields})
+
+    sessions = [uuid.UUID(int=rng.getrandbits(128)).hex for _ in range(max(1, n // 20))]
+    for i in range(n):
+        app = rng.choice(("sql_crew", "neo4j", "mesop", "mesop", "bedrock"))
+        if app == "sql_crew":
+            dept = rng.choice(DEPARTMENTS)
+            span("cache", app, "query_cache", attrs={"file": "results.csv"},
+                 input=rng.choice((f"SELECT name, salary FROM Employee WHERE dept = '{dept}' "
+                                   f"ORDER BY salary DESC LIMIT 3",
+                                   "SELECT dept, avg(salary) FROM Employee GROUP BY dept",
+                                   f"SELECT count(*) FROM Employee WHERE salary > {rng.randrange(20, 90)}000")))
+        elif app == "neo4j":
+            title = f"Movie {i % 20}"
+            question = f"Who directed {title}"
+            records = [{"p.name": f"Director {i % 20}"}]
+            span("cache", app, "cypher_template", input=question)
+            span("llm", app, "cypher_generation", input=question, duration=rng.uniform(0.3, 0.8),
+                 output=f"MATCH (m:Movie {{title: '{title}'}})<-[:DIRECTED]-(p) RETURN p.name")
+            for cypher, params in ((f"MATCH (m:Movie {{title: '{title}'}})<-[:DIRECTED]-(p) RETURN p.name", {}),
+                                   ("MATCH (m:Movie {title: $p0})<-[:DIRECTED]-(p) RETURN p.name", {"p0": title})):
+                span("graph", app, "cypher", input={"cypher": cypher, "params": params}, output=records,
+                     duration=rng.uniform(0.005, 0.05))
+            span("llm", app, "qa", input={"question": question, "context": records}, duration=rng.uniform(0.3, 1.0),
+                 output=f"{title} was directed by Director {i % 20}.")
+        elif app == "mesop":
+            question = f"question {i % 50}"
+            duration = rng.uniform(0.2, 1.5)
+            session = rng.choice(sessions)
+            span("cache", app, "semantic_cache", input=question, attrs={"session": session})
+            span("llm", app, "gpt-3.5-turbo", input=[["system", "You are a helpful assistant."], ["user", question]],
+                 ttft=duration * rng.uniform(0.1, 0.3), duration=duration, attrs={"session": session},
+                 output=" ".join(f"word{j}" for j in range(rng.randrange(10, 60))))
+        else:
+            duration = rng.uniform(0.2, 1.5)
+            span("llm", app, "bedrock.invoke_model", input=f"summarize document {i % 30}",
+                 ttft=duration * rng.uniform(0.1, 0.3), duration=duration,
+                 output=" ".join(f"word{j}" for j in range(rng.randrange(10, 60))))
+    return spans
+
+
+def _stand_in(recorded, recorder, llm, graph, connect):
+    """Time a span of an app whose code is not replayed"""
+    kind, app, name = recorded.get("kind"), recorded.get("app"), recorded.get("name")
+    query = _parse(recorded.get("input")) if kind == "graph" else None
+    if kind == "graph" and not isinstance(query, dict):
+        recorder.skipped["graph input is not a query"] += 1
+        return
+    with recorder.span(kind, name, app=app, input=recorded.get("input")) as span:
+        if kind == "llm":
+            for _ in span.stream(llm.stream(recorded.get("input"))):
+                pass
+            span.tokens(recorded.get("prompt_tokens"), recorded.get("completion_tokens"))
+        elif kind == "db":
+            try:
+                span.output = len(connect().execute(recorded["input"]).fetchall())
+            except sqlite3.Error as e:
+                # the fixture lacks a table the recording used
+                span.attrs["skipped"] = str(e)
+        elif kind == "graph":
+            span.output = graph.query(query.get("cypher"), query.get("params"))
+        elif recorded.get("cache_hit") is not None:
+            span.hit(recorded["cache_hit"])
+
+
+def replay(spans, speed=1.0, db_path=None, rows=50_000):
+    """Run the spans again; returns (ReplayRecorder with the totals, the Spans it recorded).
+
+    The folders in APP_FOLDERS have to be importable for the apps that are
+    replayed through their own code (main() puts them on sys.path).
+    """
+    llm = MockLLM(spans, speed=speed)
+    graph = MockGraph(spans, speed=speed)
+    recorder = ReplayRecorder("replay")
+    workdir = tempfile.mkdtemp()
+    if any(s.get("kind") == "db" or s.get("app") == "sql_crew" for s in spans):
+        if db_path is None or not os.path.exists(db_path):
+            db_path = build_employee_db(db_path or os.path.join(workdir, "replay.db"), rows)
+    factories = {
+        "sql_crew": lambda: SqlReplay(recorder, db_path, workdir),
+        "neo4j": lambda: Neo4jReplay(recorder, llm, graph),
+        "mesop": lambda: MesopReplay(recorder, llm),
+    }
+    drivers = {}
+    conn = []
+
+    def connect():
+        if not conn:
+            conn.append(sqlite3.connect(db_path))
+        return conn[0]
+
+    try:
+        for recorded in spans:
+            clipped = _clipped(recorded)
+            if clipped:
+                recorder.skipped[f"clipped {'/'.join(clipped)}"] += 1
+                continue
+            app = recorded.get("app")
+            if app in factories:
+                if app not in drivers:
+                    drivers[app] = factories[app]()
+                drivers[app].run(recorded)
+            else:
+                _stand_in(recorded, recorder, llm, graph, connect)
+    finally:
+        for driver in drivers.values():
+            driver.close()
+        for c in conn:
+            c.close()
+    return recorder, recorder.spans
+
+
+def percentiles(values):
+    if not values:
+        return None, None
+    values = sorted(values)
+    return statistics.median(values), values[min(len(values) - 1, int(len(values) * 0.95))]
+
+
+def summarize(recorder, measured):
+    """{"app/kind/name": {count, p50, p95, ttft_p50, hit_rate, ...}}"""
+    durations, ttfts = {}, {}
+    for span in measured:
+        key = f"{span.app}/{span.kind}/{span.name}"
+        durations.setdefault(key, []).append(span.duration)
+        if span.ttft is not None:
+            ttfts.setdefault(key, []).append(span.ttft)
+    summary = recorder.summary()
+    for key, values in durations.items():
+        p50, p95 = percentiles(values)
+        summary[key].update(p50=p50, p95=p95, ttft_p50=percentiles(ttfts.get(key, []))[0])
+    return summary
+
+
+def compare(summary, baseline, tolerance=0.2, slack=0.001):
+    """Keys whose p50 got slower than the baseline by more than tolerance (plus `slack` seconds)"""
+    regressions = []
+    for key, before in baseline.items():
+        after = summary.get(key)
+        if after is None or before.get("p50") is None:
+            continue
+        if after["p50"] > before["p50"] * (1 + tolerance) + slack:
+            regressions.append((key, before["p50"], after["p50"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("trace", nargs="?", help="JSONL trace written with GENAI_TRACE")
+    parser.add_argument("--synthetic", type=int, default=0, help="replay N generated spans instead")
+    parser.add_argument("--speed", type=float, default=1.0, help="scale recorded model/graph latency (0 = none)")
+    parser.add_argument("--db", help="SQLite file for db spans (built with seeded rows if missing)")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--baseline", help="fail when slower than this summary")
+    parser.add_argument("--save-baseline", help="write the summary here")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    if not args.trace and not args.synthetic:
+        parser.error("give a trace file or --synthetic N")
+
+    sys.path[:0] = [os.path.join(ROOT, folder) for folder in APP_FOLDERS]
+    spans = synthetic_trace(args.synthetic) if args.synthetic else load_trace(args.trace)
+    start = time.perf_counter()
+    recorder, measured = replay(spans, speed=args.speed, db_path=args.db, rows=args.rows)
+    summary = summarize(recorder, measured)
+    print(f"replayed {len(spans)} recorded spans as {len(measured)} in {time.perf_counter() - start:.2f}s")
+    for reason, count in recorder.skipped.items():
+        print(f"    skipped {count}: {reason}")
+    for key, s in summary.items():
+        ttft = f"ttft p50 {s['ttft_p50'] * 1000:7.1f} ms" if s["ttft_p50"] is not None else ""
+        hits = f"hit rate {s['hit_rate']:.0%}" if s["hit_rate"] is not None else ""
+        print(f"{key:<40} n={s['count']:<5} p50 {s['p50'] * 1000:8.1f} ms  p95 {s['p95'] * 1000:8.1f} ms  {ttft}{hits}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: p50 {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
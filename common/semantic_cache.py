@@ -0,0 +1,176 @@
+import difflib
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+
+from common.embeddings import HashingEmbedder
+
+
+STOPWORDS = frozenset("""a an and are as at be by can could do does for from how i in is it me my of on or
+please should tell the to was what whats when where which who why will with would you your""".split())
+
+
+def content_terms(text):
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower().replace("'", "")) if w not in STOPWORDS}
+
+
+def same_terms(a, b, min_ratio=0.8):
+    """True when every content word of one question has a close spelling (typo, plural) in the other.
+
+    Character n-gram embeddings score "TCP and UDP" vs "TCP and IP" above
+    0.9; this keeps such pairs apart while still matching rephrasings that
+    only differ in stopwords, casing, punctuation or word order.
+    """
+    terms_a, terms_b = content_terms(a), content_terms(b)
+    for word in terms_a ^ terms_b:
+        other = terms_b if word in terms_a else terms_a
+        if not any(difflib.SequenceMatcher(None, word, o).ratio() >= min_ratio for o in other):
+            return False
+    return True
+
+
+def context_namespace(history, scope="", base=""):
+    """Namespace for a question asked after `history` (earlier (role, content) turns).
+
+    A first question has no context and is shared by everyone under `base`.
+    A follow-up ("tell me more") only means something after its own turns,
+    so it is keyed by the session/thread `scope` plus a hash of those turns
+    and can never be answered from another conversation.
+
+    The hash covers every earlier turn, so it changes each turn and a
+    follow-up only hits when the same history is asked again (a retried or
+    regenerated turn). In practice follow-ups almost never hit; this keeps
+    them from hitting wrongly, the savings come from first questions.
+    """
+    if not history:
+        return base
+    digest = hashlib.sha1("\x1e".join(f"{role}\x1f{content}" for role, content in history).encode()).hexdigest()
+    return f"{base}|{scope}|{digest}"
+
+
+class CacheHit:
+    def __init__(self, question, answer, similarity, saved_seconds):
+        self.question = question
+        self.answer = answer
+        self.similarity = similarity
+        self.saved_seconds = saved_seconds
+
+
+class SemanticCache:
+    """Answers to earlier questions, looked up by embedding similarity.
+
+    Embeddings live in one preallocated (max_entries x dim) matrix, so a
+    lookup is a single matrix-vector product. Entries expire after ttl
+    seconds; when the matrix is full the least recently used entry is
+    replaced. `namespace` keeps e.g. different system prompts or models
+    apart, and conversations apart (see context_namespace). A hit also has
+    to pass same_terms() unless check_terms is False.
+
+    Namespaces are mapped to small ids only while some slot holds an entry
+    for them; looking up an unknown namespace is a miss and does not add
+    one, so one-off follow-up namespaces don't pile up.
+    """
+
+    def __init__(self, embedder=None, threshold=0.95, max_entries=2048, ttl=24 * 3600.0, check_terms=True):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.check_terms = check_terms
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._vectors = np.zeros((max_entries, self.embedder.dim), dtype=np.float32)
+        self._created = np.full(max_entries, -np.inf)
+        self._last_used = np.full(max_entries, -np.inf)
+        self._namespace_ids = {}
+        self._namespace_slots = {}
+        self._next_namespace_id = 0
+        self._namespaces = np.full(max_entries, -1, dtype=np.int64)
+        self._entries = [None] * max_entries
+        self._lock = threading.Lock()
+
+    def _acquire_namespace(self, namespace):
+        namespace_id = self._namespace_ids.get(namespace)
+        if namespace_id is None:
+            namespace_id = self._namespace_ids[namespace] = self._next_namespace_id
+            self._next_namespace_id += 1
+        self._namespace_slots[namespace] = self._namespace_slots.get(namespace, 0) + 1
+        return namespace_id
+
+    def _release_namespace(self, namespace):
+        # the slot that held this namespace's entry is being reused
+        self._namespace_slots[namespace] -= 1
+        if not self._namespace_slots[namespace]:
+            del self._namespace_slots[namespace]
+            del self._namespace_ids[namespace]
+
+    def lookup(self, question, namespace=""):
+        """Return a CacheHit for the most similar live question above threshold, else None"""
+        query = self.embedder.embed(question)
+        now = time.monotonic()
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if namespace_id is None:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ query
+            similarities[(self._created <= now - self.ttl) | (self._namespaces != namespace_id)] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold or (
+                    self.check_terms and not same_terms(question, self._entries[best][0])):
+                self.misses += 1
+                return None
+            self._last_used[best] = now
+            cached_question, answer, latency, _ = self._entries[best]
+            self.hits += 1
+            self.saved_seconds += latency or 0.0
+            return CacheHit(cached_question, answer, float(similarities[best]), latency)
+
+    def store(self, question, answer, latency=None, namespace=""):
+        """Remember an answer; latency is what a later hit will count as saved"""
+        vector = self.embedder.embed(question)
+        now = time.monotonic()
+        with self._lock:
+            expired = self._created <= now - self.ttl
+            if expired.any():
+                slot = int(np.argmax(expired))
+            else:
+                slot = int(np.argmin(self._last_used))
+            if self._entries[slot] is not None:
+                self._release_namespace(self._entries[slot][3])
+            self._vectors[slot] = vector
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._namespaces[slot] = self._acquire_namespace(namespace)
+            self._entries[slot] = (question, answer, latency, namespace)
+
+    def clear(self):
+        with self._lock:
+            self._created[:] = -np.inf
+            self._last_used[:] = -np.inf
+            self._namespaces[:] = -1
+            self._entries = [None] * self.max_entries
+            self._namespace_ids.clear()
+            self._namespace_slots.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": int((self._created > time.monotonic() - self.ttl).sum()),
+        }
+
+
+def stream_text(text, delay=0.0):
+    """Yield a cached answer word by word, like a model stream would"""
+    for piece in re.findall(r"\S+\s*|\s+", text):
+        yield piece
+        if delay:
+            time.sleep(delay)
@@ -0,0 +1,212 @@
+"""Startup tooling for the UI apps: build-once services, import-time profiles and a prefork launcher.
+
+    python -m common.startup profile Mesop_with_OpenAI/app.py --top 15
+    python -m common.startup coldstart AWS_BEDROCK_TEXT_SUMMARIZATION/app.py --runs 5
+
+`profile` runs the script's top-level imports under `python -X importtime`
+and lists the slowest packages. `coldstart` times fresh interpreters that
+import (or fully run) the script, minus the bare interpreter, which is what
+a new worker or a redeploy pays before it can answer anything.
+
+prefork() is what the apps' launch.py scripts use: heavy modules are
+imported once in the parent, then forked workers share those pages and only
+build their own per-process state (clients, event loops) before serving.
+"""
+import argparse
+import ast
+import functools
+import importlib
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+
+def once(factory):
+    """Cache a no-argument factory for the life of the process; concurrent first calls build one object"""
+    lock = threading.Lock()
+    done = []
+
+    @functools.wraps(factory)
+    def get():
+        if not done:
+            with lock:
+                if not done:
+                    done.append(factory())
+        return done[0]
+
+    def set(value):
+        """Use value from now on instead of the factory's object (replays and tests inject mocks this way)"""
+        with lock:
+            done[:] = [value]
+
+    get.set = set
+    return get
+
+
+def top_level_imports(script):
+    """Module names imported at the top level of a script (not inside functions)"""
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), script)
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def _script_env(script):
+    # the apps import their siblings and common/ by plain name
+    folder = os.path.dirname(os.path.abspath(script))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([folder, os.path.dirname(folder), env.get("PYTHONPATH", "")])
+    return env, folder
+
+
+def _import_code(script):
+    # a missing optional package should not hide the cost of the rest
+    return "\n".join(f"try:\n    import {name}\nexcept ImportError:\n    pass" for name in top_level_imports(script))
+
+
+def import_profile(script, top=20):
+    """[(package, cumulative seconds)] for the script's imports, slowest first"""
+    env, folder = _script_env(script)
+    # the marker separates the interpreter's own startup imports from the script's
+    code = "import sys; sys.stderr.write('--script--\\n')\n" + _import_code(script)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=folder, env=env,
+                            capture_output=True, text=True)
+    packages = {}
+    for line in result.stderr.partition("--script--\n")[2].splitlines():
+        # import time: self [us] | cumulative | imported package
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match and match.group(3) == " ":
+            package = match.group(4).split(".")[0]
+            packages[package] = packages.get(package, 0) + int(match.group(2)) / 1e6
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+
+def cold_start(script, runs=5, run_body=False):
+    """Median seconds for a fresh interpreter to import the script's modules (or run it), over a bare one"""
+    env, folder = _script_env(script)
+    if run_body:
+        code = f"import runpy; runpy.run_path({os.path.abspath(script)!r}, run_name='__startup__')"
+    else:
+        code = _import_code(script)
+
+    def timed(source):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", source], cwd=folder, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    baseline = statistics.median(timed("pass") for _ in range(runs))
+    return statistics.median(timed(code) for _ in range(runs)) - baseline
+
+
+def preload(modules):
+    """Import modules now; {module: seconds}, None for the ones that are not installed"""
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def prefork(run_worker, workers=2, warm=None, respawn=True):
+    """Fork `workers` processes that call warm() and then run_worker(index); restart the ones that die.
+
+    Import everything heavy before calling this, but do not start threads,
+    event loops or network clients in the parent: they do not survive fork.
+    Those belong in warm(), which runs in every worker before it serves.
+    Each worker sees its index in GENAI_WORKER_INDEX.
+    """
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # per-worker settings such as the /metrics port (common.instrumentation.get_recorder)
+            os.environ["GENAI_WORKER_INDEX"] = str(index)
+            code = 0
+            try:
+                if warm is not None:
+                    warm()
+                run_worker(index)
+            except BaseException:
+                import traceback
+
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous = signal.signal(signal.SIGTERM, stop), signal.signal(signal.SIGINT, stop)
+    try:
+        for index in range(workers):
+            spawn(index)
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index = children.pop(pid, None)
+            if index is not None and respawn and not stopping:
+                print(f"worker {index} (pid {pid}) exited with {status}, restarting", file=sys.stderr)
+                time.sleep(1.0)
+                spawn(index)
+    finally:
+        signal.signal(signal.SIGTERM, previous[0])
+        signal.signal(signal.SIGINT, previous[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    profile = commands.add_parser("profile", help="slowest imports of a script")
+    profile.add_argument("script")
+    profile.add_argument("--top", type=int, default=20)
+    coldstart = commands.add_parser("coldstart", help="fresh-interpreter startup time of a script")
+    coldstart.add_argument("script")
+    coldstart.add_argument("--runs", type=int, default=5)
+    coldstart.add_argument("--run-body", action="store_true", help="run the script, not only its imports")
+    args = parser.parse_args()
+
+    if args.command == "profile":
+        rows = import_profile(args.script, args.top)
+        total = sum(seconds for _, seconds in rows)
+        for package, seconds in rows:
+            print(f"{package:<32} {seconds * 1000:9.1f} ms")
+        print(f"{'(listed total)':<32} {total * 1000:9.1f} ms")
+    else:
+        seconds = cold_start(args.script, args.runs, args.run_body)
+        print(f"cold start of {args.script}: {seconds * 1000:.0f} ms over a bare interpreter (median of {args.runs})")
+
+
+if __name__ == "__main__":
+    main()